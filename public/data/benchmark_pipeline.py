@@ -0,0 +1,1108 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the Bible data pipeline.
+
+Runs against the checked-in output_chapters corpus and reports throughput
+(verses/sec, MB/sec), latency percentiles and peak memory for each stage.
+Results can be saved as JSON (--output) and compared with a previous run
+(--compare) to catch regressions between commits.
+"""
+
+import argparse
+import datetime
+import http.client
+import json
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+
+import compact_chapters
+import corpus_server
+import corpus_stats
+import extract_verses_to_json as extractor
+import packed_corpus
+import reference_parser
+import search_index
+import similar_verses
+import split_profiles
+import strongs_concordance
+import verse_ordinals
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+DEFAULT_CORPUS = SCRIPT_DIR / 'output_chapters'
+DEFAULT_STRUCTURE = SCRIPT_DIR / 'kjv_structure.json'
+DEFAULT_JSON_DIR = SCRIPT_DIR / 'output_chapters_json'
+
+SEARCH_QUERIES = [
+    'god', 'lord', 'jerusalem', 'firmament', 'love world',
+    'faith hope charity', '"in the beginning"', '"the lord is my shepherd"',
+    '"son of man" glory', 'zaphnathpaaneah',
+]
+
+CONCORDANCE_LEMMAS = ['H0430', 'H03068', 'G2316', 'G26', 'H06847']
+
+OSIS_NS = 'http://www.bibletechnologies.net/2003/OSIS/namespace'
+
+
+def legacy_extract_text_from_line(line):
+    """The original regex-cascade extractor, kept as a benchmark baseline."""
+    line = re.sub(r'<ns1:note[^>]*>.*?</ns1:note>', '', line)
+    re.findall(r'<ns1:w[^>]*>([^<]+)</ns1:w>', line)
+    re.findall(r'<ns1:transChange[^>]*>([^<]+)</ns1:transChange>', line)
+    re.split(r'<[^>]+>', line)
+    line_processed = re.sub(r'<ns1:transChange[^>]*>([^<]+)</ns1:transChange>', r'\1', line)
+    line_processed = re.sub(r'<ns1:w[^>]*>([^<]+)</ns1:w>', r'\1', line_processed)
+    line_processed = re.sub(r'<[^>]+>', '', line_processed)
+    return ' '.join(line_processed.split()).strip()
+
+
+def legacy_split_long_verse(text, max_length=extractor.MAX_VERSE_LENGTH):
+    """The original greedy sentence splitter, kept as a benchmark baseline."""
+    if len(text) <= max_length:
+        return [text]
+
+    num_parts = max(2, (len(text) + max_length - 1) // max_length)
+    target_length = len(text) // num_parts
+    sentences = re.split(r'[.!?]\s+', text)
+
+    def split_words():
+        words = text.split()
+        words_per_part = len(words) // num_parts
+        return [' '.join(words[i * words_per_part:
+                               len(words) if i == num_parts - 1 else (i + 1) * words_per_part])
+                for i in range(num_parts)]
+
+    if len(sentences) <= 1:
+        return split_words()
+
+    full_sentences = []
+    sentence_start = 0
+    for sentence in sentences:
+        if sentence.strip():
+            sentence_end = text.find(sentence, sentence_start) + len(sentence)
+            while sentence_end < len(text) and text[sentence_end] in '.!?':
+                sentence_end += 1
+            while sentence_end < len(text) and text[sentence_end] == ' ':
+                sentence_end += 1
+            full_sentence = text[sentence_start:sentence_end].strip()
+            if full_sentence:
+                full_sentences.append(full_sentence)
+            sentence_start = sentence_end
+
+    if not full_sentences:
+        return split_words()
+
+    parts = []
+    current_part = ""
+    for sentence in full_sentences:
+        test_part = current_part + (" " if current_part else "") + sentence
+        if len(test_part) > target_length and current_part:
+            parts.append(current_part.strip())
+            current_part = sentence
+        else:
+            current_part = test_part
+    if current_part:
+        parts.append(current_part.strip())
+
+    if 1 < len(parts) < num_parts:
+        longest_idx = max(range(len(parts)), key=lambda i: len(parts[i]))
+        if len(parts[longest_idx]) > max_length:
+            words = parts[longest_idx].split()
+            mid_point = len(words) // 2
+            parts[longest_idx] = ' '.join(words[:mid_point])
+            parts.insert(longest_idx + 1, ' '.join(words[mid_point:]))
+
+    return parts
+
+
+def load_verse_markup(corpus_dir):
+    """Return the raw markup of every verse in the corpus, in file order."""
+    markup = []
+    for xml_file in sorted(Path(corpus_dir).glob('*/*.xml')):
+        with open(xml_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                match = extractor._VERSE_LINE_RE.search(line)
+                if match:
+                    markup.append(match.group(2))
+    return markup
+
+
+def percentiles(samples, points=(50, 95, 99)):
+    """Return {point: value} nearest-rank percentiles of samples."""
+    ordered = sorted(samples)
+    return {
+        point: ordered[min(len(ordered) - 1, max(0, -(-point * len(ordered) // 100) - 1))]
+        for point in points
+    }
+
+
+def time_function(func, inputs, repeat):
+    """Return the best wall time, in seconds, of mapping func over inputs."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for item in inputs:
+            func(item)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def time_each(func, inputs):
+    """Return the wall time, in seconds, of each call of func over inputs."""
+    samples = []
+    for item in inputs:
+        start = time.perf_counter()
+        func(item)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def traced_peak_mb(func, inputs):
+    """Return the peak Python heap growth, in MB, of mapping func over inputs."""
+    tracemalloc.start()
+    try:
+        for item in inputs:
+            func(item)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / (1024 * 1024)
+
+
+def print_percentiles(label, samples, scale, unit):
+    """Print p50/p95/p99 of samples in the given unit."""
+    p = percentiles(samples)
+    print(f"{label:<28} p50 {p[50] * scale:>8.2f} {unit}  p95 {p[95] * scale:>8.2f} {unit}  "
+          f"p99 {p[99] * scale:>8.2f} {unit}")
+    return p
+
+
+def benchmark_tokenizer(corpus_dir, repeat=3):
+    """Compare extract_text_from_line with the legacy regex cascade."""
+    markup = load_verse_markup(corpus_dir)
+    size_mb = sum(len(m.encode('utf-8')) for m in markup) / (1024 * 1024)
+
+    mismatches = sum(
+        1 for m in markup
+        if extractor.extract_text_from_line(m) != legacy_extract_text_from_line(m)
+    )
+
+    legacy = time_function(legacy_extract_text_from_line, markup, repeat)
+    current = time_function(extractor.extract_text_from_line, markup, repeat)
+
+    print("extract_text_from_line")
+    print("-" * 60)
+    print(f"Verses: {len(markup)} ({size_mb:.1f} MB markup, mismatches vs legacy: {mismatches})")
+    print(f"{'legacy regex cascade':<28} {legacy * 1e9 / len(markup):>10.0f} ns/verse")
+    print(f"{'single-pass tokenizer':<28} {current * 1e9 / len(markup):>10.0f} ns/verse")
+    print(f"Speedup: {legacy / current:.2f}x")
+    print(f"Throughput: {len(markup) / current:,.0f} verses/s, {size_mb / current:.1f} MB/s")
+    p = print_percentiles('per verse', time_each(extractor.extract_text_from_line, markup),
+                          1e6, 'us')
+    peak_mb = traced_peak_mb(extractor.extract_text_from_line, markup)
+    print(f"Peak heap: {peak_mb * 1024:.1f} KB")
+
+    return {
+        'verses': len(markup),
+        'mismatches': mismatches,
+        'legacy_ns_per_verse': legacy * 1e9 / len(markup),
+        'ns_per_verse': current * 1e9 / len(markup),
+        'verses_per_sec': len(markup) / current,
+        'mb_per_sec': size_mb / current,
+        'p50_us': p[50] * 1e6,
+        'p95_us': p[95] * 1e6,
+        'p99_us': p[99] * 1e6,
+        'peak_heap_mb': peak_mb,
+    }
+
+
+def split_report(splits, best, legacy, max_length=extractor.MAX_VERSE_LENGTH):
+    """Summarize the part lengths of a list of verse splits.
+
+    best and legacy hold, per verse, the smallest reachable largest part
+    and the legacy splitter's largest part, to measure against the goal.
+    """
+    lengths = [len(part) for parts in splits for part in parts]
+    largest = [max(len(part) for part in parts) for parts in splits]
+    spread = [max(len(p) for p in parts) - min(len(p) for p in parts) for parts in splits]
+    # Parts ending mid-clause: no punctuation before the cut
+    bare_cuts = sum(1 for parts in splits for part in parts[:-1]
+                    if part.rstrip(')]\'"')[-1:].isalnum())
+    p = percentiles(lengths)
+    return {
+        'parts': len(lengths),
+        'parts_over_max': sum(1 for n in lengths if n > max_length),
+        'part_p50': p[50],
+        'part_p95': p[95],
+        'part_max': max(lengths),
+        'part_min': min(lengths),
+        'mean_largest_part': sum(largest) / len(largest),
+        'mean_over_best': sum(n - b for n, b in zip(largest, best)) / len(largest),
+        'larger_than_legacy': sum(1 for n, old in zip(largest, legacy) if n > old),
+        'mean_spread': sum(spread) / len(spread),
+        'word_cuts': bare_cuts,
+    }
+
+
+def benchmark_splitter(corpus_dir, repeat=3):
+    """Compare split_long_verse with the legacy greedy splitter."""
+    texts = [extractor.extract_text_from_line(m) for m in load_verse_markup(corpus_dir)]
+    long_texts = [t for t in texts if len(t) > extractor.MAX_VERSE_LENGTH]
+    size_mb = sum(len(t.encode('utf-8')) for t in texts) / (1024 * 1024)
+
+    def split_uncached(text):
+        extractor._split_balanced.cache_clear()
+        return extractor.split_long_verse(text)
+
+    legacy = time_function(legacy_split_long_verse, long_texts, repeat)
+    uncached = time_function(split_uncached, long_texts, repeat)
+    extractor.split_long_verse(long_texts[0])
+    for text in long_texts:
+        extractor.split_long_verse(text)
+    cached = time_function(extractor.split_long_verse, long_texts, repeat)
+    total = time_function(extractor.split_long_verse, texts, repeat)
+
+    print("split_long_verse")
+    print("-" * 60)
+    print(f"Verses: {len(texts)}, over {extractor.MAX_VERSE_LENGTH} chars: {len(long_texts)}")
+    print(f"{'legacy greedy':<28} {legacy * 1e6 / len(long_texts):>10.2f} us/long verse")
+    print(f"{'balanced, uncached':<28} {uncached * 1e6 / len(long_texts):>10.2f} us/long verse")
+    print(f"{'balanced, cached':<28} {cached * 1e6 / len(long_texts):>10.2f} us/long verse")
+    print(f"Throughput (cached): {len(texts) / total:,.0f} verses/s, {size_mb / total:.1f} MB/s")
+    p = print_percentiles('per long verse, uncached', time_each(split_uncached, long_texts),
+                          1e6, 'us')
+    extractor._split_balanced.cache_clear()
+    peak_mb = traced_peak_mb(extractor.split_long_verse, long_texts)
+    print(f"Peak heap (filling the cache): {peak_mb:.1f} MB")
+
+    splits = {
+        'legacy': [legacy_split_long_verse(t) for t in long_texts],
+        # slack=0 ignores boundary strength: the smallest largest part
+        'most_even': [extractor.split_long_verse(t, slack=0) for t in long_texts],
+        'balanced': [extractor.split_long_verse(t) for t in long_texts],
+    }
+    best = [max(len(part) for part in parts) for parts in splits['most_even']]
+    legacy_largest = [max(len(part) for part in parts) for parts in splits['legacy']]
+    reports = {label: split_report(label_splits, best, legacy_largest)
+               for label, label_splits in splits.items()}
+    print()
+    print(f"{'part lengths':<12} {'parts':>6} {'>max':>5} {'p50':>5} {'p95':>5} {'max':>5} "
+          f"{'min':>5} {'largest':>8} {'over best':>9} {'>legacy':>8} {'spread':>7} "
+          f"{'word cuts':>10}")
+    for label, report in reports.items():
+        print(f"{label:<12} {report['parts']:>6} {report['parts_over_max']:>5} "
+              f"{report['part_p50']:>5} {report['part_p95']:>5} {report['part_max']:>5} "
+              f"{report['part_min']:>5} {report['mean_largest_part']:>8.1f} "
+              f"{report['mean_over_best']:>9.1f} {report['larger_than_legacy']:>8} "
+              f"{report['mean_spread']:>7.1f} {report['word_cuts']:>10}")
+    print(f"largest: mean largest part per verse, over best: its mean excess over "
+          f"most_even; balanced allows {extractor.SPLIT_SLACK:.0%} of max length")
+
+    results = {
+        'verses': len(texts),
+        'long_verses': len(long_texts),
+        'verses_per_sec': len(texts) / total,
+        'mb_per_sec': size_mb / total,
+        'legacy_us_per_long_verse': legacy * 1e6 / len(long_texts),
+        'uncached_us_per_long_verse': uncached * 1e6 / len(long_texts),
+        'cached_us_per_long_verse': cached * 1e6 / len(long_texts),
+        'p50_us': p[50] * 1e6,
+        'p95_us': p[95] * 1e6,
+        'p99_us': p[99] * 1e6,
+        'peak_heap_mb': peak_mb,
+    }
+    for label, report in reports.items():
+        for key, value in report.items():
+            results[f'{label}_{key}'] = value
+    return results
+
+
+def benchmark_chapter_extraction(corpus_dir):
+    """Measure extract_verses_from_xml per chapter file."""
+    xml_files = sorted(Path(corpus_dir).glob('*/*.xml'))
+    size_mb = sum(f.stat().st_size for f in xml_files) / (1024 * 1024)
+
+    # Warm the page cache so the timings measure parsing, not the disk
+    for xml_file in xml_files:
+        xml_file.read_bytes()
+
+    verses = 0
+    samples = []
+    for xml_file in xml_files:
+        start = time.perf_counter()
+        verses += len(extractor.extract_verses_from_xml(xml_file))
+        samples.append(time.perf_counter() - start)
+    total = sum(samples)
+    peak_mb = traced_peak_mb(extractor.extract_verses_from_xml, xml_files)
+
+    print("extract_verses_from_xml")
+    print("-" * 60)
+    print(f"Chapters: {len(xml_files)} ({size_mb:.1f} MB XML), {verses} output verses")
+    print(f"Total: {total:.2f}s, {verses / total:,.0f} verses/s, {size_mb / total:.1f} MB/s")
+    p = print_percentiles('per chapter', samples, 1e3, 'ms')
+    print(f"Peak heap: {peak_mb:.1f} MB")
+
+    return {
+        'chapters': len(xml_files),
+        'verses': verses,
+        'seconds': total,
+        'verses_per_sec': verses / total,
+        'mb_per_sec': size_mb / total,
+        'p50_ms': p[50] * 1e3,
+        'p95_ms': p[95] * 1e3,
+        'p99_ms': p[99] * 1e3,
+        'peak_heap_mb': peak_mb,
+    }
+
+
+def benchmark_full_build(corpus_dir, jobs=None):
+    """Time process_all_xml_files end to end, serially and in parallel."""
+    jobs = jobs or os.cpu_count() or 1
+    xml_files = list(Path(corpus_dir).glob('*/*.xml'))
+    size_mb = sum(f.stat().st_size for f in xml_files) / (1024 * 1024)
+    verses = sum(1 for _ in load_verse_markup(corpus_dir))
+    setup = "import contextlib, io, tempfile\nimport extract_verses_to_json"
+
+    print("process_all_xml_files")
+    print("-" * 60)
+    print(f"Chapters: {len(xml_files)} ({size_mb:.1f} MB XML), {verses} verses")
+
+    results = {}
+    for label, job_count in (('serial', 1), ('parallel', jobs)):
+        if label == 'parallel' and jobs == 1:
+            continue
+        # Build into a throwaway tree; the per-file progress output is discarded
+        statement = (
+            "with tempfile.TemporaryDirectory() as out, "
+            "contextlib.redirect_stdout(io.StringIO()): "
+            f"extract_verses_to_json.process_all_xml_files({str(corpus_dir)!r}, out, "
+            f"jobs={job_count})"
+        )
+        elapsed, rss_mb, worker_rss_mb = measure_in_subprocess(statement, setup)
+        print(f"{f'{label} (jobs={job_count})':<28} {elapsed:>8.2f}s "
+              f"{verses / elapsed:>10,.0f} verses/s {size_mb / elapsed:>6.1f} MB/s "
+              f"{rss_mb:>7.1f} MB peak RSS")
+        results[f'{label}_seconds'] = elapsed
+        results[f'{label}_verses_per_sec'] = verses / elapsed
+        results[f'{label}_mb_per_sec'] = size_mb / elapsed
+        results[f'{label}_peak_rss_mb'] = rss_mb
+        if worker_rss_mb:
+            print(f"{'':<28} {worker_rss_mb:>8.1f} MB peak RSS per worker")
+            results[f'{label}_worker_peak_rss_mb'] = worker_rss_mb
+    results['jobs'] = jobs
+    return results
+
+
+def build_osis_document(corpus_dir, structure_path, out_path):
+    """Reassemble the chapter corpus into one OSIS file like kjvfull.xml.
+
+    The chapter files carry an ns1: prefix and an unqualified book div; the
+    assembled document uses OSIS as the default namespace throughout, as
+    the original monolithic source does.
+    """
+    with open(structure_path, 'r', encoding='utf-8') as f:
+        structure = json.load(f)
+
+    chapter_re = re.compile(r'<ns1:chapter .*?</ns1:chapter>', re.S)
+    title_re = re.compile(r'<ns1:title type="main">.*?</ns1:title>')
+    header_re = re.compile(r'<ns1:header>.*?</ns1:header>', re.S)
+    schema_re = re.compile(r'xsi:schemaLocation="[^"]*"')
+
+    first_chapter = (Path(corpus_dir) / 'Gen' / 'Gen_1.xml').read_text(encoding='utf-8')
+
+    with open(out_path, 'w', encoding='utf-8') as out:
+        out.write("<?xml version='1.0' encoding='utf-8'?>\n")
+        out.write(f'<osis xmlns="{OSIS_NS}" '
+                  'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+                  f'{schema_re.search(first_chapter).group(0)}>\n')
+        out.write('<osisText osisIDWork="KJV" osisRefWork="defaultReferenceScheme" '
+                  'xml:lang="en">')
+        out.write(header_re.search(first_chapter).group(0).replace('ns1:', '') + '\n')
+        for testament in structure.values():
+            for book_id, book_info in testament['books'].items():
+                out.write(f'<div type="book" osisID="{book_id}" canonical="true">')
+                for chapter_num in sorted(book_info['chapters'], key=int):
+                    xml_file = Path(corpus_dir) / book_id / f"{book_id}_{chapter_num}.xml"
+                    source = xml_file.read_text(encoding='utf-8')
+                    if chapter_num == '1':
+                        out.write(title_re.search(source).group(0).replace('ns1:', ''))
+                    out.write('\n' + chapter_re.search(source).group(0).replace('ns1:', ''))
+                out.write('\n</div>\n')
+        out.write('</osisText>\n</osis>\n')
+
+
+def measure_in_subprocess(statement, setup):
+    """Run statement in a fresh interpreter.
+
+    Returns (wall seconds, peak RSS MB, largest child process peak RSS MB).
+    A separate process keeps each measurement's peak RSS independent of
+    whatever this process has already allocated. On Linux ru_maxrss is
+    inherited across fork and exec, so VmHWM is read instead where present.
+    """
+    code = (
+        "import re, resource, sys, time\n"
+        f"{setup}\n"
+        "start = time.perf_counter()\n"
+        f"{statement}\n"
+        "elapsed = time.perf_counter() - start\n"
+        "scale = 1 if sys.platform == 'darwin' else 1024\n"
+        "rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale\n"
+        "try:\n"
+        "    with open('/proc/self/status') as f:\n"
+        "        rss = int(re.search(r'VmHWM:\\s*(\\d+)', f.read()).group(1)) * 1024\n"
+        "except (OSError, AttributeError):\n"
+        "    pass\n"
+        "child_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale\n"
+        "print(elapsed, rss, child_rss)\n"
+    )
+    result = subprocess.run([sys.executable, '-c', code], cwd=SCRIPT_DIR,
+                            capture_output=True, text=True, check=True)
+    elapsed, rss_bytes, child_rss_bytes = result.stdout.split()
+    return float(elapsed), int(rss_bytes) / (1024 * 1024), int(child_rss_bytes) / (1024 * 1024)
+
+
+def benchmark_structure_parser(osis_path):
+    """Compare tree and streaming parse_kjv_bible on a full OSIS file."""
+    size_mb = Path(osis_path).stat().st_size / (1024 * 1024)
+    setup = "import parse_kjv_bible"
+
+    verses = sum(book['total_verses']
+                 for testament in verse_ordinals.load_structure(DEFAULT_STRUCTURE).values()
+                 for book in testament['books'].values())
+
+    print("parse_kjv_bible")
+    print("-" * 60)
+    print(f"Source: {osis_path} ({size_mb:.1f} MB, {verses} verses)")
+
+    baseline = measure_in_subprocess("pass", setup)
+    print(f"{'interpreter baseline':<28} {baseline[0]:>8.2f}s {baseline[1]:>8.1f} MB peak RSS")
+
+    results = {'baseline_rss_mb': baseline[1]}
+    for key, label, streaming in (('tree', 'ET.parse tree', False),
+                                  ('streaming', 'streaming iterparse', True)):
+        statement = f"parse_kjv_bible.parse_kjv_bible({str(osis_path)!r}, streaming={streaming})"
+        elapsed, rss_mb, _ = measure_in_subprocess(statement, setup)
+        print(f"{label:<28} {elapsed:>8.2f}s {rss_mb:>8.1f} MB peak RSS "
+              f"{verses / elapsed:>10,.0f} verses/s {size_mb / elapsed:>6.1f} MB/s")
+        results[f'{key}_seconds'] = elapsed
+        results[f'{key}_peak_rss_mb'] = rss_mb
+        results[f'{key}_verses_per_sec'] = verses / elapsed
+        results[f'{key}_mb_per_sec'] = size_mb / elapsed
+    return results
+
+
+def benchmark_search_index(json_dir, repeat=3):
+    """Measure search index build time, size and query latency."""
+    structure = verse_ordinals.load_structure(DEFAULT_STRUCTURE)
+    verse_texts = list(search_index.load_verse_texts(json_dir, structure))
+
+    print("search_index")
+    print("-" * 60)
+    with tempfile.TemporaryDirectory() as index_dir:
+        start = time.perf_counter()
+        summary = search_index.build_search_index(verse_texts, index_dir)
+        build_time = time.perf_counter() - start
+
+        print(f"Build: {build_time:.2f}s for {summary['verse_count']} verses, "
+              f"{summary['term_count']} terms")
+        print(f"Size: {summary['bytes'] / 1024:.0f} KB in {summary['shard_count']} shards")
+
+        cold = []
+        warm = []
+        for _ in range(repeat):
+            for query in SEARCH_QUERIES:
+                index = search_index.SearchIndex(index_dir)
+                start = time.perf_counter()
+                index.search(query)
+                cold.append(time.perf_counter() - start)
+                start = time.perf_counter()
+                index.search(query)
+                warm.append(time.perf_counter() - start)
+
+        results = {
+            'build_seconds': build_time,
+            'verses_per_sec': summary['verse_count'] / build_time,
+            'terms': summary['term_count'],
+            'size_kb': summary['bytes'] / 1024,
+        }
+        for key, label, samples in (('cold', 'cold (shard load)', cold), ('warm', 'warm', warm)):
+            p = print_percentiles(label, samples, 1e3, 'ms')
+            for point in (50, 95, 99):
+                results[f'{key}_p{point}_ms'] = p[point] * 1e3
+    return results
+
+
+def benchmark_concordance(corpus_dir, repeat=3):
+    """Measure Strong's concordance build time, size and lookup latency."""
+    structure = verse_ordinals.load_structure(DEFAULT_STRUCTURE)
+
+    print("strongs_concordance")
+    print("-" * 60)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = Path(tmp_dir) / 'strongs_concordance.bin'
+        start = time.perf_counter()
+        summary = strongs_concordance.write_concordance(
+            strongs_concordance.collect_verse_lemmas(corpus_dir),
+            verse_ordinals.build_ordinal_lookup(structure), path)
+        build_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        concordance = strongs_concordance.StrongsConcordance(path)
+        load_time = time.perf_counter() - start
+
+    print(f"Build (extraction pass included): {build_time:.2f}s, "
+          f"{summary['lemma_count']} lemmas, {summary['occurrences']} occurrences")
+    print(f"Size: {summary['bytes'] / 1024:.0f} KB, load {load_time * 1e3:.1f} ms")
+
+    results = {
+        'build_seconds': build_time,
+        'lemmas': summary['lemma_count'],
+        'size_kb': summary['bytes'] / 1024,
+        'load_ms': load_time * 1e3,
+    }
+    number = 200
+    for lemma in CONCORDANCE_LEMMAS:
+        best = time_function(concordance.verses, [lemma] * number, repeat) / number
+        label = f"verses({lemma!r})"
+        print(f"{label:<28} {best * 1e6:>8.1f} us "
+              f"({len(concordance.verses(lemma))} verses)")
+        results[f'verses_{lemma}_us'] = best * 1e6
+    return results
+
+
+def benchmark_packed_corpus(json_dir, lookups=2000):
+    """Compare packed-corpus verse lookups with loading chapter JSON."""
+    structure = verse_ordinals.load_structure(DEFAULT_STRUCTURE)
+    verse_ids = list(verse_ordinals.iter_verse_ids(structure))
+    sample = random.Random(0).sample(verse_ids, lookups)
+
+    print("packed_corpus")
+    print("-" * 60)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = Path(tmp_dir) / 'kjv_corpus.bin'
+        summary = packed_corpus.write_packed_corpus(
+            search_index.load_verse_texts(json_dir, structure), structure, path)
+        print(f"Size: {summary['bytes'] / 1024:.0f} KB "
+              f"({summary['text_bytes'] / 1024:.0f} KB text)")
+
+        start = time.perf_counter()
+        with packed_corpus.PackedCorpus(path) as corpus:
+            open_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            for osis_id in sample:
+                corpus.text(osis_id)
+            packed_time = (time.perf_counter() - start) / lookups
+
+            start = time.perf_counter()
+            for first in sample[:200]:
+                ordinal = corpus.ordinal_of(first)
+                last = min(ordinal + 9, corpus.verse_count - 1)
+                str(corpus.range_at(ordinal, last), 'utf-8')
+            range_time = (time.perf_counter() - start) / 200
+
+    start = time.perf_counter()
+    for osis_id in sample:
+        book_id, chapter, _ = osis_id.split('.')
+        with open(Path(json_dir) / book_id / f"{book_id}_{chapter}.json", 'r', encoding='utf-8') as f:
+            json.load(f).get(osis_id)
+    json_time = (time.perf_counter() - start) / lookups
+
+    start = time.perf_counter()
+    all_chapters = {}
+    for json_path in Path(json_dir).glob('*/*_*.json'):
+        if not extractor.is_chapter_json(json_path):
+            continue
+        with open(json_path, 'r', encoding='utf-8') as f:
+            all_chapters[json_path.stem] = json.load(f)
+    load_all_time = time.perf_counter() - start
+
+    print(f"{'open (mmap)':<28} {open_time * 1e3:>8.2f} ms")
+    print(f"{'load all chapter JSON':<28} {load_all_time * 1e3:>8.2f} ms")
+    print(f"{'verse lookup, packed':<28} {packed_time * 1e6:>8.2f} us")
+    print(f"{'10-verse range, packed':<28} {range_time * 1e6:>8.2f} us")
+    print(f"{'verse lookup, chapter JSON':<28} {json_time * 1e6:>8.2f} us")
+
+    return {
+        'size_kb': summary['bytes'] / 1024,
+        'open_ms': open_time * 1e3,
+        'load_all_json_ms': load_all_time * 1e3,
+        'verse_lookup_us': packed_time * 1e6,
+        'range_lookup_us': range_time * 1e6,
+        'json_verse_lookup_us': json_time * 1e6,
+    }
+
+
+def benchmark_split_profiles(corpus_dir):
+    """Compare rendering split profiles from the text cache with re-extraction."""
+    structure = verse_ordinals.load_structure(DEFAULT_STRUCTURE)
+    profiles = split_profiles.load_profiles()
+
+    print("split_profiles")
+    print("-" * 60)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache_path = Path(tmp_dir) / 'kjv_corpus.bin'
+        start = time.perf_counter()
+        summary = split_profiles.build_text_cache(corpus_dir, structure, cache_path)
+        cache_time = time.perf_counter() - start
+        print(f"{'text cache (one XML pass)':<28} {cache_time:>8.2f}s "
+              f"{summary['bytes'] / 1024:>8.0f} KB")
+        results['cache_seconds'] = cache_time
+        results['cache_kb'] = summary['bytes'] / 1024
+
+        xml_files = sorted(Path(corpus_dir).glob('*/*.xml'))
+        with packed_corpus.PackedCorpus(cache_path) as corpus:
+            for name, settings in profiles.items():
+                # The alternative: parse every chapter, split, serialize (no writes)
+                extractor._split_balanced.cache_clear()
+                start = time.perf_counter()
+                for xml_file in xml_files:
+                    with open(xml_file, 'r', encoding='utf-8') as f:
+                        extractor.serialize_verses(extractor.split_verses(
+                            extractor.extract_verse_texts(f),
+                            settings['max_length'], settings['boundaries']))
+                extract_time = time.perf_counter() - start
+
+                extractor._split_balanced.cache_clear()
+                start = time.perf_counter()
+                summary = split_profiles.render_profile(
+                    corpus, structure, settings, Path(tmp_dir) / name)
+                elapsed = time.perf_counter() - start
+                print(f"{name:<14} render {elapsed:>6.2f}s, re-extract {extract_time:>6.2f}s "
+                      f"({elapsed / extract_time:>4.0%}), {summary['entries']:>6} entries")
+                results[f'render_{name}_seconds'] = elapsed
+                results[f'reextract_{name}_seconds'] = extract_time
+    return results
+
+
+def benchmark_verse_index(refs=10000):
+    """Measure VerseIndex reference resolution and ordinal lookups."""
+    structure = verse_ordinals.load_structure(DEFAULT_STRUCTURE)
+    start = time.perf_counter()
+    index = verse_ordinals.VerseIndex(structure)
+    build_time = time.perf_counter() - start
+
+    verse_ids = list(verse_ordinals.iter_verse_ids(structure))
+    rng = random.Random(0)
+    starts = [rng.randrange(len(verse_ids)) for _ in range(refs)]
+    single = [verse_ids[o] for o in starts]
+    ranges = [f"{verse_ids[o]}-{verse_ids[min(o + rng.randrange(1, 60), len(verse_ids) - 1)]}"
+              for o in starts]
+    table_kb = len(json.dumps(index.to_table(), separators=(',', ':'))) / 1024
+
+    print("verse_ordinals.VerseIndex")
+    print("-" * 60)
+    print(f"Build: {build_time * 1e3:.2f} ms, table {table_kb:.1f} KB")
+
+    results = {'build_ms': build_time * 1e3, 'table_kb': table_kb}
+    for key, label, func, inputs in (
+            ('resolve_verse', 'resolve verse', index.resolve, single),
+            ('resolve_range', 'resolve range', index.resolve, ranges),
+            ('verse_id', 'ordinal -> verse ID', index.verse_id, starts),
+            ('next_verses', 'next 10 verses', lambda o: index.next_verses(o, 10), starts)):
+        best = time_function(func, inputs, 3) / len(inputs)
+        print(f"{label:<28} {best * 1e6:>8.2f} us")
+        results[f'{key}_us'] = best * 1e6
+
+    start = time.perf_counter()
+    index.resolve_many(ranges)
+    batch = time.perf_counter() - start
+    print(f"{'resolve_many':<28} {batch * 1e3:>8.2f} ms for {refs} ranges")
+    results['resolve_many_ms'] = batch * 1e3
+    return results
+
+
+def reference_samples(index, aliases, count, rng):
+    """Generate free-form references in mixed styles with their expected OSIS."""
+    book_aliases = {}
+    for alias, book_id in aliases.items():
+        book_aliases.setdefault(book_id, []).append(alias)
+    samples = []
+    for _ in range(count):
+        ordinal = rng.randrange(index.verse_count)
+        book_id, chapter, verse = index.location(ordinal)
+        alias = rng.choice(book_aliases[book_id])
+        name = alias.title() if rng.random() < 0.5 else alias.upper()
+        chapter_last = index.chapter_range(book_id, chapter)[1]
+        end = verse + min(rng.randrange(1, 8), chapter_last - ordinal)
+        single = book_id in ('Obad', 'Phlm', '2John', '3John', 'Jude')
+        style = rng.randrange(6)
+        if style == 0 or single:
+            text = f"{name} {verse}" if single else f"{name} {chapter}:{verse}"
+            osis = f"{book_id}.{chapter}.{verse}"
+        elif style == 1:
+            text = f"{name}{chapter}:{verse}"
+            osis = f"{book_id}.{chapter}.{verse}"
+        elif style == 2:
+            text = f"{name} {chapter}"
+            osis = f"{book_id}.{chapter}"
+        elif style == 3:
+            # Split parts of one verse (Gen 1:9a-b)
+            text = f"{name} {chapter}:{verse}a-b"
+            osis = f"{book_id}.{chapter}.{verse}a-{book_id}.{chapter}.{verse}b"
+        elif style == 4 and end > verse:
+            text = f"{name} {chapter}:{verse}b-{end}a"
+            osis = f"{book_id}.{chapter}.{verse}b-{book_id}.{chapter}.{end}a"
+        else:
+            text = f"{name} {chapter}:{verse}-{end}"
+            osis = (f"{book_id}.{chapter}.{verse}-{book_id}.{chapter}.{end}"
+                    if end > verse else f"{book_id}.{chapter}.{verse}")
+            if end == verse:
+                text = f"{name} {chapter}:{verse}"
+        samples.append((text, osis))
+    return samples
+
+
+def benchmark_reference_parser(refs=20000, setlist_size=6):
+    """Measure free-form reference parsing, single strings and setlist batches."""
+    start = time.perf_counter()
+    parser = reference_parser.ReferenceParser.load()
+    build_time = time.perf_counter() - start
+
+    rng = random.Random(0)
+    aliases = reference_parser.load_aliases()
+    samples = reference_samples(parser.index, aliases, refs, rng)
+    texts = [text for text, _ in samples]
+    correct = sum(parser.parse(text) == [osis] for text, osis in samples)
+    # Setlists: several references per line, drawn from a small pool so lines repeat
+    pool = texts[:500]
+    setlists = ['; '.join(rng.choice(pool) for _ in range(setlist_size))
+                for _ in range(refs // setlist_size)]
+    repeated = [rng.choice(setlists[:200]) for _ in range(len(setlists))]
+
+    print("reference_parser.ReferenceParser")
+    print("-" * 60)
+    print(f"Build: {build_time * 1e3:.2f} ms for {len(aliases)} aliases")
+    print(f"Accuracy: {correct}/{len(samples)} generated references parse as expected")
+
+    parse_time = time_function(parser.parse, texts, 3)
+    setlist_time = time_function(parser.parse, setlists, 3)
+    start = time.perf_counter()
+    parsed = parser.parse_batch(repeated)
+    batch_time = time.perf_counter() - start
+    resolve_time = time_function(parser.parse_ranges, texts, 1)
+    setlist_refs = sum(len(refs) for refs in parsed)
+
+    print(f"{'parse':<28} {parse_time / len(texts) * 1e6:>8.2f} us/ref  "
+          f"{len(texts) / parse_time:>10.0f} refs/s")
+    print(f"{'parse setlist lines':<28} {setlist_time / len(setlists) * 1e6:>8.2f} us/line "
+          f"{len(setlists) * setlist_size / setlist_time:>10.0f} refs/s")
+    print(f"{'parse_batch (repeats)':<28} {batch_time * 1e3:>8.2f} ms for {len(repeated)} "
+          f"lines, {setlist_refs} refs")
+    print(f"{'parse + resolve':<28} {resolve_time / len(texts) * 1e6:>8.2f} us/ref")
+    return {
+        'build_ms': build_time * 1e3,
+        'accuracy': correct / len(samples),
+        'parse_us': parse_time / len(texts) * 1e6,
+        'setlist_line_us': setlist_time / len(setlists) * 1e6,
+        'batch_ms': batch_time * 1e3,
+        'parse_resolve_us': resolve_time / len(texts) * 1e6,
+    }
+
+
+def benchmark_compact_format(json_dir, repeat=3):
+    """Compare the dict and compact chapter JSON layouts."""
+    print("Compact chapter JSON")
+    print("-" * 60)
+    summary = compact_chapters.compare_formats(json_dir, repeat=max(repeat, 10))
+    compact_chapters.print_comparison(summary)
+    results = {'round_trip_mismatches': len(summary['round_trip_mismatches'])}
+    for label in ('dict', 'compact'):
+        for key, value in summary[label].items():
+            if value is not None:
+                results[f'{label}_{key}'] = value
+    return results
+
+
+def benchmark_corpus_server(json_dir, sources=8, reloads=300):
+    """Serve the corpus locally and replay OBS-style reload churn against it.
+
+    Each source keeps one keep-alive connection and mostly reloads the
+    chapters of a shared setlist, revalidating with If-None-Match the way a
+    browser does; one request in five asks for a random chapter or range.
+    """
+    print("corpus_server")
+    print("-" * 60)
+    start = time.perf_counter()
+    service = corpus_server.CorpusService.load(json_dir, DEFAULT_STRUCTURE)
+    load_time = time.perf_counter() - start
+    server = corpus_server.CorpusServer(('127.0.0.1', 0), service)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    rng = random.Random(0)
+    chapters = [chapter.id.split('.') for chapter in service.corpus.chapters]
+    setlist = [f"/chapter/{book_id}/{number}" for book_id, number in rng.sample(chapters, 8)]
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+
+    def source(seed):
+        source_rng = random.Random(seed)
+        connection = http.client.HTTPConnection('127.0.0.1', server.server_address[1])
+        etags = {}
+        samples = []
+        seen = {}
+        for _ in range(reloads):
+            if source_rng.random() < 0.8:
+                path = source_rng.choice(setlist)
+            elif source_rng.random() < 0.5:
+                book_id, number = source_rng.choice(chapters)
+                path = f"/chapter/{book_id}/{number}"
+            else:
+                book_id, number = source_rng.choice(chapters)
+                path = f"/range/{book_id}.{number}.1-{book_id}.{number}.3"
+            headers = {'Accept-Encoding': 'gzip'}
+            if path in etags:
+                headers['If-None-Match'] = etags[path]
+            request_start = time.perf_counter()
+            connection.request('GET', path, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            samples.append(time.perf_counter() - request_start)
+            etags[path] = response.getheader('ETag')
+            seen[response.status] = seen.get(response.status, 0) + 1
+        connection.close()
+        with lock:
+            latencies.extend(samples)
+            for status, count in seen.items():
+                statuses[status] = statuses.get(status, 0) + count
+
+    start = time.perf_counter()
+    workers = [threading.Thread(target=source, args=(seed,)) for seed in range(sources)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+    cache = server.cache.stats()
+    server.shutdown()
+    server.server_close()
+
+    print(f"{'load corpus':<28} {load_time * 1e3:>8.2f} ms")
+    print(f"{'requests':<28} {len(latencies):>8} from {sources} sources "
+          f"({statuses.get(304, 0)} x 304)")
+    print(f"{'throughput':<28} {len(latencies) / elapsed:>8.0f} req/s")
+    p = print_percentiles('request latency', latencies, 1e3, 'ms')
+    print(f"{'cache hit rate':<28} {cache['hit_rate']:>8.1%} "
+          f"({cache['entries']} entries, {cache['bytes'] / 1024:.0f} KB)")
+
+    return {
+        'load_ms': load_time * 1e3,
+        'requests_per_sec': len(latencies) / elapsed,
+        'not_modified_rate': statuses.get(304, 0) / len(latencies),
+        'hit_rate': cache['hit_rate'],
+        **{f'latency_p{point}_ms': value * 1e3 for point, value in p.items()},
+    }
+
+
+def benchmark_similar_verses(corpus_dir, jobs=None, sample=500):
+    """Time the similar verse build per stage and check its recall."""
+    print("similar_verses")
+    print("-" * 60)
+    structure = verse_ordinals.load_structure(DEFAULT_STRUCTURE)
+    verse_count = verse_ordinals.VerseIndex(structure).verse_count
+    jobs = jobs or os.cpu_count() or 1
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = Path(tmp_dir) / 'similar_verses.bin'
+        summary = similar_verses.build_similar_verses(
+            similar_verses.collect_verse_texts(corpus_dir, structure), verse_count, path,
+            jobs=jobs)
+        table = similar_verses.SimilarVerses(path)
+    recall = similar_verses.check_recall(*summary['matrix'], table, sample)
+
+    total = 0.0
+    results = {}
+    for name, stage in summary['timings'].items():
+        print(f"{name + ' (extraction included)' if name == 'shingle' else name:<36} "
+              f"{stage['wall']:>8.2f} s")
+        results[f'{name}_seconds'] = stage['wall']
+        total += stage['wall']
+    print(f"{'total':<36} {total:>8.2f} s ({jobs} jobs)")
+    print(f"{'candidate pairs':<36} {summary['candidate_pairs']:>8}")
+    print(f"{'verses with neighbours':<36} {summary['verses_with_neighbors']:>8}")
+    print(f"{'table size':<36} {summary['bytes'] / 1024:>8.0f} KB")
+    print(f"{'recall vs brute-force Jaccard':<36} {recall['recall']:>8.1%} "
+          f"({recall['expected']} neighbours, {recall['sampled']} verses)")
+    print(f"{'brute force per verse':<36} {recall['brute_force_ms']:>8.2f} ms")
+    print(f"{'table lookup per verse':<36} {recall['lookup_us']:>8.2f} us")
+    results.update({
+        'total_seconds': total,
+        'candidate_pairs': summary['candidate_pairs'],
+        'size_kb': summary['bytes'] / 1024,
+        'recall': recall['recall'],
+        'brute_force_ms': recall['brute_force_ms'],
+        'lookup_us': recall['lookup_us'],
+    })
+    return results
+
+
+STATS_TERMS = ['god', 'lord', 'jerusalem', 'firmament', 'love', 'faith', 'grace', 'shepherd']
+
+
+def benchmark_corpus_stats(json_dir, repeat=3):
+    """Compare the cached stats matrix with re-reading the JSON per question."""
+    print("corpus_stats")
+    print("-" * 60)
+    structure = verse_ordinals.load_structure(DEFAULT_STRUCTURE)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache_path = Path(tmp_dir) / 'corpus_stats.npz'
+        start = time.perf_counter()
+        corpus_stats.CorpusStats.load(json_dir, DEFAULT_STRUCTURE, cache_path)
+        build_time = time.perf_counter() - start
+        cache_bytes = cache_path.stat().st_size
+        load_time = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            stats, _ = corpus_stats.CorpusStats.load(json_dir, DEFAULT_STRUCTURE, cache_path)
+            load_time = min(load_time, time.perf_counter() - start)
+
+    # What a one-off script does: re-read every chapter and count one word
+    def rescan(term):
+        return sum(search_index.normalize_terms(text).count(term) for _, text
+                   in search_index.load_verse_texts(json_dir, structure))
+
+    start = time.perf_counter()
+    rescan(STATS_TERMS[0])
+    rescan_time = time.perf_counter() - start
+
+    queries = {
+        'frequency': lambda term: stats.frequency(term),
+        'by_category': lambda term: stats.by_category(term),
+        'clusters': lambda term: stats.clusters(term),
+        'top_terms': lambda _: stats.top_terms(20),
+        'length_distribution': lambda _: stats.length_distribution(),
+        'vocabulary_sizes': lambda _: stats.vocabulary_sizes(),
+    }
+    print(f"{'build (JSON read included)':<36} {build_time * 1e3:>8.0f} ms "
+          f"({cache_bytes / 1024:.0f} KB cache)")
+    print(f"{'cached load':<36} {load_time * 1e3:>8.1f} ms")
+    print(f"{'re-read JSON for one frequency':<36} {rescan_time * 1e3:>8.0f} ms")
+    results = {
+        'build_seconds': build_time,
+        'load_ms': load_time * 1e3,
+        'cache_kb': cache_bytes / 1024,
+        'rescan_ms': rescan_time * 1e3,
+    }
+    for name, query in queries.items():
+        per_query = time_function(query, STATS_TERMS, repeat) / len(STATS_TERMS)
+        print(f"{name:<36} {per_query * 1e3:>8.3f} ms")
+        results[f'{name}_ms'] = per_query * 1e3
+    return results
+
+
+BENCHMARKS = ('tokenizer', 'splitter', 'chapter-extraction', 'full-build', 'structure',
+              'search-index', 'concordance', 'packed-corpus', 'split-profiles', 'verse-index',
+              'reference-parser', 'compact-format', 'corpus-server', 'similar-verses',
+              'corpus-stats')
+
+
+def run_metadata():
+    """Describe the code and machine a set of results came from."""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=SCRIPT_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def print_comparison(baseline, results):
+    """Print the relative change of every metric also present in baseline."""
+    print(f"Comparison with {baseline['metadata'].get('commit') or 'baseline'}")
+    print("-" * 60)
+    for name, metrics in results.items():
+        previous = baseline['results'].get(name, {})
+        for key, value in metrics.items():
+            old = previous.get(key)
+            if not isinstance(old, (int, float)) or not isinstance(value, (int, float)):
+                continue
+            change = f"{(value - old) / old * 100:+7.1f}%" if old else ''
+            print(f"{name + '.' + key:<44} {old:>12.2f} -> {value:>12.2f} {change}")
+
+
+def main():
+    """Main function."""
+    parser = argparse.ArgumentParser(description="Benchmark the data pipeline.")
+    parser.add_argument('--corpus', default=DEFAULT_CORPUS, type=Path,
+                        help="directory of per-book chapter XML")
+    parser.add_argument('--repeat', type=int, default=3,
+                        help="timing repetitions (best is reported)")
+    parser.add_argument('--osis', type=Path,
+                        help="full OSIS file for parse_kjv_bible (default: "
+                             "assembled from the corpus)")
+    parser.add_argument('--only', default=','.join(BENCHMARKS),
+                        help=f"comma-separated benchmarks to run, from: {', '.join(BENCHMARKS)}")
+    parser.add_argument('--jobs', '-j', type=int, default=os.cpu_count() or 1,
+                        help="worker processes for the parallel full build")
+    parser.add_argument('--output', type=Path,
+                        help="write the results as JSON to this file")
+    parser.add_argument('--compare', type=Path,
+                        help="results JSON from an earlier run to compare against")
+    args = parser.parse_args()
+
+    selected = [name.strip() for name in args.only.split(',') if name.strip()]
+    unknown = [name for name in selected if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(unknown)}")
+
+    def structure_benchmark():
+        if args.osis:
+            return benchmark_structure_parser(args.osis)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            osis_path = Path(tmp_dir) / 'kjvfull.xml'
+            build_osis_document(args.corpus, DEFAULT_STRUCTURE, osis_path)
+            return benchmark_structure_parser(osis_path)
+
+    runners = {
+        'tokenizer': lambda: benchmark_tokenizer(args.corpus, repeat=args.repeat),
+        'splitter': lambda: benchmark_splitter(args.corpus, repeat=args.repeat),
+        'chapter-extraction': lambda: benchmark_chapter_extraction(args.corpus),
+        'full-build': lambda: benchmark_full_build(args.corpus, jobs=args.jobs),
+        'structure': structure_benchmark,
+        'search-index': lambda: benchmark_search_index(DEFAULT_JSON_DIR, repeat=args.repeat),
+        'concordance': lambda: benchmark_concordance(args.corpus, repeat=args.repeat),
+        'packed-corpus': lambda: benchmark_packed_corpus(DEFAULT_JSON_DIR),
+        'split-profiles': lambda: benchmark_split_profiles(args.corpus),
+        'verse-index': benchmark_verse_index,
+        'reference-parser': benchmark_reference_parser,
+        'compact-format': lambda: benchmark_compact_format(DEFAULT_JSON_DIR, repeat=args.repeat),
+        'corpus-server': lambda: benchmark_corpus_server(DEFAULT_JSON_DIR),
+        'similar-verses': lambda: benchmark_similar_verses(args.corpus, jobs=args.jobs),
+        'corpus-stats': lambda: benchmark_corpus_stats(DEFAULT_JSON_DIR, repeat=args.repeat),
+    }
+
+    results = {}
+    for name in BENCHMARKS:
+        if name in selected:
+            results[name] = runners[name]()
+            print()
+
+    report = {'metadata': run_metadata(), 'results': results}
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results saved to: {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            print_comparison(json.load(f), results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+"""
+Compact in-memory model of the whole Bible.
+
+The scripts each hold the Bible as nested dicts of strings: the structure
+from parse_kjv_bible, a {osis_id: text} dict per chapter in the extractor,
+the re-read kjv_structure.json in generate_book_names. Corpus keeps the
+same data in a few flat containers:
+
+  Book / Chapter   __slots__ records, one per book and chapter, with
+                   interned book IDs and integer chapter numbers
+  text buffer      every verse's unsplit text as one UTF-8 bytes object,
+                   in verse ordinal order (see verse_ordinals.py)
+  offsets          array('I') of byte offsets, one per verse plus a sentinel
+
+A Corpus loads from the OSIS source (one streaming pass) or from the
+generated chapter JSON. to_structure() and chapter_verses() give the dict
+forms the other scripts take, so one loaded model can drive the structure,
+book name and chapter JSON outputs.
+"""
+
+import argparse
+import json
+import sys
+import time
+from array import array
+from pathlib import Path
+
+import build_bible_data
+import extract_verses_to_json as extractor
+import generate_book_names
+import parse_kjv_bible
+import search_index
+import verse_ordinals
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+DEFAULT_OSIS = SCRIPT_DIR / 'kjvfull.xml'
+DEFAULT_JSON_DIR = SCRIPT_DIR / 'output_chapters_json'
+
+TESTAMENT_NAMES = {'old_testament': 'Old Testament', 'new_testament': 'New Testament'}
+
+
+class Book:
+    """One book: its ID, title, category, testament and chapters."""
+
+    __slots__ = ('id', 'title', 'category', 'testament', 'index', 'chapters')
+
+    def __init__(self, book_id, title, category, testament, index):
+        self.id = sys.intern(book_id)
+        self.title = title
+        self.category = sys.intern(category)
+        self.testament = sys.intern(testament)
+        self.index = index
+        self.chapters = []
+
+    @property
+    def verse_count(self):
+        return sum(chapter.verse_count for chapter in self.chapters)
+
+    def __repr__(self):
+        return f"Book({self.id!r}, {len(self.chapters)} chapters)"
+
+
+class Chapter:
+    """One chapter: its book, number and the ordinal range of its verses."""
+
+    __slots__ = ('book', 'number', 'first_verse', 'verse_count')
+
+    def __init__(self, book, number, first_verse, verse_count):
+        self.book = book
+        self.number = number
+        self.first_verse = first_verse
+        self.verse_count = verse_count
+
+    @property
+    def id(self):
+        return f"{self.book.id}.{self.number}"
+
+    def __repr__(self):
+        return f"Chapter({self.id!r}, {self.verse_count} verses)"
+
+
+class Corpus:
+    """Books, chapters and verse text in flat, array-backed storage."""
+
+    __slots__ = ('books', 'chapters', 'verse_count', '_book_index', '_text', '_offsets')
+
+    def __init__(self):
+        self.books = []
+        self.chapters = []
+        self.verse_count = 0
+        self._book_index = {}
+        self._text = b''
+        self._offsets = array('I', [0])
+
+    def add_book(self, book_id, title, category, testament):
+        """Append a book; its chapters must be added next."""
+        book = Book(book_id, title, category, testament, len(self.books))
+        self.books.append(book)
+        self._book_index[book.id] = book
+        return book
+
+    def add_chapter(self, book, number, verse_count):
+        """Append the next chapter of the last book added."""
+        chapter = Chapter(book, int(number), self.verse_count, verse_count)
+        book.chapters.append(chapter)
+        self.chapters.append(chapter)
+        self.verse_count += verse_count
+        return chapter
+
+    def set_texts(self, verse_texts):
+        """Store verse text from (ordinal, text) pairs; missing verses are empty."""
+        texts = [b''] * self.verse_count
+        for ordinal, text in verse_texts:
+            texts[ordinal] = text.encode('utf-8')
+        offsets = array('I', [0] * (self.verse_count + 1))
+        position = 0
+        for ordinal, data in enumerate(texts):
+            position += len(data)
+            offsets[ordinal + 1] = position
+        self._text = b''.join(texts)
+        self._offsets = offsets
+
+    @classmethod
+    def from_structure(cls, structure):
+        """Build books and chapters (without text) from a kjv_structure dict."""
+        corpus = cls()
+        for testament, testament_info in structure.items():
+            for book_id, book_info in testament_info['books'].items():
+                book = corpus.add_book(book_id, book_info['title'],
+                                       book_info['category'], testament)
+                for chapter_num in sorted(book_info['chapters'], key=int):
+                    corpus.add_chapter(book, chapter_num, book_info['chapters'][chapter_num])
+        return corpus
+
+    @classmethod
+    def from_osis(cls, xml_path=DEFAULT_OSIS):
+        """Load structure and verse text from an OSIS file in one streaming pass.
+
+        Chapters come from build_bible_data.iter_chapters and their text from
+        the extractor's tokenizer. As in parse_kjv_bible, books outside the
+        two testaments are left out. A joined verse ("Rom.16.25 Rom.16.26")
+        is stored at its first ID. Raises ValueError for verse IDs outside
+        the chapter they appear in, which would otherwise land on another
+        verse's slot.
+        """
+        corpus = cls()
+        verse_texts = []
+        misplaced = []
+        book = None
+        for book_id, book_title, chapter_num, verse_count, chapter_xml in (
+                build_bible_data.iter_chapters(xml_path)):
+            if book is None or book.id != book_id:
+                if book_id in parse_kjv_bible.OLD_TESTAMENT_BOOKS:
+                    testament = 'old_testament'
+                elif book_id in parse_kjv_bible.NEW_TESTAMENT_BOOKS:
+                    testament = 'new_testament'
+                else:
+                    book = None
+                    continue
+                book = corpus.add_book(book_id, book_title,
+                                       parse_kjv_bible.BOOK_CATEGORIES.get(book_id, 'Unknown'),
+                                       testament)
+            chapter = corpus.add_chapter(book, chapter_num, verse_count)
+            for osis_id, text in extractor.extract_verse_texts(
+                    chapter_xml.splitlines(keepends=True)).items():
+                try:
+                    ordinal = corpus.ordinal_of(osis_id.split()[0])
+                except (KeyError, ValueError):
+                    ordinal = None
+                if (ordinal is None or not
+                        chapter.first_verse <= ordinal < chapter.first_verse + verse_count):
+                    misplaced.append(osis_id)
+                    continue
+                verse_texts.append((ordinal, text))
+        if misplaced:
+            raise ValueError(f"{len(misplaced)} verse IDs in {xml_path} fall outside "
+                             f"their chapter: {', '.join(misplaced[:10])}")
+        corpus.set_texts(verse_texts)
+        return corpus
+
+    @classmethod
+    def from_json(cls, json_dir=DEFAULT_JSON_DIR,
+                  structure_path=verse_ordinals.DEFAULT_STRUCTURE):
+        """Load kjv_structure.json and the chapter JSON tree, rejoining split verses."""
+        structure = verse_ordinals.load_structure(structure_path)
+        corpus = cls.from_structure(structure)
+        corpus.set_texts(search_index.load_verse_texts(json_dir, structure))
+        return corpus
+
+    def book(self, book_id):
+        """Return a Book by OSIS ID."""
+        return self._book_index[book_id]
+
+    def chapter(self, book_id, number):
+        """Return a Chapter by book ID and number."""
+        chapters = self._book_index[book_id].chapters
+        number = int(number)
+        if not 1 <= number <= len(chapters):
+            raise KeyError(f"{book_id}.{number}")
+        return chapters[number - 1]
+
+    def ordinal_of(self, osis_id):
+        """Return the ordinal of an OSIS verse ID; split suffixes are ignored."""
+        verse_id, _ = verse_ordinals.split_osis_id(osis_id)
+        book_id, chapter_num, verse_num = verse_id.split('.')
+        chapter = self.chapter(book_id, chapter_num)
+        verse_num = int(verse_num)
+        if not 1 <= verse_num <= chapter.verse_count:
+            raise KeyError(osis_id)
+        return chapter.first_verse + verse_num - 1
+
+    def verse_text(self, ordinal):
+        """Return the text of a verse by ordinal ('' if it has none)."""
+        return self._text[self._offsets[ordinal]:self._offsets[ordinal + 1]].decode('utf-8')
+
+    def verse(self, osis_id):
+        """Return the text of a verse by OSIS ID."""
+        return self.verse_text(self.ordinal_of(osis_id))
+
+    def chapter_verses(self, chapter):
+        """Return {osis_id: text} for a chapter's non-empty verses, as the extractor does."""
+        prefix = f"{chapter.id}."
+        verses = {}
+        for verse_num in range(1, chapter.verse_count + 1):
+            text = self.verse_text(chapter.first_verse + verse_num - 1)
+            if text:
+                verses[f"{prefix}{verse_num}"] = text
+        return verses
+
+    def to_structure(self):
+        """Return the kjv_structure.json dict for the corpus."""
+        structure = {}
+        for book in self.books:
+            testament = structure.setdefault(book.testament, {
+                'name': TESTAMENT_NAMES.get(book.testament, book.testament),
+                'books': {},
+            })
+            book_info = parse_kjv_bible.new_book_entry(book.id, book.title)
+            book_info['category'] = book.category
+            for chapter in book.chapters:
+                book_info['chapters'][str(chapter.number)] = chapter.verse_count
+            parse_kjv_bible.finish_book_entry(book_info)
+            testament['books'][book.id] = book_info
+        return structure
+
+    def to_dicts(self):
+        """Return the dict-of-dicts form the scripts build today.
+
+        That is the structure dict plus {book_id: {chapter: {osis_id: text}}}.
+        """
+        chapters = {}
+        for chapter in self.chapters:
+            chapters.setdefault(chapter.book.id, {})[str(chapter.number)] = (
+                self.chapter_verses(chapter))
+        return {'structure': self.to_structure(), 'chapters': chapters}
+
+
+def deep_sizeof(obj, seen=None):
+    """Return the bytes held by obj and everything it references, once each."""
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(key, seen) + deep_sizeof(value, seen)
+                    for key, value in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    elif hasattr(obj, '__slots__'):
+        size += sum(deep_sizeof(getattr(obj, name), seen)
+                    for name in obj.__slots__ if hasattr(obj, name))
+    return size
+
+
+def footprint_report(corpus):
+    """Compare the memory held by the corpus and by the dict-of-dicts form."""
+    dicts = corpus.to_dicts()
+    rows = {
+        'corpus': deep_sizeof(corpus),
+        'corpus text buffer': sys.getsizeof(corpus._text),
+        'corpus offsets': sys.getsizeof(corpus._offsets),
+        'dict-of-dicts': deep_sizeof(dicts),
+        'dict structure only': deep_sizeof(dicts['structure']),
+    }
+    return rows
+
+
+def main():
+    """Main function."""
+    parser = argparse.ArgumentParser(
+        description="Load the Bible into the compact corpus model and use it.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    footprint_parser = subparsers.add_parser(
+        'footprint', help="compare memory use with the dict-of-dicts form")
+    build_parser = subparsers.add_parser(
+        'build', help="write structure, book names and chapter JSON from one load")
+    build_parser.add_argument('--structure-output', type=Path,
+                              help="write kjv_structure.json here")
+    build_parser.add_argument('--book-names-output', type=Path,
+                              help="write book_names.json here")
+    build_parser.add_argument('--chapters-output', type=Path,
+                              help="write chapter JSON into this directory")
+    build_parser.add_argument('--format', choices=extractor.OUTPUT_FORMATS, default='dict',
+                              help="chapter JSON layout")
+
+    for subparser in (footprint_parser, build_parser):
+        subparser.add_argument('--source', choices=('osis', 'json'), default='json',
+                               help="load from the OSIS file or the chapter JSON tree")
+        subparser.add_argument('--osis', default=DEFAULT_OSIS, type=Path,
+                               help="OSIS source file")
+        subparser.add_argument('--json-dir', default=DEFAULT_JSON_DIR, type=Path,
+                               help="chapter JSON directory")
+        subparser.add_argument('--structure', default=verse_ordinals.DEFAULT_STRUCTURE,
+                               type=Path, help="kjv_structure.json (for --source json)")
+    args = parser.parse_args()
+
+    start_time = time.perf_counter()
+    if args.source == 'osis':
+        if not args.osis.exists():
+            print(f"Source file not found: {args.osis}")
+            return
+        try:
+            corpus = Corpus.from_osis(args.osis)
+        except ValueError as e:
+            parser.error(str(e))
+    else:
+        corpus = Corpus.from_json(args.json_dir, args.structure)
+    load_time = time.perf_counter() - start_time
+    print(f"Loaded {len(corpus.books)} books, {len(corpus.chapters)} chapters, "
+          f"{corpus.verse_count} verses from {args.source} in {load_time:.2f}s")
+
+    if args.command == 'footprint':
+        rows = footprint_report(corpus)
+        print(f"\n{'representation':<24} {'MB':>8}")
+        for label, size in rows.items():
+            print(f"{label:<24} {size / (1024 * 1024):>8.2f}")
+        print(f"\nCorpus uses {rows['corpus'] / rows['dict-of-dicts']:.1%} "
+              f"of the dict-of-dicts memory")
+        return
+
+    if args.structure_output:
+        parse_kjv_bible.save_to_json(corpus.to_structure(), args.structure_output)
+    if args.book_names_output:
+        book_names = generate_book_names.build_book_names(corpus.to_structure(), verbose=False)
+        with open(args.book_names_output, 'w', encoding='utf-8') as f:
+            json.dump(book_names, f, indent=2, ensure_ascii=False)
+        print(f"Book names saved to: {args.book_names_output}")
+    if args.chapters_output:
+        written = 0
+        serialize = extractor.SERIALIZERS[args.format]
+        for chapter in corpus.chapters:
+            verse_texts = corpus.chapter_verses(chapter)
+            if not verse_texts:
+                continue
+            verses = extractor.split_verses(verse_texts)
+            book_dir = args.chapters_output / chapter.book.id
+            book_dir.mkdir(parents=True, exist_ok=True)
+            extractor.write_atomic(book_dir / f"{chapter.book.id}_{chapter.number}.json",
+                                   serialize(verses))
+            written += 1
+        print(f"Chapter JSON written: {written} files to {args.chapters_output}")
+
+
+if __name__ == "__main__":
+    main()
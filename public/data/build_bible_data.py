@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Build every published Bible data artifact from the OSIS source in one pass.
+
+The monolithic OSIS file (kjvfull.xml) is streamed once. As each chapter
+element completes it is serialized in the same layout as output_chapters/
+and handed straight to the verse extractor, so the structure file, book
+name map, chapter XML and chapter JSON all come from a single parse with
+no intermediate files on the critical path.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import time
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+import extract_verses_to_json as extractor
+import generate_book_names
+import packed_corpus
+import parse_kjv_bible
+import search_index
+import similar_verses
+import strongs_concordance
+import verse_ordinals
+
+STAGES = ('structure', 'book-names', 'chapter-xml', 'chapter-json', 'search-index',
+          'concordance', 'packed-corpus', 'study-notes', 'interlinear', 'similar-verses')
+# Stages built from the whole-verse text of every chapter
+CORPUS_STAGES = ('search-index', 'packed-corpus', 'similar-verses')
+DEFAULT_STAGES = ('structure', 'book-names', 'chapter-json')
+
+# Namespace-qualified tags of the OSIS elements the pipeline reacts to
+OSIS = '{%s}' % parse_kjv_bible.OSIS_NS
+TAG_OSIS = OSIS + 'osis'
+TAG_OSIS_TEXT = OSIS + 'osisText'
+TAG_HEADER = OSIS + 'header'
+TAG_DIV = OSIS + 'div'
+TAG_TITLE = OSIS + 'title'
+TAG_CHAPTER = OSIS + 'chapter'
+TAG_VERSE = OSIS + 'verse'
+
+
+def iter_chapters(xml_path):
+    """Stream an OSIS file, yielding one tuple per chapter.
+
+    Each tuple is (book_id, book_title, chapter_num, verse_count,
+    chapter_xml). Verses are counted by their sID milestones. chapter_xml
+    is the chapter wrapped in the same standalone document (root
+    attributes, header, book div and main title) as the files in
+    output_chapters/. Everything outside the open chapter is detached from
+    the tree as soon as it ends, so memory holds one chapter at a time.
+    """
+    root_attrib = {}
+    osis_text_attrib = {}
+    header = None
+    book_attrib = None
+    book_title = None
+    open_elements = []
+    # Subtree (chapter, header or book title) being kept whole until it ends
+    captured = None
+
+    for event, elem in ET.iterparse(xml_path, events=('start', 'end')):
+        if event == 'start':
+            open_elements.append(elem)
+            if captured is not None:
+                continue
+
+            if elem.tag == TAG_OSIS:
+                root_attrib = dict(elem.attrib)
+            elif elem.tag == TAG_OSIS_TEXT:
+                osis_text_attrib = dict(elem.attrib)
+            elif _is_book_div(elem):
+                book_attrib = dict(elem.attrib)
+                book_title = None
+            elif (elem.tag == TAG_CHAPTER
+                    or (elem.tag == TAG_HEADER and header is None)
+                    or (elem.tag == TAG_TITLE and elem.get('type') == 'main'
+                        and book_attrib is not None and book_title is None
+                        and _is_book_div(open_elements[-2]))):
+                captured = elem
+            continue
+
+        open_elements.pop()
+
+        # Descendants of a captured subtree are kept until it ends
+        if captured is not None and elem is not captured:
+            continue
+        was_captured = captured is elem
+        captured = None
+
+        keep = False
+        if elem.tag == TAG_CHAPTER:
+            book_id = book_attrib['osisID']
+            chapter_num = elem.get('osisID').split('.')[-1]
+            verse_count = sum(1 for verse in elem.iter(TAG_VERSE)
+                              if verse.get('sID') is not None)
+            title_text = book_title.text if book_title is not None else book_id
+            yield (book_id, title_text, chapter_num, verse_count,
+                   _chapter_document(root_attrib, osis_text_attrib, header,
+                                     book_attrib, book_title, elem))
+        elif elem.tag == TAG_HEADER and was_captured:
+            header = elem
+            keep = True
+        elif elem.tag == TAG_TITLE and was_captured:
+            book_title = elem
+            keep = True
+        elif _is_book_div(elem):
+            book_attrib = None
+
+        if open_elements:
+            open_elements[-1].remove(elem)
+        if not keep:
+            elem.clear()
+
+
+def _is_book_div(elem):
+    """Check whether an element is an OSIS book div."""
+    return elem.tag == TAG_DIV and elem.get('type') == 'book'
+
+
+def _chapter_document(root_attrib, osis_text_attrib, header, book_attrib,
+                      book_title, chapter):
+    """Serialize one chapter as a standalone OSIS document string."""
+    root = ET.Element('osis', root_attrib)
+    osis_text = ET.SubElement(root, 'osisText', osis_text_attrib)
+
+    if header is not None:
+        header.tail = '\n'
+        osis_text.append(header)
+
+    div = ET.SubElement(osis_text, 'div', book_attrib)
+    div.text = None
+    if book_title is not None:
+        book_title.tail = '\n'
+        div.append(book_title)
+    chapter.tail = '\n'
+    div.append(chapter)
+
+    body = ET.tostring(root, encoding='unicode')
+    return "<?xml version='1.0' encoding='utf-8'?>\n" + body
+
+
+def build_bible_data(xml_path, output_dir, stages=DEFAULT_STAGES):
+    """Run the selected stages over one streaming pass of the OSIS source."""
+    start_time = time.perf_counter()
+    output_path = Path(output_dir)
+    xml_dir = output_path / 'output_chapters'
+    json_dir = output_path / 'output_chapters_json'
+
+    settings = extractor.build_settings(study_notes='study-notes' in stages,
+                                        interlinear='interlinear' in stages)
+    manifest_chapters = {}
+    extract_verses = any(stage in stages for stage in
+                         ('chapter-json', 'concordance', 'study-notes', 'interlinear')
+                         + CORPUS_STAGES)
+    collect_verses = any(stage in stages for stage in CORPUS_STAGES)
+    all_verses = []
+    verse_lemmas = []
+    verse_notes = []
+    verse_words = []
+    on_verse = None
+    if any(stage in stages for stage in ('concordance', 'study-notes', 'interlinear')):
+        def on_verse(osis_id, verse_content):
+            if 'concordance' in stages:
+                verse_lemmas.append((osis_id, strongs_concordance.extract_lemmas(verse_content)))
+            if 'study-notes' in stages:
+                notes = extractor.extract_study_notes(verse_content)
+                if notes:
+                    verse_notes.append((osis_id, notes))
+            if 'interlinear' in stages:
+                verse_words.append((osis_id, extractor.extract_word_tokens(verse_content)))
+    bible_structure = {}
+    chapter_files = 0
+    verse_total = 0
+    entry_total = 0
+
+    for book_id, book_title, chapter_num, verse_count, chapter_xml in iter_chapters(xml_path):
+        stem = f"{book_id}_{chapter_num}"
+
+        if book_id not in bible_structure:
+            bible_structure[book_id] = parse_kjv_bible.new_book_entry(book_id, book_title)
+            print(f"Processing book: {book_id}")
+        bible_structure[book_id]['chapters'][chapter_num] = verse_count
+
+        source_bytes = chapter_xml.encode('utf-8')
+
+        if 'chapter-xml' in stages:
+            (xml_dir / book_id).mkdir(parents=True, exist_ok=True)
+            extractor.write_atomic(xml_dir / book_id / f"{stem}.xml", source_bytes)
+
+        if extract_verses:
+            verse_texts = extractor.extract_verse_texts(
+                chapter_xml.splitlines(keepends=True), on_verse)
+            verses = extractor.split_verses(verse_texts)
+            if collect_verses:
+                all_verses.extend(verses.items())
+            if verses and 'chapter-json' in stages:
+                (json_dir / book_id).mkdir(parents=True, exist_ok=True)
+                data = extractor.serialize_verses(verses)
+                extractor.write_atomic(json_dir / book_id / f"{stem}.json", data)
+                manifest_chapters[f"{book_id}/{stem}.json"] = extractor.manifest_entry(
+                    f"{book_id}/{stem}.xml",
+                    hashlib.sha256(source_bytes).hexdigest(),
+                    hashlib.sha256(data).hexdigest(),
+                    settings)
+                verse_total += len(verse_texts)
+                entry_total += len(verses)
+
+        chapter_files += 1
+
+    for book_info in bible_structure.values():
+        parse_kjv_bible.finish_book_entry(book_info)
+    structure = parse_kjv_bible.organize_by_testament(bible_structure)
+
+    if 'structure' in stages:
+        parse_kjv_bible.save_to_json(structure, output_path / 'kjv_structure.json')
+
+    if 'book-names' in stages:
+        book_names = generate_book_names.build_book_names(structure, verbose=False)
+        data = json.dumps(book_names, indent=2, ensure_ascii=False).encode('utf-8')
+        extractor.write_atomic(output_path / 'book_names.json', data)
+        print(f"Book names saved to: {output_path / 'book_names.json'}")
+        book_aliases = generate_book_names.build_book_aliases(book_names, verbose=False)
+        data = json.dumps(book_aliases, indent=2, ensure_ascii=False).encode('utf-8')
+        extractor.write_atomic(output_path / 'book_aliases.json', data)
+
+    if 'chapter-json' in stages:
+        extractor.save_manifest(json_dir / extractor.MANIFEST_FILENAME,
+                                manifest_chapters, settings)
+
+    ordinals = verse_ordinals.build_ordinal_lookup(structure)
+
+    verse_texts = [(ordinals[osis_id], text) for osis_id, text
+                   in verse_ordinals.join_split_verses(all_verses)]
+
+    if 'search-index' in stages:
+        summary = search_index.build_search_index(verse_texts, output_path / 'search_index')
+        print(f"Search index: {summary['term_count']} terms in "
+              f"{summary['shard_count']} shards")
+
+    if 'packed-corpus' in stages:
+        summary = packed_corpus.write_packed_corpus(
+            verse_texts, structure, output_path / 'kjv_corpus.bin')
+        print(f"Packed corpus: {summary['verse_count']} verses, "
+              f"{summary['bytes'] / 1024:.0f} KB")
+
+    if 'similar-verses' in stages:
+        summary = similar_verses.build_similar_verses(
+            verse_texts, len(ordinals), output_path / 'similar_verses.bin',
+            jobs=os.cpu_count() or 1)
+        print(f"Similar verses: {summary['verses_with_neighbors']} verses with neighbours, "
+              f"{summary['bytes'] / 1024:.0f} KB")
+
+    if 'concordance' in stages:
+        summary = strongs_concordance.write_concordance(
+            verse_lemmas, ordinals, output_path / 'strongs_concordance.bin')
+        print(f"Strong's concordance: {summary['lemma_count']} lemmas, "
+              f"{summary['occurrences']} occurrences")
+
+    if 'study-notes' in stages:
+        summary = extractor.write_study_notes(output_path / 'study_notes', structure, verse_notes)
+        print(f"Study notes: {summary['notes']} notes on {summary['verses']} verses in "
+              f"{summary['books']} book shards")
+
+    if 'interlinear' in stages:
+        chapter_words = {}
+        for osis_id, tokens in verse_words:
+            book_id, chapter_num, verse_num = osis_id.split('.')
+            chapter_words.setdefault(f"{book_id}/{book_id}_{chapter_num}.json", []).append(
+                (int(verse_num), tokens))
+        summary = extractor.write_interlinear(output_path / 'output_interlinear', chapter_words)
+        print(f"Interlinear: {summary['tokens']} words in {summary['chapters']} chapters "
+              f"({summary['bytes'] / 1024:.0f} KB), {summary['lemmas']} lemmas, "
+              f"{summary['morphs']} morph codes")
+
+    elapsed = time.perf_counter() - start_time
+    print(f"\nChapters streamed: {chapter_files}")
+    if 'chapter-json' in stages:
+        print(f"Total verses written: {verse_total} "
+              f"({entry_total} entries, split parts counted separately)")
+    print(f"Stages: {', '.join(s for s in STAGES if s in stages)}")
+    print(f"Elapsed: {elapsed:.2f}s")
+
+    return structure
+
+
+def main():
+    """Main function."""
+    script_dir = Path(__file__).resolve().parent
+
+    parser = argparse.ArgumentParser(
+        description="Build all Bible data artifacts from one pass over an OSIS file.")
+    parser.add_argument('xml_path', nargs='?', default=script_dir / 'kjvfull.xml',
+                        type=Path, help="OSIS source file (default: kjvfull.xml)")
+    parser.add_argument('--output-dir', default=script_dir, type=Path,
+                        help="directory to write artifacts into")
+    parser.add_argument('--stages', default=','.join(DEFAULT_STAGES),
+                        help=f"comma-separated stages to run, from: {', '.join(STAGES)}")
+    args = parser.parse_args()
+
+    stages = [s.strip() for s in args.stages.split(',') if s.strip()]
+    unknown = [s for s in stages if s not in STAGES]
+    if unknown:
+        parser.error(f"unknown stage(s): {', '.join(unknown)}")
+
+    if not args.xml_path.exists():
+        print(f"Source file not found: {args.xml_path}")
+        return
+
+    build_bible_data(args.xml_path, args.output_dir, stages)
+
+
+if __name__ == "__main__":
+    main()
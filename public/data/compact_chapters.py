@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Compact columnar chapter JSON.
+
+The default chapter JSON repeats the full OSIS key for every verse and is
+pretty-printed. The compact form stores the book and chapter once, then a
+verse-number array and a parallel text array, minified:
+
+  {"format":1,"book":"Gen","chapter":31,
+   "verses":[1,2,...,42,"43a","43b",...],"text":["...","...",...]}
+
+Whole verses are plain integers; split parts are strings carrying their
+suffix ("43a"). extract_verses_to_json.py --format compact writes this
+form; decode_chapter() rebuilds the dict form exactly, keys and
+order included, so serialize_verses(decode_chapter(...)) reproduces the
+default file byte for byte.
+"""
+
+import argparse
+import gzip
+import json
+import re
+import shutil
+import subprocess
+import time
+from pathlib import Path
+
+import extract_verses_to_json as extractor
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+DEFAULT_JSON_DIR = SCRIPT_DIR / 'output_chapters_json'
+DEFAULT_COMPACT_DIR = SCRIPT_DIR / 'output_chapters_compact'
+
+# Split-part entry of the verse array
+_PART_RE = re.compile(r'^(\d+)([a-z])$')
+
+# Times JSON.parse over groups of documents on stdin (groups separated by
+# \x01, documents by \0), alternating groups; prints the best time of each
+_NODE_PARSE_SCRIPT = """
+const groups = require('fs').readFileSync(0, 'utf8').split('\\x01').map(g => g.split('\\0'));
+const best = groups.map(() => Infinity);
+for (let r = 0; r < Number(process.argv[1]); r++) {
+  groups.forEach((texts, i) => {
+    const start = process.hrtime.bigint();
+    for (const text of texts) JSON.parse(text);
+    best[i] = Math.min(best[i], Number(process.hrtime.bigint() - start) / 1e9);
+  });
+}
+console.log(JSON.stringify(best));
+"""
+
+
+def validate_chapter(compact):
+    """Check a parsed compact chapter; raises ValueError describing the first problem.
+
+    Verses must be positive integers or "<n><suffix>" strings, strictly
+    increasing, with one string per verse in the text array.
+    """
+    if not isinstance(compact, dict):
+        raise ValueError("Compact chapter must be a JSON object")
+    if compact.get('format') != extractor.COMPACT_FORMAT:
+        raise ValueError(f"Unsupported compact format: {compact.get('format')}")
+    book_id = compact.get('book')
+    chapter = compact.get('chapter')
+    verses = compact.get('verses')
+    texts = compact.get('text')
+    if not isinstance(book_id, str) or not isinstance(chapter, int) or chapter < 1:
+        raise ValueError(f"Bad book/chapter: {book_id!r} {chapter!r}")
+    if not isinstance(verses, list) or not isinstance(texts, list):
+        raise ValueError("verses and text must be arrays")
+    if len(verses) != len(texts):
+        raise ValueError(f"{len(verses)} verses but {len(texts)} texts")
+
+    previous = (0, '')
+    for verse, text in zip(verses, texts):
+        if isinstance(verse, int) and not isinstance(verse, bool) and verse > 0:
+            position = (verse, '')
+        elif isinstance(verse, str) and _PART_RE.match(verse):
+            number, part = _PART_RE.match(verse).groups()
+            position = (int(number), part)
+        else:
+            raise ValueError(f"Bad verse number in {book_id}.{chapter}: {verse!r}")
+        if position <= previous:
+            raise ValueError(f"Verses out of order in {book_id}.{chapter} at {verse!r}")
+        if not isinstance(text, str):
+            raise ValueError(f"Text of {book_id}.{chapter}.{verse} is not a string")
+        previous = position
+
+
+def decode_chapter(compact, validate=True):
+    """Rebuild the {osis_id: text} dict form from a compact chapter."""
+    if validate:
+        validate_chapter(compact)
+    prefix = f"{compact['book']}.{compact['chapter']}."
+    return {f"{prefix}{verse}": text
+            for verse, text in zip(compact['verses'], compact['text'])}
+
+
+def load_compact(path, validate=True):
+    """Read a compact chapter file into the dict form."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return decode_chapter(json.load(f), validate)
+
+
+def _node_parse_seconds(groups, repeat=20):
+    """Best time for Node's JSON.parse over each group of documents.
+
+    Returns a list parallel to groups, or None when node is not installed.
+    """
+    node = shutil.which('node')
+    if node is None:
+        return None
+    result = subprocess.run([node, '-e', _NODE_PARSE_SCRIPT, str(repeat)],
+                            input='\x01'.join('\0'.join(texts) for texts in groups),
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout)
+
+
+def compare_formats(json_dir, compact_dir=None, repeat=20):
+    """Compare size and parse time of the dict and compact chapter trees.
+
+    Every dict-form chapter is encoded in memory (or read from compact_dir
+    if given), decoded again and checked to reproduce the original bytes.
+    Returns a summary dict.
+    """
+    dict_paths = sorted(p for p in Path(json_dir).glob('*/*_*.json')
+                        if extractor.is_chapter_json(p))
+    dict_data = [p.read_bytes() for p in dict_paths]
+    if compact_dir:
+        compact_data = [(Path(compact_dir) / p.relative_to(json_dir)).read_bytes()
+                        for p in dict_paths]
+    else:
+        compact_data = [extractor.serialize_compact(json.loads(data)) for data in dict_data]
+
+    mismatches = [str(path) for path, original, data in zip(dict_paths, dict_data, compact_data)
+                  if extractor.serialize_verses(decode_chapter(json.loads(data))) != original]
+
+    layouts = {'dict': dict_data, 'compact': compact_data}
+    texts = {label: [data.decode('utf-8') for data in blobs] for label, blobs in layouts.items()}
+    # Alternate the layouts on each repetition so machine noise hits both alike
+    best = dict.fromkeys(layouts, float('inf'))
+    for _ in range(repeat):
+        for label in layouts:
+            start = time.perf_counter()
+            for text in texts[label]:
+                json.loads(text)
+            best[label] = min(best[label], time.perf_counter() - start)
+
+    node_seconds = _node_parse_seconds(list(texts.values()), repeat) or [None] * len(layouts)
+
+    summary = {'chapters': len(dict_paths), 'round_trip_mismatches': mismatches}
+    for (label, blobs), node_best in zip(layouts.items(), node_seconds):
+        summary[label] = {
+            'bytes': sum(len(data) for data in blobs),
+            'gzip_bytes': sum(len(gzip.compress(data, compresslevel=9, mtime=0))
+                              for data in blobs),
+            'python_parse_seconds': best[label],
+            'node_parse_seconds': node_best,
+        }
+    return summary
+
+
+def print_comparison(summary):
+    """Print the table produced from compare_formats()."""
+    dict_stats, compact_stats = summary['dict'], summary['compact']
+    print(f"{'':<24} {'dict':>12} {'compact':>12} {'ratio':>7}")
+    rows = [('bytes (KB)', 'bytes', 1 / 1024), ('gzip bytes (KB)', 'gzip_bytes', 1 / 1024),
+            ('Python json.loads (ms)', 'python_parse_seconds', 1e3),
+            ('Node JSON.parse (ms)', 'node_parse_seconds', 1e3)]
+    for label, key, scale in rows:
+        old, new = dict_stats.get(key), compact_stats.get(key)
+        if old is None or new is None:
+            continue
+        print(f"{label:<24} {old * scale:>12.1f} {new * scale:>12.1f} {new / old:>7.1%}")
+    mismatches = summary['round_trip_mismatches']
+    print(f"Round trip: {summary['chapters'] - len(mismatches)}/{summary['chapters']} "
+          f"chapters reproduce the dict form byte for byte")
+    for path in mismatches[:10]:
+        print(f"  mismatch: {path}")
+
+
+def main():
+    """Main function."""
+    parser = argparse.ArgumentParser(description="Read, check and compare compact chapter JSON.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    validate_parser = subparsers.add_parser('validate', help="validate a compact chapter tree")
+    validate_parser.add_argument('compact_dir', nargs='?', default=DEFAULT_COMPACT_DIR,
+                                 type=Path, help="compact chapter directory")
+
+    compare_parser = subparsers.add_parser('compare',
+                                           help="compare size and parse time with the dict form")
+    compare_parser.add_argument('--input', default=DEFAULT_JSON_DIR, type=Path,
+                                help="dict-form chapter JSON directory")
+    compare_parser.add_argument('--compact', type=Path,
+                                help="compact tree to compare (default: encode in memory)")
+    compare_parser.add_argument('--repeat', type=int, default=20,
+                                help="timing repetitions (best is reported)")
+
+    show_parser = subparsers.add_parser('show', help="print a compact chapter as a dict")
+    show_parser.add_argument('path', type=Path, help="compact chapter file")
+    args = parser.parse_args()
+
+    if args.command == 'show':
+        print(json.dumps(load_compact(args.path), ensure_ascii=False, indent=2))
+        return
+
+    if args.command == 'compare':
+        print_comparison(compare_formats(args.input, args.compact, args.repeat))
+        return
+
+    errors = 0
+    paths = sorted(args.compact_dir.glob('*/*_*.json'))
+    for path in paths:
+        try:
+            load_compact(path)
+        except (ValueError, json.JSONDecodeError) as e:
+            errors += 1
+            print(f"{path}: {e}")
+    print(f"Validated {len(paths)} compact chapters, {errors} invalid")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,441 @@
+#!/usr/bin/env python3
+"""
+Local corpus server for development and live events.
+
+Loads the corpus once (see bible_corpus.py) and answers from memory:
+
+  /chapter/<book>/<n>[?format=compact]   chapter JSON, split like the static files
+  /data/output_chapters_json/<book>/<book>_<n>.json
+                                         the same, at the static file path
+  /range/<osis ref>                      any verse range, e.g. /range/John.3.16-John.3.21
+  /ref?q=<free-form>                     references parsed by reference_parser.py
+  /bundle/<book>                         every chapter of a book
+  /search?q=<query>[&limit=N]            search_index.py query (if the index exists)
+  /stats                                 cache hit rate and latency percentiles
+  /data/<path>                           any other file under public/data
+
+Rendered responses are kept, already compressed for the client's
+Accept-Encoding, in a bounded LRU cache. Every response carries an ETag,
+so OBS browser sources reloading over and over get cheap 304s. Only the
+standard library is needed, so it runs offline on a venue laptop.
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import mimetypes
+import threading
+import time
+from collections import OrderedDict, deque, namedtuple
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import bible_corpus
+import extract_verses_to_json as extractor
+import reference_parser
+import search_index
+import verse_ordinals
+
+try:
+    import brotli
+except ImportError:  # Optional: responses are gzip-only without it
+    brotli = None
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+DEFAULT_PORT = 8765
+DEFAULT_CACHE_MB = 64
+MAX_RANGE_VERSES = 5000
+DEFAULT_SEARCH_LIMIT = 100
+MAX_SEARCH_LIMIT = 1000
+LATENCY_SAMPLES = 4096  # Most recent request latencies kept per route
+ROUTES = frozenset({'chapter', 'data', 'range', 'ref', 'bundle', 'search', 'stats'})
+
+JSON_TYPE = 'application/json; charset=utf-8'
+
+CachedResponse = namedtuple('CachedResponse', 'body content_type etag encoding')
+
+
+class ResponseCache:
+    """Thread-safe LRU of rendered responses, bounded by total body bytes."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the cached response for key, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, entry):
+        """Store a response, evicting the least recently used ones to fit."""
+        if len(entry.body) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous.body)
+            self._entries[key] = entry
+            self.size += len(entry.body)
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted.body)
+                self.evictions += 1
+
+    def stats(self):
+        """Return the cache counters as a dict."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self.size,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else None,
+                'evictions': self.evictions,
+            }
+
+
+class RequestStats:
+    """Request counts and recent latencies per route."""
+
+    def __init__(self):
+        self.started = time.time()
+        self._routes = {}
+        self._lock = threading.Lock()
+
+    def record(self, route, status, seconds):
+        with self._lock:
+            stats = self._routes.setdefault(route, {
+                'requests': 0, 'not_modified': 0, 'errors': 0,
+                'latencies': deque(maxlen=LATENCY_SAMPLES)})
+            stats['requests'] += 1
+            if status == HTTPStatus.NOT_MODIFIED:
+                stats['not_modified'] += 1
+            elif status >= 400:
+                stats['errors'] += 1
+            stats['latencies'].append(seconds)
+
+    def snapshot(self):
+        """Return per-route counts and p50/p95/p99 latency in milliseconds."""
+        with self._lock:
+            routes = {}
+            for route, stats in sorted(self._routes.items()):
+                ordered = sorted(stats['latencies'])
+                routes[route] = {
+                    'requests': stats['requests'],
+                    'not_modified': stats['not_modified'],
+                    'errors': stats['errors'],
+                    **{f'p{point}_ms': ordered[min(len(ordered) - 1,
+                                                   len(ordered) * point // 100)] * 1e3
+                       for point in (50, 95, 99)},
+                }
+            return {'uptime_seconds': time.time() - self.started, 'routes': routes}
+
+
+class CorpusService:
+    """Renders responses from the in-memory corpus; knows nothing about HTTP."""
+
+    def __init__(self, corpus, data_dir=SCRIPT_DIR, parser=None, search=None):
+        self.corpus = corpus
+        self.index = verse_ordinals.VerseIndex(corpus.to_structure())
+        self.data_dir = Path(data_dir).resolve()
+        self.parser = parser
+        self.search = search
+
+    @classmethod
+    def load(cls, json_dir=bible_corpus.DEFAULT_JSON_DIR,
+             structure_path=verse_ordinals.DEFAULT_STRUCTURE, data_dir=SCRIPT_DIR,
+             search_dir=search_index.DEFAULT_INDEX_DIR):
+        """Load the corpus, the reference parser and (if built) the search index."""
+        corpus = bible_corpus.Corpus.from_json(json_dir, structure_path)
+        service = cls(corpus, data_dir)
+        service.parser = reference_parser.ReferenceParser(
+            reference_parser.load_aliases(), service.index)
+        if (Path(search_dir) / search_index.INDEX_FILENAME).exists():
+            service.search = search_index.SearchIndex(search_dir)
+        return service
+
+    def cache_key(self, path, query):
+        """Key identifying the rendered content of a request.
+
+        Static files include their modification time so edits show up.
+        """
+        if path.startswith('/data/') and not path.startswith('/data/output_chapters_json/'):
+            try:
+                return (path, (self.data_dir / path[len('/data/'):]).stat().st_mtime_ns)
+            except OSError:
+                return (path, None)
+        return (path, tuple(sorted((k, tuple(v)) for k, v in query.items())))
+
+    def render(self, path, query):
+        """Return (body, content_type) for a GET; raises LookupError or ValueError."""
+        parts = [unquote(part) for part in path.strip('/').split('/')]
+        route = parts[0]
+
+        if route == 'chapter' and len(parts) == 3:
+            return self._chapter(parts[1], parts[2], query.get('format', ['dict'])[0])
+        if route == 'data' and len(parts) == 4 and parts[1] == 'output_chapters_json':
+            book_id, _, chapter_num = parts[3].removesuffix('.json').rpartition('_')
+            if book_id == parts[2] and chapter_num.isdigit():
+                return self._chapter(book_id, chapter_num, 'dict')
+        if route == 'data' and len(parts) > 1:
+            return self._static('/'.join(parts[1:]))
+        if route == 'range' and len(parts) == 2:
+            return _json(self.range_verses(parts[1]))
+        if route == 'ref':
+            return self._references(query.get('q', [''])[0])
+        if route == 'bundle' and len(parts) == 2:
+            return self._bundle(parts[1])
+        if route == 'search':
+            return self._search(query.get('q', [''])[0],
+                                int(query.get('limit', [DEFAULT_SEARCH_LIMIT])[0]))
+        raise LookupError(f"No route for {path}")
+
+    def _chapter(self, book_id, chapter_num, output_format):
+        if output_format not in extractor.SERIALIZERS:
+            raise ValueError(f"Unknown format: {output_format}")
+        chapter = self.corpus.chapter(book_id, chapter_num)
+        verses = extractor.split_verses(self.corpus.chapter_verses(chapter))
+        if not verses:
+            raise LookupError(f"No verses in {chapter.id}")
+        return extractor.SERIALIZERS[output_format](verses), JSON_TYPE
+
+    def range_verses(self, ref):
+        """Return {osis_id: text} for an OSIS range, split like the chapter files."""
+        verse_range = self.index.resolve(ref)
+        if verse_range.verse_count > MAX_RANGE_VERSES:
+            raise ValueError(f"Range too long ({verse_range.verse_count} verses, "
+                             f"limit {MAX_RANGE_VERSES})")
+        verse_texts = {}
+        ordinals = range(verse_range.first, verse_range.last + 1)
+        for ordinal, osis_id in zip(ordinals,
+                                    self.index.verse_ids(verse_range.first, verse_range.last)):
+            text = self.corpus.verse_text(ordinal)
+            if text:
+                verse_texts[osis_id] = text
+        verses = extractor.split_verses(verse_texts)
+
+        # Drop parts outside Gen.1.9b-... or ...-Gen.1.9a
+        first_id = self.index.verse_id(verse_range.first)
+        last_id = self.index.verse_id(verse_range.last)
+        for key in list(verses):
+            verse_id, part = verse_ordinals.split_osis_id(key)
+            if ((verse_id == first_id and verse_range.first_part and part
+                    and part < verse_range.first_part)
+                    or (verse_id == last_id and verse_range.last_part and part
+                        and part > verse_range.last_part)):
+                del verses[key]
+        return verses
+
+    def _references(self, text):
+        if self.parser is None:
+            raise LookupError("Reference parser not loaded")
+        results = []
+        for osis, verse_range in self.parser.parse_ranges(text):
+            results.append({'osis': osis,
+                            'verses': self.range_verses(osis) if verse_range else None})
+        return _json(results)
+
+    def _bundle(self, book_id):
+        book = self.corpus.book(book_id)
+        bundle = {}
+        for chapter in book.chapters:
+            verses = extractor.split_verses(self.corpus.chapter_verses(chapter))
+            if verses:
+                bundle[str(chapter.number)] = verses
+        return _json(bundle)
+
+    def _search(self, query, limit):
+        if not 1 <= limit <= MAX_SEARCH_LIMIT:
+            raise ValueError(f"limit must be 1-{MAX_SEARCH_LIMIT}, not {limit}")
+        if self.search is None:
+            raise LookupError("Search index not built (run search_index.py build)")
+        ordinals = self.search.search(query)
+        return _json({
+            'query': query,
+            'total': len(ordinals),
+            'results': [{'osis': self.index.verse_id(o), 'text': self.corpus.verse_text(o)}
+                        for o in ordinals[:limit]],
+        })
+
+    def _static(self, relative):
+        path = (self.data_dir / relative).resolve()
+        if self.data_dir not in path.parents or not path.is_file():
+            raise LookupError(f"Not found: {relative}")
+        content_type = mimetypes.guess_type(path.name)[0] or 'application/octet-stream'
+        if content_type == 'application/json':
+            content_type = JSON_TYPE
+        return path.read_bytes(), content_type
+
+
+def _json(data):
+    return (json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8'),
+            JSON_TYPE)
+
+
+def choose_encoding(accept_encoding):
+    """Pick br, gzip or identity from an Accept-Encoding header."""
+    offered = {token.split(';')[0].strip() for token in (accept_encoding or '').split(',')}
+    if brotli is not None and 'br' in offered:
+        return 'br'
+    if 'gzip' in offered:
+        return 'gzip'
+    return ''
+
+
+def build_response(body, content_type, encoding):
+    """Compress a rendered body and give it an ETag."""
+    etag = hashlib.sha256(body).hexdigest()[:20]
+    if encoding == 'br':
+        body = brotli.compress(body, quality=5)
+    elif encoding == 'gzip':
+        body = gzip.compress(body, compresslevel=6, mtime=0)
+    return CachedResponse(body, content_type, f'"{etag}{"-" + encoding if encoding else ""}"',
+                          encoding)
+
+
+class CorpusRequestHandler(BaseHTTPRequestHandler):
+    """HTTP/1.1 keep-alive handler over a CorpusService and ResponseCache."""
+
+    protocol_version = 'HTTP/1.1'
+    server_version = 'CorpusServer/1'
+    # Headers and body are separate writes; without TCP_NODELAY keep-alive
+    # clients wait out delayed ACKs (~40 ms) on every response
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self._handle(send_body=True)
+
+    def do_HEAD(self):
+        self._handle(send_body=False)
+
+    def _handle(self, send_body):
+        start = time.perf_counter()
+        server = self.server
+        url = urlsplit(self.path)
+        route = url.path.strip('/').split('/')[0]
+        if route not in ROUTES:
+            route = 'other'
+
+        if route == 'stats':
+            response = build_response(*_json({
+                'cache': server.cache.stats(), **server.stats.snapshot()}), '')
+            status = self._send(HTTPStatus.OK, response, send_body, cache_control='no-store')
+            server.stats.record(route, status, time.perf_counter() - start)
+            return
+
+        query = parse_qs(url.query)
+        encoding = choose_encoding(self.headers.get('Accept-Encoding'))
+        key = (server.service.cache_key(url.path, query), encoding)
+        response = server.cache.get(key)
+        if response is None:
+            try:
+                response = build_response(*server.service.render(url.path, query), encoding)
+            except (LookupError, ValueError) as e:
+                status = HTTPStatus.NOT_FOUND if isinstance(e, LookupError) else HTTPStatus.BAD_REQUEST
+                message = e.args[0] if e.args else str(e)
+                if isinstance(e, KeyError):
+                    message = f"Not found: {message}"
+                self._send(status, build_response(*_json({'error': message}), ''), send_body,
+                           cache_control='no-store')
+                server.stats.record(route, status, time.perf_counter() - start)
+                return
+            server.cache.put(key, response)
+
+        if_none_match = self.headers.get('If-None-Match', '')
+        if response.etag in [tag.strip() for tag in if_none_match.split(',')] or \
+                if_none_match.strip() == '*':
+            status = self._send(HTTPStatus.NOT_MODIFIED, response, send_body=False)
+        else:
+            status = self._send(HTTPStatus.OK, response, send_body)
+        server.stats.record(route, status, time.perf_counter() - start)
+
+    def _send(self, status, response, send_body, cache_control='no-cache'):
+        self.send_response(status)
+        self.send_header('ETag', response.etag)
+        self.send_header('Cache-Control', cache_control)
+        self.send_header('Vary', 'Accept-Encoding')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        if status != HTTPStatus.NOT_MODIFIED:
+            self.send_header('Content-Type', response.content_type)
+            if response.encoding:
+                self.send_header('Content-Encoding', response.encoding)
+            self.send_header('Content-Length', str(len(response.body)))
+        self.end_headers()
+        if send_body and status != HTTPStatus.NOT_MODIFIED:
+            self.wfile.write(response.body)
+        return status
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class CorpusServer(ThreadingHTTPServer):
+    """Threaded HTTP server holding the service, cache and stats."""
+
+    daemon_threads = True
+    request_queue_size = 64
+
+    def __init__(self, address, service, cache_bytes=DEFAULT_CACHE_MB * 1024 * 1024,
+                 verbose=False):
+        super().__init__(address, CorpusRequestHandler)
+        self.service = service
+        self.cache = ResponseCache(cache_bytes)
+        self.stats = RequestStats()
+        self.verbose = verbose
+
+
+def main():
+    """Main function."""
+    parser = argparse.ArgumentParser(description="Serve the corpus from memory over HTTP.")
+    parser.add_argument('--host', default='127.0.0.1',
+                        help="address to listen on (0.0.0.0 for other machines)")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help="port to listen on")
+    parser.add_argument('--json-dir', default=bible_corpus.DEFAULT_JSON_DIR, type=Path,
+                        help="chapter JSON directory to load")
+    parser.add_argument('--structure', default=verse_ordinals.DEFAULT_STRUCTURE, type=Path,
+                        help="kjv_structure.json")
+    parser.add_argument('--search-index', default=search_index.DEFAULT_INDEX_DIR, type=Path,
+                        help="search index directory (optional)")
+    parser.add_argument('--cache-mb', type=float, default=DEFAULT_CACHE_MB,
+                        help="response cache size in MB")
+    parser.add_argument('--verbose', '-v', action='store_true', help="log every request")
+    args = parser.parse_args()
+
+    start_time = time.perf_counter()
+    service = CorpusService.load(args.json_dir, args.structure, SCRIPT_DIR, args.search_index)
+    print(f"Loaded {service.corpus.verse_count} verses in "
+          f"{time.perf_counter() - start_time:.2f}s"
+          f"{'' if service.search else ' (no search index)'}")
+
+    server = CorpusServer((args.host, args.port), service,
+                          int(args.cache_mb * 1024 * 1024), args.verbose)
+    print(f"Serving on http://{args.host}:{server.server_address[1]}/ "
+          f"(stats at /stats, Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,411 @@
+#!/usr/bin/env python3
+"""
+Word statistics over the whole corpus from one cached term x verse matrix.
+
+The chapter JSON is read once, each whole verse (split parts joined) is
+split into search terms (search_index.normalize_terms) and the counts are
+stored as a sparse matrix in CSR form, one row per term:
+
+  terms         the vocabulary, sorted
+  indptr        int64, row t spans indices/counts[indptr[t]:indptr[t + 1]]
+  indices       int32 verse ordinals, ascending within a row
+  counts        int32 occurrences of the term in that verse
+  verse_words   int32 terms per verse
+
+The arrays are cached in corpus_stats.npz, keyed by the size and
+modification time of every chapter file and of kjv_structure.json, so
+later runs load them in milliseconds instead of re-reading the JSON.
+Books and categories (parse_kjv_bible.BOOK_CATEGORIES) come from the
+structure, and every query is a handful of NumPy operations over these
+arrays (np.bincount over the verse -> book/category/chapter maps).
+"""
+
+import argparse
+import hashlib
+import io
+import time
+from pathlib import Path
+
+try:
+    import numpy as np
+except ImportError:  # Reported when CorpusStats is used
+    np = None
+
+import extract_verses_to_json as extractor
+import parse_kjv_bible
+import search_index
+import verse_ordinals
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+DEFAULT_JSON_DIR = SCRIPT_DIR / 'output_chapters_json'
+DEFAULT_CACHE = SCRIPT_DIR / 'corpus_stats.npz'
+
+CACHE_FORMAT = 1
+# Verse length histogram bins, in terms per verse
+LENGTH_BINS = (0, 10, 20, 30, 40, 50, 60, 80, 100, 1000)
+
+
+def source_fingerprint(json_dir, structure_path):
+    """Hash of the size and mtime of every chapter file and the structure."""
+    digest = hashlib.sha256(f"{CACHE_FORMAT}\n".encode('utf-8'))
+    paths = sorted(Path(json_dir).glob('*/*_*.json')) + [Path(structure_path)]
+    for path in paths:
+        stat = path.stat()
+        digest.update(f"{path.name}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def build_matrix(verse_texts, verse_count):
+    """Count the terms of (ordinal, text) pairs into CSR arrays.
+
+    Returns a dict of the arrays described in the module docstring.
+    """
+    vocabulary = {}
+    term_ids = []
+    verse_ids = []
+    verse_words = np.zeros(verse_count, dtype=np.int32)
+    for ordinal, text in verse_texts:
+        terms = search_index.normalize_terms(text)
+        verse_words[ordinal] = len(terms)
+        term_ids.extend(vocabulary.setdefault(term, len(vocabulary)) for term in terms)
+        verse_ids.extend([ordinal] * len(terms))
+
+    terms = sorted(vocabulary)
+    # Renumber the terms in sorted order, then count (term, verse) pairs
+    rank = np.empty(len(terms), dtype=np.int64)
+    rank[[vocabulary[term] for term in terms]] = np.arange(len(terms))
+    keys = rank[np.asarray(term_ids, dtype=np.int64)] * verse_count + np.asarray(verse_ids)
+    keys, counts = np.unique(keys, return_counts=True)
+    rows = keys // verse_count
+    indptr = np.zeros(len(terms) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=len(terms)), out=indptr[1:])
+    return {
+        'terms': np.array(terms),
+        'indptr': indptr,
+        'indices': (keys % verse_count).astype(np.int32),
+        'counts': counts.astype(np.int32),
+        'verse_words': verse_words,
+    }
+
+
+class CorpusStats:
+    """Term, book and category statistics over the cached matrix."""
+
+    def __init__(self, arrays, structure):
+        if np is None:
+            raise ImportError("corpus_stats needs NumPy (pip install numpy)")
+        self.terms = arrays['terms'].tolist()
+        self.term_ids = {term: i for i, term in enumerate(self.terms)}
+        self.indptr = arrays['indptr']
+        self.indices = arrays['indices']
+        self.counts = arrays['counts']
+        self.verse_words = arrays['verse_words']
+        # Row of every stored count, for aggregating all terms at once
+        self.rows = np.repeat(np.arange(len(self.terms)), np.diff(self.indptr))
+
+        index = verse_ordinals.VerseIndex(structure)
+        if index.verse_count != len(self.verse_words):
+            raise ValueError(f"Cached matrix has {len(self.verse_words)} verses, "
+                             f"the structure {index.verse_count}")
+        self.book_ids = index.book_ids
+        self.book_titles = [book_info['title'] for testament in structure.values()
+                            for book_info in testament['books'].values()]
+        book_categories = [parse_kjv_bible.BOOK_CATEGORIES.get(book_id, 'Unknown')
+                           for book_id in self.book_ids]
+        self.categories = list(dict.fromkeys(book_categories))
+        self.book_category = np.array([self.categories.index(category)
+                                       for category in book_categories])
+        self.chapter_first_verse = np.array(index.chapter_first_verse, dtype=np.int64)
+        self.chapter_ids = [f"{book_id}.{chapter}" for book_id, chapter
+                            in index.chapters(0, index.verse_count - 1)]
+        self.verse_chapter = np.repeat(np.arange(len(self.chapter_ids)),
+                                       np.diff(self.chapter_first_verse))
+        self.chapter_book = np.array(index.chapter_book, dtype=np.int64)
+        self.verse_book = self.chapter_book[self.verse_chapter]
+        self.verse_category = self.book_category[self.verse_book]
+
+    @classmethod
+    def load(cls, json_dir=DEFAULT_JSON_DIR, structure_path=verse_ordinals.DEFAULT_STRUCTURE,
+             cache_path=DEFAULT_CACHE, rebuild=False):
+        """Load the cached matrix, rebuilding it when the chapter JSON changed.
+
+        Returns (stats, built): built is True if the JSON was re-read.
+        """
+        if np is None:
+            raise ImportError("corpus_stats needs NumPy (pip install numpy)")
+        structure = verse_ordinals.load_structure(structure_path)
+        fingerprint = source_fingerprint(json_dir, structure_path)
+        if not rebuild and Path(cache_path).exists():
+            with np.load(cache_path) as cached:
+                if str(cached['fingerprint']) == fingerprint:
+                    return cls({name: cached[name] for name in cached.files}, structure), False
+
+        verse_count = verse_ordinals.VerseIndex(structure).verse_count
+        arrays = build_matrix(search_index.load_verse_texts(json_dir, structure), verse_count)
+        buffer = io.BytesIO()
+        np.savez(buffer, fingerprint=np.array(fingerprint), **arrays)
+        Path(cache_path).parent.mkdir(parents=True, exist_ok=True)
+        extractor.write_atomic(cache_path, buffer.getvalue())
+        return cls(arrays, structure), True
+
+    def term_id(self, term):
+        """Row of a term, normalized like the search index (KeyError if absent)."""
+        terms = search_index.normalize_terms(term)
+        if len(terms) != 1 or terms[0] not in self.term_ids:
+            raise KeyError(term)
+        return self.term_ids[terms[0]]
+
+    def _row(self, term):
+        t = self.term_id(term)
+        return slice(self.indptr[t], self.indptr[t + 1])
+
+    def frequency(self, term):
+        """Return (occurrences, verses containing the term)."""
+        row = self._row(term)
+        return int(self.counts[row].sum()), row.stop - row.start
+
+    def total_words(self):
+        """Terms in the whole corpus."""
+        return int(self.verse_words.sum())
+
+    def book_words(self):
+        """Terms per book, as an array in canonical book order."""
+        return np.bincount(self.verse_book, weights=self.verse_words,
+                           minlength=len(self.book_ids)).astype(np.int64)
+
+    def by_book(self, term):
+        """Occurrences of a term per book, as an array in canonical book order."""
+        row = self._row(term)
+        return np.bincount(self.verse_book[self.indices[row]], weights=self.counts[row],
+                           minlength=len(self.book_ids)).astype(np.int64)
+
+    def by_category(self, term):
+        """Occurrences of a term per category, as an array ordered like self.categories."""
+        return np.bincount(self.book_category, weights=self.by_book(term),
+                           minlength=len(self.categories)).astype(np.int64)
+
+    def by_chapter(self, term):
+        """Occurrences of a term per chapter, as an array in canonical chapter order."""
+        row = self._row(term)
+        return np.bincount(self.verse_chapter[self.indices[row]], weights=self.counts[row],
+                           minlength=len(self.chapter_ids)).astype(np.int64)
+
+    def clusters(self, term, count=10, min_occurrences=3):
+        """Chapters where a term is densest: [(chapter, occurrences, per 1,000 words)].
+
+        Chapters with fewer than min_occurrences uses are left out, so one
+        use in a short chapter does not rank first.
+        """
+        per_chapter = self.by_chapter(term)
+        chapter_words = np.bincount(self.verse_chapter, weights=self.verse_words,
+                                    minlength=len(self.chapter_ids))
+        density = np.divide(per_chapter * 1000.0, chapter_words,
+                            out=np.zeros(len(per_chapter)), where=chapter_words > 0)
+        density[per_chapter < min_occurrences] = 0
+        best = np.argsort(-density, kind='stable')[:count]
+        return [(self.chapter_ids[c], int(per_chapter[c]), float(density[c]))
+                for c in best if density[c] > 0]
+
+    def top_terms(self, count=20, books=None):
+        """The most frequent terms, optionally within some books: [(term, occurrences)]."""
+        if books is None:
+            totals = np.add.reduceat(self.counts, self.indptr[:-1]) if len(self.counts) \
+                else np.zeros(0, dtype=np.int64)
+        else:
+            selected = np.zeros(len(self.book_ids), dtype=bool)
+            selected[[self.book_ids.index(book_id) for book_id in books]] = True
+            mask = selected[self.verse_book[self.indices]]
+            totals = np.bincount(self.rows[mask], weights=self.counts[mask],
+                                 minlength=len(self.terms))
+        best = np.argsort(-totals, kind='stable')[:count]
+        return [(self.terms[t], int(totals[t])) for t in best if totals[t] > 0]
+
+    def vocabulary_sizes(self):
+        """Distinct terms per book and per category: (book array, category array)."""
+        # Verse ordinals ascend within a row and books follow ordinal order,
+        # so (term, book) keys are already sorted: keep the first of each run
+        books = self.verse_book[self.indices]
+        first = np.ones(len(books), dtype=bool)
+        first[1:] = (self.rows[1:] != self.rows[:-1]) | (books[1:] != books[:-1])
+        term_books = books[first]
+        category_count = len(self.categories)
+        term_categories = np.unique(self.rows[first] * category_count
+                                    + self.book_category[term_books])
+        return (np.bincount(term_books, minlength=len(self.book_ids)),
+                np.bincount(term_categories % category_count, minlength=category_count))
+
+    def books_in_category(self, category):
+        """Book IDs of a category, in canonical order."""
+        return [book_id for book_id, c in zip(self.book_ids, self.book_category)
+                if self.categories[c] == category]
+
+    def verse_lengths(self, books=None):
+        """Terms per verse, optionally within some books."""
+        if books is None:
+            return self.verse_words
+        selected = np.zeros(len(self.book_ids), dtype=bool)
+        selected[[self.book_ids.index(book_id) for book_id in books]] = True
+        return self.verse_words[selected[self.verse_book]]
+
+    def length_distribution(self, books=None, bins=LENGTH_BINS):
+        """Histogram and percentiles of verse length in terms.
+
+        Returns {'bins', 'histogram', 'mean', 'p50', 'p90', 'p99', 'max'}.
+        """
+        lengths = self.verse_lengths(books)
+        histogram, _ = np.histogram(lengths, bins=bins)
+        p50, p90, p99 = np.percentile(lengths, (50, 90, 99))
+        return {'bins': list(bins), 'histogram': histogram.tolist(),
+                'mean': float(lengths.mean()), 'p50': float(p50), 'p90': float(p90),
+                'p99': float(p99), 'max': int(lengths.max())}
+
+
+def print_corpus_summary(stats, top=15):
+    """Print the parse_kjv_bible summary table, extended with word statistics."""
+    book_words = stats.book_words()
+    book_vocabulary, category_vocabulary = stats.vocabulary_sizes()
+    book_verses = np.bincount(stats.verse_book, minlength=len(stats.book_ids))
+    book_chapters = np.bincount(stats.chapter_book, minlength=len(stats.book_ids))
+
+    print("Bible Corpus Summary")
+    print("=" * 118)
+    print(f"{'Book':<40} {'Category':<20} {'Chapters':<10} {'Total Verses':<15}"
+          f"{'Words':>9} {'Vocabulary':>11} {'Words/Verse':>12}")
+    print("-" * 118)
+    for b, book_id in enumerate(stats.book_ids):
+        print(f"{stats.book_titles[b]:<40} {stats.categories[stats.book_category[b]]:<20} "
+              f"{book_chapters[b]:<10} {book_verses[b]:<15}{book_words[b]:>9} "
+              f"{book_vocabulary[b]:>11} {book_words[b] / max(book_verses[b], 1):>12.1f}")
+    print("-" * 118)
+    print(f"{'TOTAL':<40} {'':<20} {len(stats.chapter_ids):<10} {len(stats.verse_words):<15}"
+          f"{stats.total_words():>9} {len(stats.terms):>11} "
+          f"{stats.total_words() / len(stats.verse_words):>12.1f}")
+
+    print("\nBy Category")
+    print("-" * 118)
+    category_words = np.bincount(stats.book_category, weights=book_words,
+                                 minlength=len(stats.categories)).astype(np.int64)
+    category_verses = np.bincount(stats.verse_category, minlength=len(stats.categories))
+    for c, category in enumerate(stats.categories):
+        lengths = stats.length_distribution(stats.books_in_category(category))
+        print(f"{category:<40} {'':<20} {'':<10} {category_verses[c]:<15}"
+              f"{category_words[c]:>9} {category_vocabulary[c]:>11} "
+              f"{category_words[c] / max(category_verses[c], 1):>12.1f}  "
+              f"(p90 {lengths['p90']:.0f}, max {lengths['max']})")
+
+    print_length_distribution(stats.length_distribution())
+    print(f"\nTop {top} terms")
+    print("-" * 40)
+    for term, occurrences in stats.top_terms(top):
+        print(f"  {term:<20} {occurrences:>8}")
+
+
+def print_length_distribution(distribution, label="All verses"):
+    """Print a verse length histogram from CorpusStats.length_distribution()."""
+    print(f"\nVerse length in words: {label}")
+    print("-" * 60)
+    total = sum(distribution['histogram']) or 1
+    bins = distribution['bins']
+    for low, high, n in zip(bins, bins[1:], distribution['histogram']):
+        print(f"  {low:>4}-{high - 1:<4} {n:>7} {'#' * round(n / total * 100)}")
+    print(f"  mean {distribution['mean']:.1f}, median {distribution['p50']:.0f}, "
+          f"p90 {distribution['p90']:.0f}, p99 {distribution['p99']:.0f}, "
+          f"max {distribution['max']}")
+
+
+def print_term(stats, term, count=10):
+    """Print the frequency, per-category spread and densest chapters of a term."""
+    occurrences, verses = stats.frequency(term)
+    total = stats.total_words()
+    print(f"{term}: {occurrences} occurrences in {verses} verses "
+          f"({occurrences / total * 10000:.1f} per 10,000 words)")
+    per_category = stats.by_category(term)
+    category_words = np.bincount(stats.book_category, weights=stats.book_words(),
+                                 minlength=len(stats.categories))
+    for c, category in enumerate(stats.categories):
+        if per_category[c]:
+            print(f"  {category:<20} {per_category[c]:>7} "
+                  f"({per_category[c] / category_words[c] * 10000:>6.1f} per 10,000)")
+    per_book = stats.by_book(term)
+    books = np.argsort(-per_book, kind='stable')[:count]
+    print("  Books: " + ', '.join(f"{stats.book_ids[b]} {per_book[b]}"
+                                  for b in books if per_book[b]))
+    clusters = stats.clusters(term, count)
+    if clusters:
+        print("  Densest chapters: " + ', '.join(
+            f"{chapter} {n} ({density:.1f}/1,000)" for chapter, n, density in clusters))
+
+
+def _positive_int(value):
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"not an integer: {value!r}") from None
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, not {number}")
+    return number
+
+
+def main():
+    """Main function."""
+    parser = argparse.ArgumentParser(
+        description="Word frequencies, vocabulary and verse lengths from a cached "
+                    "term x verse matrix.")
+    parser.add_argument('--input', default=DEFAULT_JSON_DIR, type=Path,
+                        help="chapter JSON directory")
+    parser.add_argument('--structure', default=verse_ordinals.DEFAULT_STRUCTURE, type=Path,
+                        help="kjv_structure.json")
+    parser.add_argument('--cache', default=DEFAULT_CACHE, type=Path,
+                        help="matrix cache file")
+    parser.add_argument('--rebuild', action='store_true',
+                        help="re-read the chapter JSON even if the cache is current")
+    subparsers = parser.add_subparsers(dest='command')
+
+    subparsers.add_parser('summary', help="book table with word counts (default)")
+    term_parser = subparsers.add_parser('term', help="frequency and spread of words")
+    term_parser.add_argument('terms', nargs='+', help="words to look up")
+    top_parser = subparsers.add_parser('top', help="most frequent terms")
+    top_parser.add_argument('-n', type=_positive_int, default=20, help="number of terms")
+    lengths_parser = subparsers.add_parser('lengths', help="verse length distribution")
+    for subparser in (top_parser, lengths_parser):
+        group = subparser.add_mutually_exclusive_group()
+        group.add_argument('--book', help="only this book (OSIS ID)")
+        group.add_argument('--category', help="only this category, e.g. Gospels")
+    args = parser.parse_args()
+
+    start_time = time.perf_counter()
+    stats, built = CorpusStats.load(args.input, args.structure, args.cache, args.rebuild)
+    print(f"{'Built' if built else 'Loaded'} {len(stats.terms)} terms x "
+          f"{len(stats.verse_words)} verses ({len(stats.counts)} stored counts) "
+          f"in {(time.perf_counter() - start_time) * 1e3:.0f} ms\n")
+
+    books = label = None
+    if getattr(args, 'book', None):
+        if args.book not in stats.book_ids:
+            parser.error(f"unknown book: {args.book}")
+        books, label = [args.book], args.book
+    elif getattr(args, 'category', None):
+        books, label = stats.books_in_category(args.category), args.category
+        if not books:
+            parser.error(f"unknown category: {args.category} "
+                         f"(one of: {', '.join(stats.categories)})")
+
+    query_start = time.perf_counter()
+    if args.command == 'term':
+        for term in args.terms:
+            try:
+                print_term(stats, term)
+            except KeyError:
+                print(f"{term}: not in the corpus")
+    elif args.command == 'top':
+        for term, occurrences in stats.top_terms(args.n, books):
+            print(f"  {term:<20} {occurrences:>8}")
+    elif args.command == 'lengths':
+        print_length_distribution(stats.length_distribution(books), label or "All verses")
+    else:
+        print_corpus_summary(stats)
+    print(f"\nQueries took {(time.perf_counter() - query_start) * 1e3:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,260 +4,1399 @@ Extract verses from OSIS XML files to JSON format.
 Each verse is on a single line in the XML, marked by start and end tags.
 """
 
+import argparse
+import gzip
+import hashlib
 import json
 import os
 import re
+import struct
+import sys
+import time
+from array import array
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 from pathlib import Path
 
+import verse_ordinals
+from pipeline_metrics import PROFILERS, StageTimer, capture, write_metrics
+
+try:
+    import brotli
+except ImportError:  # Optional: .br siblings are skipped without it
+    brotli = None
+
 # Configuration for verse splitting
 MAX_VERSE_LENGTH = 200  # Characters threshold for splitting verses
-SPLIT_PATTERN = r'[.!?]\s+'  # Split on sentence boundaries
+
+# Places a long verse may be split, by the punctuation ending the part.
+# 'word' allows any space. SPLIT_BOUNDARIES lists the classes tried, from
+# most to least preferred.
+BOUNDARY_CLASSES = {
+    'sentence': '.!?',
+    'clause': ';:',
+    'comma': ',',
+    'word': '',
+}
+SPLIT_BOUNDARIES = ('sentence', 'clause', 'comma', 'word')
+# A stronger boundary class is used when its largest part is at most this
+# fraction of max_length over the best any allowed cut can give
+SPLIT_SLACK = 0.1
+SPLIT_CACHE_SIZE = 8192  # Split results kept, keyed by verse text
+MAX_SPLIT_PARTS = 26  # Part suffixes run from 'a' to 'z'
+_CLOSING_PUNCTUATION = ')]\'"'
+_SPACE_RE = re.compile(' ')
+
+# Bump whenever a change to the extractor alters the generated JSON, so
+# incremental builds know to regenerate every chapter.
+EXTRACTOR_VERSION = 3
+MANIFEST_FILENAME = '.build_manifest.json'
+
+# 'dict' writes {osis_id: text} pretty-printed; 'compact' writes the columnar
+# form read by compact_chapters.py
+OUTPUT_FORMATS = ('dict', 'compact')
+COMPACT_FORMAT = 1
+_VERSE_KEY_RE = re.compile(r'^([1-4]?[A-Za-z]+)\.(\d+)\.(\d+)([a-z]?)$')
+BUNDLE_SUFFIX = '.bundle.json'
+
+# Content-hashed copies (Gen/Gen_1.<hash>.json) for immutable caching, and
+# the manifest that maps chapter keys to them
+CHAPTER_MANIFEST_FILENAME = 'chapter_manifest.json'
+CHAPTER_MANIFEST_FORMAT = 1
+FINGERPRINT_LENGTH = 10
+_FINGERPRINTED_RE = re.compile(r'\.[0-9a-f]{%d}\.json(\.gz|\.br)?$' % FINGERPRINT_LENGTH)
+
+# Study notes, kept out of the chapter JSON in per-book shards keyed by
+# verse ordinal, plus an index of the verses that have notes
+STUDY_NOTES_FORMAT = 1
+STUDY_NOTES_INDEX_FILENAME = 'index.json'
+_STUDY_NOTE_RE = re.compile(r'<ns1:note type="study"[^>]*>(.*?)</ns1:note>')
+_TAG_RE = re.compile(r'<[^>]+>')
+
+# Interlinear word streams: per chapter, little-endian columns of text
+# offsets and lemma/morph IDs into dictionaries shared by the whole tree
+INTERLINEAR_MAGIC = b'OBSI'
+INTERLINEAR_FORMAT = 1
+INTERLINEAR_DICTIONARIES_FILENAME = 'dictionaries.json'
+INTERLINEAR_SUFFIX = '.bin'
+INTERLINEAR_HEADER = struct.Struct('<4sHHI')
+_INTERLINEAR_MAX_ID = 0xFFFF  # IDs and text offsets are stored as uint16
+
+# A note (skipped whole) or a whole ns1:w element: group 1 holds its
+# attributes (ending in '/' when self-closing) and group 2 its content
+# (None when self-closing). The content loop is unrolled so nested
+# markup costs no backtracking.
+_WORD_ELEMENT_RE = re.compile(
+    r'<ns1:(?:note[^>]*>.*?</ns1:note>'
+    r'|w\b([^>]*)>(?:(?<=/>)|([^<]*(?:<(?!/ns1:w>)[^<]*)*)</ns1:w>))')
+_WORD_ATTR_RE = re.compile(r'\b(lemma|morph)="([^"]*)"')
+# Strong's numbers in a lemma attribute, shared with strongs_concordance
+STRONG_RE = re.compile(r'\bstrongs?:([HG]\d+)')
+
+
+# Single-pass tokenizer over OSIS verse markup. Scanning left to right, a
+# note element is consumed whole (start tag, content and end tag) and any
+# other tag is consumed on its own, so w/transChange/divineName wrappers
+# are unwrapped and only their text survives. Entities are left as-is.
+_MARKUP_RE = re.compile(r'<ns1:note[^>]*>.*?</ns1:note>|<[^>]+>')
+
+# A verse line: the sID milestone, the verse markup, the eID milestone.
+_VERSE_LINE_RE = re.compile(
+    r'<ns1:verse[^>]*?osisID="([^"]+)"[^>]*sID="[^"]+"\s*/>'
+    r'(.*?)'
+    r'<ns1:verse[^>]+eID="[^"]+"\s*/>'
+)
 
 
 def extract_text_from_line(line):
     """Extract plain text from a verse line, ignoring notes."""
-    # Remove note tags and their content
-    line = re.sub(r'<ns1:note[^>]*>.*?</ns1:note>', '', line)
+    # Drop notes and tags in one scan, then collapse whitespace
+    return ' '.join(_MARKUP_RE.sub('', line).split())
+
+
+def split_long_verse(text, max_length=MAX_VERSE_LENGTH, boundaries=SPLIT_BOUNDARIES,
+                     slack=SPLIT_SLACK):
+    """Split a long verse into evenly-sized parts, preferring strong boundaries.
+
+    A verse over max_length is cut at spaces into ceil(len / max_length)
+    parts (at least two, more if the words need them) so that the largest
+    part is as short as possible. Boundary strength only breaks near-ties:
+    the boundary classes are tried cumulatively in the order given, and the
+    first whose cuts keep the largest part within slack * max_length
+    characters of the best reachable with every allowed cut (and within
+    max_length) wins. slack=0 gives the most even split possible.
+    Joining the parts with single spaces gives back the verse.
+    """
+    if len(text) <= max_length:
+        return [text]
+    return list(_split_balanced(text, max_length, tuple(boundaries), slack))
+
+
+@lru_cache(maxsize=SPLIT_CACHE_SIZE)
+def _split_balanced(text, max_length, boundaries, slack):
+    num_parts = max(2, (len(text) + max_length - 1) // max_length)
+    punctuated = _punctuated_spaces(text, boundaries)
+
+    # Cut points allowed by each cumulative boundary class, strongest first
+    levels = []
+    for level, name in enumerate(boundaries):
+        if name == 'word':
+            level_cuts = [match.start() for match in _SPACE_RE.finditer(text)]
+        else:
+            level_cuts = [position for position, rank in punctuated if rank <= level]
+        if level_cuts and (not levels or level_cuts != levels[-1]):
+            levels.append(level_cuts)
+    if not levels:
+        return (text,)
+
+    # The best largest part with every allowed cut sets the bound
+    needed = _parts_needed(len(text), levels[-1], max_length)
+    if needed is None:
+        # Some part cannot fit anywhere; balance the most permissive cuts
+        cuts = levels[-1]
+        largest = _min_largest_part(len(text), cuts, num_parts, len(text))
+    else:
+        num_parts = max(num_parts, needed)
+        best = _min_largest_part(len(text), levels[-1], num_parts, max_length)
+        bound = min(max_length, best + int(slack * max_length))
+        for cuts in levels:
+            needed = _parts_needed(len(text), cuts, bound)
+            if needed is not None and needed <= num_parts:
+                break
+        largest = _min_largest_part(len(text), cuts, num_parts, bound)
+
+    parts = []
+    start = 0
+    for end in _balanced_cuts(len(text), cuts, num_parts, largest):
+        parts.append(text[start:end])
+        start = end + 1
+    parts.append(text[start:])
+    return tuple(parts)
+
+
+def _punctuated_spaces(text, boundaries):
+    """Return (space position, rank) for each space after boundary punctuation.
+
+    The rank is the index in boundaries of the class the punctuation
+    belongs to. Closing brackets and quotes between the punctuation and the
+    space are looked through.
+    """
+    rank_of = {}
+    for rank, name in reversed(list(enumerate(boundaries))):
+        for char in BOUNDARY_CLASSES[name]:
+            rank_of[char] = rank
+    if not rank_of:
+        return []
+    pattern = _boundary_pattern(''.join(sorted(rank_of)))
+    return [(match.end() - 1, rank_of[match.group(1)]) for match in pattern.finditer(text)]
+
+
+@lru_cache(maxsize=None)
+def _boundary_pattern(chars):
+    return re.compile(f'([{re.escape(chars)}])[{re.escape(_CLOSING_PUNCTUATION)}]* ')
+
+
+def _parts_needed(length, cuts, limit):
+    """Fewest parts with none over limit, cutting at cuts; None if impossible."""
+    parts = 1
+    start = 0
+    while length - start > limit:
+        # Furthest cut that keeps this part within limit
+        i = bisect_right(cuts, start + limit) - 1
+        if i < 0 or cuts[i] < start:
+            return None
+        start = cuts[i] + 1
+        parts += 1
+    return parts
+
+
+def _min_largest_part(length, cuts, num_parts, high):
+    """Binary-search the shortest largest part reachable with num_parts parts.
+
+    high must be reachable.
+    """
+    low = (length - (num_parts - 1)) // num_parts
+    while low < high:
+        middle = (low + high) // 2
+        needed = _parts_needed(length, cuts, middle)
+        if needed is not None and needed <= num_parts:
+            high = middle
+        else:
+            low = middle + 1
+    return low
+
+
+def _balanced_cuts(length, cuts, num_parts, largest):
+    """Choose up to num_parts - 1 cuts with no part over largest.
+
+    Each cut is the one nearest an even share of the remaining text among
+    those that still leave the rest coverable by the parts left.
+    """
+    # needed[j]: fewest parts covering the text after cuts[j]
+    needed = [0] * len(cuts)
+    furthest = len(cuts) - 1
+    for j in range(len(cuts) - 1, -1, -1):
+        start = cuts[j] + 1
+        if length - start <= largest:
+            needed[j] = 1
+            continue
+        while furthest > j and cuts[furthest] - start > largest:
+            furthest -= 1
+        needed[j] = 1 + needed[furthest] if furthest > j else len(cuts) + 1
+
+    chosen = []
+    start = 0
+    j = 0
+    for remaining in range(num_parts, 1, -1):
+        target = start + (length - start - (remaining - 1)) / remaining
+        pick = None
+        while j < len(cuts) and cuts[j] - start <= largest:
+            # Past the target, cuts only get further from it
+            if pick is not None and cuts[j] - target >= abs(cuts[pick] - target):
+                break
+            if needed[j] <= remaining - 1:
+                pick = j
+            j += 1
+        if pick is None:
+            break
+        chosen.append(cuts[pick])
+        start = cuts[pick] + 1
+        j = pick + 1
+    return chosen
+
+
+def extract_verses_from_xml(xml_path, on_verse=None):
+    """Extract verses from an OSIS XML file."""
+    with open(xml_path, 'r', encoding='utf-8') as f:
+        return extract_verses_from_lines(f, on_verse)
+
+
+def extract_verses_from_lines(lines, on_verse=None):
+    """Extract verses from the lines of a serialized OSIS chapter.
+
+    If given, on_verse(osisid, verse_content) is called with the raw markup
+    of every verse, so other indexes can be built in the same pass.
+    """
+    return split_verses(extract_verse_texts(lines, on_verse))
+
+
+def extract_verse_texts(lines, on_verse=None):
+    """Return {osisid: plain text} for the verses of a chapter, unsplit."""
+    verse_texts = {}
     
-    # Extract text from ns1:w tags
-    text_parts = []
+    for line in lines:
+        # Cheap substring test before running the verse pattern
+        if '<ns1:verse osisID="' not in line:
+            continue
+        
+        verse_match = _VERSE_LINE_RE.search(line)
+        if not verse_match:
+            continue
+        
+        osisid, verse_content = verse_match.groups()
+        if on_verse is not None:
+            on_verse(osisid, verse_content)
+        
+        text = extract_text_from_line(verse_content)
+        if text:  # Only add non-empty verses
+            verse_texts[osisid] = text
     
-    # Find all ns1:w tags and extract their content
-    w_pattern = r'<ns1:w[^>]*>([^<]+)</ns1:w>'
-    w_matches = re.findall(w_pattern, line)
+    return verse_texts
+
+
+def extract_study_notes(verse_content):
+    """Return the plain text of each study note in a verse's markup."""
+    notes = []
+    for match in _STUDY_NOTE_RE.finditer(verse_content):
+        text = ' '.join(_TAG_RE.sub('', match.group(1)).split())
+        if text:
+            notes.append(text)
+    return notes
+
+
+@lru_cache(maxsize=SPLIT_CACHE_SIZE)
+def _strongs_lemma(lemma):
+    """Normalize a lemma attribute to its Strong's numbers joined by spaces."""
+    return ' '.join(STRONG_RE.findall(lemma)) or lemma
+
+
+def _word_attributes(attrs):
+    """Return (lemma, morph) of a ns1:w element's attribute string."""
+    # Not cached on attrs: src="..." makes nearly every attribute string unique
+    values = dict(_WORD_ATTR_RE.findall(attrs))
+    lemma = values.get('lemma')
+    return _strongs_lemma(lemma) if lemma else '', values.get('morph', '')
+
+
+def _collapse_spans(raw, spans):
+    """Map [start, end) offsets in raw text to ' '.join(raw.split()).
+
+    A start inside whitespace moves to the next word and an end inside
+    whitespace to the end of the previous one.
+    """
+    starts = []
+    ends = []
+    length = 0
+    pending_space = False
+    for ch in raw:
+        if ch.isspace():
+            pending_space = pending_space or length > 0
+        else:
+            length += pending_space
+            pending_space = False
+        starts.append(length + pending_space)
+        ends.append(length)
+        if not ch.isspace():
+            length += 1
+    starts.append(length)
+    ends.append(length)
+    spans = [(min(starts[start], length), ends[end]) for start, end in spans]
+    return [(start, max(start, end)) if start <= end else (end, end) for start, end in spans]
+
+
+def extract_word_tokens(verse_content):
+    """Return [(start, end, lemma, morph), ...] for the ns1:w words of a verse.
+
+    start/end index the verse text exactly as extract_text_from_line()
+    produces it (tags dropped, whitespace collapsed), so the spans line up
+    with the whole-verse text. lemma is the word's Strong's numbers joined
+    by spaces ("H0853 H01254") and morph its morph attribute, '' when
+    absent. Self-closing words (untranslated Greek articles) become empty
+    spans at their position.
+    """
+    pieces = []
+    spans = []
+    attributes = []
+    raw_length = 0
+    last = 0
+    for match in _WORD_ELEMENT_RE.finditer(verse_content):
+        segment = verse_content[last:match.start()]
+        if '<' in segment:
+            segment = _MARKUP_RE.sub('', segment)
+        pieces.append(segment)
+        raw_length += len(segment)
+        last = match.end()
+        attrs, content = match.groups()
+        if attrs is None:
+            continue  # A note
+        start = raw_length
+        if content:
+            if '<' in content:
+                content = _MARKUP_RE.sub('', content)
+            pieces.append(content)
+            raw_length += len(content)
+        spans.append((start, raw_length))
+        attributes.append(_word_attributes(attrs))
+    if not spans:
+        return []
+    pieces.append(_MARKUP_RE.sub('', verse_content[last:]))
+    raw = ''.join(pieces)
+    text = ' '.join(raw.split())
+    if text != raw:
+        spans = _collapse_spans(raw, spans)
+
+    tokens = []
+    for (start, end), (lemma, morph) in zip(spans, attributes):
+        # A word's markup may include the space before or after it
+        if start < end and text[start] == ' ':
+            start += 1
+        if start < end and text[end - 1] == ' ':
+            end -= 1
+        tokens.append((start, end, lemma, morph))
+    return tokens
+
+
+def split_verses(verse_texts, max_length=MAX_VERSE_LENGTH, boundaries=SPLIT_BOUNDARIES):
+    """Split long verses of {osisid: text}, keying the parts 9a, 9b, ..."""
+    verses = {}
+    for osisid, text in verse_texts.items():
+        # Check if verse needs to be split
+        verse_parts = split_long_verse(text, max_length, boundaries)
+        
+        if len(verse_parts) == 1:
+            # Single verse, add normally
+            verses[osisid] = text
+        else:
+            # Multiple parts, add with letter suffixes
+            for i, part in enumerate(verse_parts):
+                suffix = chr(ord('a') + i)  # 'a', 'b', 'c', etc.
+                split_osisid = f"{osisid}{suffix}"
+                verses[split_osisid] = part
     
-    # Find all transChange tags and extract their content  
-    trans_pattern = r'<ns1:transChange[^>]*>([^<]+)</ns1:transChange>'
-    trans_matches = re.findall(trans_pattern, line)
+    return verses
+
+
+def build_settings(output_format='dict', study_notes=False, interlinear=False):
+    """Return the settings that affect generated output, for the manifest.
+
+    study_notes and interlinear are only recorded when enabled, so switching
+    either on rebuilds every chapter once (to collect them) while builds
+    without them keep their existing manifests.
+    """
+    settings = {
+        'max_verse_length': MAX_VERSE_LENGTH,
+        'split_boundaries': list(SPLIT_BOUNDARIES),
+        'split_slack': SPLIT_SLACK,
+        'output_format': output_format,
+    }
+    if study_notes:
+        settings['study_notes'] = True
+    if interlinear:
+        settings['interlinear'] = True
+    return settings
+
+
+def file_sha256(path):
+    """Return the hex SHA-256 of a file's contents."""
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def write_atomic(path, data):
+    """Write bytes to path via a temporary file and a rename.
+
+    Readers such as the dev server see either the old file or the new one,
+    never a partially written file.
+    """
+    path = Path(path)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+
+def little_endian_bytes(values):
+    """Return the bytes of an array in little-endian order, the binary formats' layout."""
+    if sys.byteorder == 'big':
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def load_manifest(manifest_path):
+    """Load the chapter entries of a build manifest, or {} if there is none."""
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            return json.load(f).get('chapters', {})
+    except FileNotFoundError:
+        return {}
+    except (json.JSONDecodeError, AttributeError) as e:
+        print(f"Ignoring unreadable manifest {manifest_path}: {e}")
+        return {}
+
+
+def manifest_entry(source, source_sha256, output_sha256, settings):
+    """Build the manifest record for one generated chapter."""
+    return {
+        'source': source,
+        'source_sha256': source_sha256,
+        'output_sha256': output_sha256,
+        'extractor_version': EXTRACTOR_VERSION,
+        'settings': settings,
+    }
+
+
+def save_manifest(manifest_path, chapters, settings):
+    """Atomically write the build manifest for an output tree."""
+    manifest = {
+        'extractor_version': EXTRACTOR_VERSION,
+        'settings': settings,
+        'chapters': dict(sorted(chapters.items())),
+    }
+    write_atomic(manifest_path,
+                 json.dumps(manifest, ensure_ascii=False, indent=2).encode('utf-8'))
+
+
+def serialize_verses(verses):
+    """Encode a chapter's verses exactly as they are written to disk."""
+    return json.dumps(verses, ensure_ascii=False, indent=2).encode('utf-8')
+
+
+def encode_compact_chapter(verses):
+    """Convert a chapter's {osis_id: text} dict to the compact columnar dict.
+
+    Raises ValueError if the keys are not OSIS verse IDs of one chapter.
+    """
+    book_id = chapter = None
+    numbers = []
+    for key in verses:
+        match = _VERSE_KEY_RE.match(key)
+        if not match:
+            raise ValueError(f"Not an OSIS verse ID: {key}")
+        key_book, key_chapter, verse, part = match.groups()
+        if book_id is None:
+            book_id, chapter = key_book, key_chapter
+        elif (key_book, key_chapter) != (book_id, chapter):
+            raise ValueError(f"{key} is not in chapter {book_id}.{chapter}")
+        numbers.append(f"{verse}{part}" if part else int(verse))
     
-    # Also find any plain text between tags (punctuation, spaces)
-    # Split by tags and keep non-tag content
-    tag_pattern = r'<[^>]+>'
-    parts = re.split(tag_pattern, line)
+    return {
+        'format': COMPACT_FORMAT,
+        'book': book_id,
+        'chapter': int(chapter) if chapter is not None else None,
+        'verses': numbers,
+        'text': list(verses.values()),
+    }
+
+
+def serialize_compact(verses):
+    """Encode a chapter's verses in the minified compact form.
+
+    The book and chapter are stored once, followed by parallel arrays of
+    verse numbers (split parts as "43a" strings) and texts.
+    """
+    return json.dumps(encode_compact_chapter(verses), ensure_ascii=False,
+                      separators=(',', ':')).encode('utf-8')
+
+
+SERIALIZERS = {'dict': serialize_verses, 'compact': serialize_compact}
+
+
+def is_up_to_date(entry, source_sha256, settings, json_path):
+    """Check whether a manifest entry still describes a valid output."""
+    return (
+        entry is not None
+        and entry.get('source_sha256') == source_sha256
+        and entry.get('extractor_version') == EXTRACTOR_VERSION
+        and entry.get('settings') == settings
+        and json_path.exists()
+        and file_sha256(json_path) == entry.get('output_sha256')
+    )
+
+
+def compressed_siblings(path):
+    """Return the precompressed sibling paths that are produced for a file."""
+    path = Path(path)
+    siblings = [path.with_name(path.name + '.gz')]
+    if brotli is not None:
+        siblings.append(path.with_name(path.name + '.br'))
+    return siblings
+
+
+def remove_with_siblings(path):
+    """Delete a generated file together with any precompressed siblings."""
+    path = Path(path)
+    for candidate in (path, path.with_name(path.name + '.gz'),
+                      path.with_name(path.name + '.br')):
+        candidate.unlink(missing_ok=True)
+
+
+def precompress_file(path):
+    """Write .gz (and .br when brotli is installed) siblings if out of date.
+
+    gzip output uses a fixed mtime so unchanged inputs give identical bytes.
+    Returns the number of siblings written.
+    """
+    path = Path(path)
+    source_mtime = path.stat().st_mtime
+    stale = [sibling for sibling in compressed_siblings(path)
+             if not sibling.exists() or sibling.stat().st_mtime < source_mtime]
+    if not stale:
+        return 0
     
-    # Reconstruct the verse text
-    # We need to process the line more carefully to maintain order
-    # Use a different approach: replace tags with their content or remove them
+    data = path.read_bytes()
+    for sibling in stale:
+        if sibling.suffix == '.gz':
+            write_atomic(sibling, gzip.compress(data, compresslevel=9, mtime=0))
+        else:
+            write_atomic(sibling, brotli.compress(data, quality=11))
+    return len(stale)
+
+
+def chapter_number(json_path):
+    """Return the chapter number of a chapter JSON path like Gen/Gen_12.json."""
+    return int(Path(json_path).stem.rsplit('_', 1)[1])
+
+
+def is_chapter_json(path):
+    """Check for a stable chapter path (Gen_12.json), not a bundle or hashed copy."""
+    stem, _, number = Path(path).stem.rpartition('_')
+    return bool(stem) and number.isdigit() and Path(path).suffix == '.json'
+
+
+def fingerprinted_name(path, sha256):
+    """Return the content-hashed file name for a path: Gen_1.json -> Gen_1.<hash>.json."""
+    path = Path(path)
+    return f"{path.stem}.{sha256[:FINGERPRINT_LENGTH]}{path.suffix}"
+
+
+def _write_fingerprinted_copy(path, sha256, output_path, expected):
+    """Copy a file to its hashed name unless present; return (entry, written)."""
+    hashed_path = path.with_name(fingerprinted_name(path, sha256))
+    expected.add(hashed_path)
+    written = not hashed_path.exists()
+    if written:
+        write_atomic(hashed_path, path.read_bytes())
+    entry = {
+        'path': hashed_path.relative_to(output_path).as_posix(),
+        'bytes': path.stat().st_size,
+    }
+    return entry, written
+
+
+def write_fingerprinted(output_dir, structure, chapters, bundles=False):
+    """Write content-hashed chapter copies and the chapter manifest.
+
+    chapters is the build manifest's {"Gen/Gen_1.json": entry} dict; its
+    output hashes name the copies, so nothing is re-hashed. The manifest
+    maps chapter keys ("Gen.1") to the hashed path, byte size and the
+    previous/next chapter keys in kjv_structure.json order, so a client can
+    cache chapters forever and prefetch neighbours. bundles=True also
+    fingerprints the per-book bundles. Hashed copies that no longer match
+    a current file are deleted. Returns a summary dict.
+    """
+    output_path = Path(output_dir)
+    expected = set()
+    written = 0
+    manifest_chapters = {}
+    previous_key = None
+
+    for testament in structure.values():
+        for book_id, book_info in testament['books'].items():
+            for chapter_num in sorted(book_info['chapters'], key=int):
+                output_key = f"{book_id}/{book_id}_{chapter_num}.json"
+                entry = chapters.get(output_key)
+                if entry is None:
+                    continue
+                key = f"{book_id}.{chapter_num}"
+                chapter_entry, copied = _write_fingerprinted_copy(
+                    output_path / output_key, entry['output_sha256'], output_path, expected)
+                written += copied
+                manifest_chapters[key] = {**chapter_entry, 'prev': previous_key, 'next': None}
+                if previous_key is not None:
+                    manifest_chapters[previous_key]['next'] = key
+                previous_key = key
+
+    manifest = {'format': CHAPTER_MANIFEST_FORMAT, 'chapters': manifest_chapters}
+
+    if bundles:
+        manifest['bundles'] = {}
+        for bundle_path in sorted(output_path.glob(f"*/*{BUNDLE_SUFFIX}")):
+            bundle_entry, copied = _write_fingerprinted_copy(
+                bundle_path, file_sha256(bundle_path), output_path, expected)
+            written += copied
+            manifest['bundles'][bundle_path.parent.name] = bundle_entry
+
+    removed = 0
+    for hashed_path in output_path.glob('*/*.json'):
+        if _FINGERPRINTED_RE.search(hashed_path.name) and hashed_path not in expected:
+            remove_with_siblings(hashed_path)
+            removed += 1
+
+    data = json.dumps(manifest, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    write_atomic(output_path / CHAPTER_MANIFEST_FILENAME, data)
+    return {'chapters': len(manifest_chapters), 'written': written, 'removed': removed,
+            'manifest_bytes': len(data)}
+
+
+def _load_note_shard(shard_path):
+    """Return {ordinal: notes} from a study note shard, or {} if missing."""
+    try:
+        with open(shard_path, 'r', encoding='utf-8') as f:
+            return {int(ordinal): notes for ordinal, notes in json.load(f)['notes'].items()}
+    except FileNotFoundError:
+        return {}
+
+
+def write_study_notes(notes_dir, structure, verse_notes, chapters=None):
+    """Write per-book study note shards and the index of annotated verses.
+
+    verse_notes holds (osis_id, [note, ...]) pairs for verses with notes.
+    Each book's shard ({book}.json) maps verse ordinals to their notes;
+    index.json lists every annotated ordinal in order and, per book, its
+    shard and note count, so a client only fetches a shard when notes are
+    opened. chapters lists the chapter keys ("Gen.1") that verse_notes was
+    extracted from: notes of other chapters already in the shards are kept.
+    With chapters=None every shard is rewritten from verse_notes alone.
+    Returns a summary dict.
+    """
+    notes_path = Path(notes_dir)
+    notes_path.mkdir(parents=True, exist_ok=True)
+    index = verse_ordinals.VerseIndex(structure)
+    ordinals = verse_ordinals.build_ordinal_lookup(structure)
+
+    by_book = {}
+    for osis_id, notes in verse_notes:
+        by_book.setdefault(osis_id.split('.', 1)[0], {})[ordinals[osis_id]] = notes
+    if chapters is None:
+        books = set(index.book_ids)
+    else:
+        books = {chapter_key.split('.', 1)[0] for chapter_key in chapters}
+
+    written = 0
+    for book_id in sorted(books & set(index.book_ids)):
+        shard_path = notes_path / f"{book_id}.json"
+        shard = {} if chapters is None else _load_note_shard(shard_path)
+        for chapter_key in chapters or ():
+            book, _, chapter_num = chapter_key.partition('.')
+            if book != book_id:
+                continue
+            try:
+                first, last = index.chapter_range(book_id, chapter_num)
+            except KeyError:
+                continue  # A deleted chapter no longer in the structure
+            shard = {o: notes for o, notes in shard.items() if not first <= o <= last}
+        shard.update(by_book.get(book_id, {}))
+
+        if not shard:
+            remove_with_siblings(shard_path)
+            continue
+        data = json.dumps({
+            'format': STUDY_NOTES_FORMAT,
+            'book': book_id,
+            'notes': {str(o): shard[o] for o in sorted(shard)},
+        }, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        if not shard_path.exists() or shard_path.read_bytes() != data:
+            write_atomic(shard_path, data)
+            written += 1
+
+    # The index covers every shard on disk, in canonical order
+    index_books = {}
+    annotated = []
+    note_count = 0
+    for book_id in index.book_ids:
+        shard = _load_note_shard(notes_path / f"{book_id}.json")
+        if not shard:
+            continue
+        book_notes = sum(len(notes) for notes in shard.values())
+        index_books[book_id] = {'path': f"{book_id}.json", 'verses': len(shard),
+                                'notes': book_notes}
+        annotated.extend(sorted(shard))
+        note_count += book_notes
+    data = json.dumps({
+        'format': STUDY_NOTES_FORMAT,
+        'books': index_books,
+        'verses': annotated,
+    }, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    write_atomic(notes_path / STUDY_NOTES_INDEX_FILENAME, data)
+    return {'books': len(index_books), 'verses': len(annotated), 'notes': note_count,
+            'written': written, 'index_bytes': len(data)}
+
+
+def encode_interlinear_chapter(words, lemma_ids, morph_ids):
+    """Encode a chapter's word tokens as the binary interlinear layout.
+
+    words is [(verse_num, [(start, end, lemma, morph), ...]), ...]. The
+    layout is little-endian, every array aligned to its item size:
+      header        magic, format, verse count, token count  (<4sHHI)
+      verse_starts  uint32 x (verses + 1): first token of verse v at [v - 1]
+      text_start    uint16 per token: offset into the whole verse text
+      text_end      uint16 per token
+      lemma         uint16 per token: index into the lemma dictionary (0 = none)
+      morph         uint16 per token: index into the morph dictionary (0 = none)
+    """
+    verse_count = max((verse_num for verse_num, _ in words), default=0)
+    counts = [0] * (verse_count + 1)
+    columns = [array('H') for _ in range(4)]
+    for verse_num, tokens in sorted(words, key=lambda item: item[0]):
+        counts[verse_num] = len(tokens)
+        for start, end, lemma, morph in tokens:
+            if end > _INTERLINEAR_MAX_ID:
+                raise ValueError(f"Verse {verse_num} too long for uint16 offsets")
+            columns[0].append(start)
+            columns[1].append(end)
+            columns[2].append(lemma_ids[lemma])
+            columns[3].append(morph_ids[morph])
+    verse_starts = array('I', [0])
+    for count in counts[1:]:
+        verse_starts.append(verse_starts[-1] + count)
+    return b''.join([
+        INTERLINEAR_HEADER.pack(INTERLINEAR_MAGIC, INTERLINEAR_FORMAT, verse_count,
+                                 len(columns[0])),
+        little_endian_bytes(verse_starts),
+        *(little_endian_bytes(column) for column in columns),
+    ])
+
+
+def load_interlinear_dictionaries(interlinear_dir):
+    """Return (lemmas, morphs) lists from dictionaries.json, or None if missing."""
+    try:
+        with open(Path(interlinear_dir) / INTERLINEAR_DICTIONARIES_FILENAME, 'r',
+                  encoding='utf-8') as f:
+            dictionaries = json.load(f)
+    except FileNotFoundError:
+        return None
+    return dictionaries['lemmas'], dictionaries['morphs']
+
+
+def write_interlinear(interlinear_dir, chapter_words, removed=(), full=True):
+    """Write binary interlinear chapters and the shared dictionaries.
+
+    chapter_words maps chapter output keys ("Gen/Gen_1.json") to the
+    [(verse_num, tokens)] of extract_word_tokens(); each is written as
+    Gen/Gen_1.bin. With full=True the dictionaries are rebuilt, sorted,
+    from these chapters. Otherwise the existing dictionaries are kept and
+    new values appended, so the IDs in chapters that were not rebuilt stay
+    valid. removed lists output keys whose interlinear file is deleted.
+    Returns a summary dict.
+    """
+    interlinear_path = Path(interlinear_dir)
+    existing = None if full else load_interlinear_dictionaries(interlinear_path)
+    lemmas, morphs = existing or ([''], [''])
+
+    lemma_values = set()
+    morph_values = set()
+    for words in chapter_words.values():
+        for _, tokens in words:
+            for _, _, lemma, morph in tokens:
+                lemma_values.add(lemma)
+                morph_values.add(morph)
+    lemmas = lemmas + sorted(lemma_values - set(lemmas))
+    morphs = morphs + sorted(morph_values - set(morphs))
+    if max(len(lemmas), len(morphs)) > _INTERLINEAR_MAX_ID + 1:
+        raise ValueError("Interlinear dictionaries exceed uint16 IDs")
+    lemma_ids = {value: i for i, value in enumerate(lemmas)}
+    morph_ids = {value: i for i, value in enumerate(morphs)}
+
+    written = 0
+    total_bytes = 0
+    tokens_written = 0
+    for output_key, words in sorted(chapter_words.items()):
+        data = encode_interlinear_chapter(words, lemma_ids, morph_ids)
+        path = (interlinear_path / output_key).with_suffix(INTERLINEAR_SUFFIX)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if not path.exists() or path.read_bytes() != data:
+            write_atomic(path, data)
+            written += 1
+        total_bytes += len(data)
+        tokens_written += sum(len(tokens) for _, tokens in words)
+    for output_key in removed:
+        path = (interlinear_path / output_key).with_suffix(INTERLINEAR_SUFFIX)
+        remove_with_siblings(path)
+        try:
+            path.parent.rmdir()
+        except OSError:
+            pass  # Book directory still has other chapters
+
+    data = json.dumps({'format': INTERLINEAR_FORMAT, 'lemmas': lemmas, 'morphs': morphs},
+                      ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    write_atomic(interlinear_path / INTERLINEAR_DICTIONARIES_FILENAME, data)
+    return {'chapters': len(chapter_words), 'written': written, 'tokens': tokens_written,
+            'bytes': total_bytes, 'lemmas': len(lemmas) - 1, 'morphs': len(morphs) - 1,
+            'dictionary_bytes': len(data)}
+
+
+def write_book_bundle(book_output_dir, force=False):
+    """Write a minified bundle of every chapter in a book directory.
+
+    The bundle maps chapter numbers to the chapter's verse dict, so a
+    client can read a whole book sequentially with one request. It is only
+    rewritten when missing, older than one of its chapters, or forced.
+    Returns True if the bundle was written.
+    """
+    book_output_dir = Path(book_output_dir)
+    bundle_path = book_output_dir / f"{book_output_dir.name}{BUNDLE_SUFFIX}"
+    chapter_paths = sorted(
+        (p for p in book_output_dir.glob(f"{book_output_dir.name}_*.json")
+         if is_chapter_json(p)),
+        key=chapter_number)
     
-    # First, replace transChange tags with their content
-    line_processed = re.sub(r'<ns1:transChange[^>]*>([^<]+)</ns1:transChange>', r'\1', line)
+    if not chapter_paths:
+        remove_with_siblings(bundle_path)
+        return False
     
-    # Replace ns1:w tags with their content
-    line_processed = re.sub(r'<ns1:w[^>]*>([^<]+)</ns1:w>', r'\1', line_processed)
+    if not force and bundle_path.exists():
+        bundle_mtime = bundle_path.stat().st_mtime
+        if all(p.stat().st_mtime <= bundle_mtime for p in chapter_paths):
+            return False
     
-    # Remove all remaining tags
-    line_processed = re.sub(r'<[^>]+>', '', line_processed)
+    bundle = {}
+    for chapter_path in chapter_paths:
+        with open(chapter_path, 'r', encoding='utf-8') as f:
+            bundle[str(chapter_number(chapter_path))] = json.load(f)
     
-    # Clean up extra whitespace
-    text = ' '.join(line_processed.split())
+    data = json.dumps(bundle, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    write_atomic(bundle_path, data)
+    return True
+
+
+def print_size_report(output_path):
+    """Compare the bytes served for chapters and bundles in each encoding."""
+    # Hashed bundles are Gen.bundle.<hash>.json
+    hashed_bundle = f"*/*{BUNDLE_SUFFIX.removesuffix('.json')}.*.json"
+    rows = [
+        ('chapter JSON', "*/*_*.json", False),
+        ('chapter JSON .gz', "*/*_*.json.gz", False),
+        ('chapter JSON .br', "*/*_*.json.br", False),
+        ('book bundles', f"*/*{BUNDLE_SUFFIX}", False),
+        ('book bundles .gz', f"*/*{BUNDLE_SUFFIX}.gz", False),
+        ('book bundles .br', f"*/*{BUNDLE_SUFFIX}.br", False),
+        ('hashed chapters', "*/*_*.json", True),
+        ('hashed chapters .gz', "*/*_*.json.gz", True),
+        ('hashed chapters .br', "*/*_*.json.br", True),
+        ('hashed bundles', hashed_bundle, True),
+        ('hashed bundles .gz', f"{hashed_bundle}.gz", True),
+        ('hashed bundles .br', f"{hashed_bundle}.br", True),
+    ]
     
-    return text.strip()
+    print("\nSize report")
+    print("-" * 50)
+    print(f"{'Format':<20} {'Files':>8} {'Total KB':>12}")
+    for label, pattern, hashed in rows:
+        paths = [p for p in Path(output_path).glob(pattern)
+                 if bool(_FINGERPRINTED_RE.search(p.name)) == hashed]
+        if paths:
+            total = sum(p.stat().st_size for p in paths)
+            print(f"{label:<20} {len(paths):>8} {total / 1024:>12.0f}")
+    print("Files = requests needed to read every book once in that format")
 
 
-def split_long_verse(text, max_length=MAX_VERSE_LENGTH):
-    """Split a long verse into multiple evenly-sized parts at sentence boundaries."""
-    if len(text) <= max_length:
-        return [text]
+def process_chapter_file(xml_file, book_output_dir, output_format='dict', study_notes=False,
+                         interlinear=False):
+    """Extract one chapter XML file and write its JSON in output_format.
+
+    Returns a (json_filename, verse_count, output_sha256, chapter_metrics,
+    notes, words) tuple, or None when the chapter produced no verses and
+    nothing was written. chapter_metrics holds the source verse count,
+    output bytes and per-stage (wall, cpu) timings. With study_notes=True,
+    notes holds (osis_id, [note, ...]) for each verse with study notes, and
+    with interlinear=True, words holds (verse_num, tokens) for each verse
+    (see extract_word_tokens()); both are collected in the same tokenizing
+    pass and are None when not requested.
+    """
+    timer = StageTimer()
     
-    # Calculate how many parts we need for approximately even distribution
-    num_parts = max(2, (len(text) + max_length - 1) // max_length)
-    target_length = len(text) // num_parts
+    with timer.stage('read'):
+        with open(xml_file, 'r', encoding='utf-8') as f:
+            lines = f.readlines()
     
-    # Split on sentence boundaries first
-    sentences = re.split(SPLIT_PATTERN, text)
+    notes = [] if study_notes else None
+    words = [] if interlinear else None
+    on_verse = None
+    if study_notes or interlinear:
+        def on_verse(osis_id, verse_content):
+            if study_notes:
+                verse_notes = extract_study_notes(verse_content)
+                if verse_notes:
+                    notes.append((osis_id, verse_notes))
+            if interlinear:
+                words.append((int(osis_id.rsplit('.', 1)[1]),
+                              extract_word_tokens(verse_content)))
     
-    if len(sentences) <= 1:
-        # If no sentence boundaries found, split at word boundaries
-        words = text.split()
-        words_per_part = len(words) // num_parts
-        
-        parts = []
-        for i in range(num_parts):
-            start_idx = i * words_per_part
-            if i == num_parts - 1:  # Last part gets remaining words
-                end_idx = len(words)
-            else:
-                end_idx = (i + 1) * words_per_part
-            parts.append(' '.join(words[start_idx:end_idx]))
-        
-        return parts
-    
-    # Rebuild sentences with their punctuation
-    full_sentences = []
-    sentence_start = 0
-    for i, sentence in enumerate(sentences):
-        if sentence.strip():  # Skip empty sentences
-            # Find the actual sentence with punctuation in original text
-            sentence_end = text.find(sentence, sentence_start) + len(sentence)
-            # Look for punctuation after the sentence
-            while sentence_end < len(text) and text[sentence_end] in '.!?':
-                sentence_end += 1
-            # Include any trailing space
-            while sentence_end < len(text) and text[sentence_end] == ' ':
-                sentence_end += 1
-            
-            full_sentence = text[sentence_start:sentence_end].strip()
-            if full_sentence:
-                full_sentences.append(full_sentence)
-            sentence_start = sentence_end
-    
-    # If we couldn't find proper sentences, fall back to original splitting
-    if not full_sentences:
-        words = text.split()
-        words_per_part = len(words) // num_parts
-        
-        parts = []
-        for i in range(num_parts):
-            start_idx = i * words_per_part
-            if i == num_parts - 1:
-                end_idx = len(words)
-            else:
-                end_idx = (i + 1) * words_per_part
-            parts.append(' '.join(words[start_idx:end_idx]))
-        
-        return parts
+    with timer.stage('tokenize'):
+        verse_texts = extract_verse_texts(lines, on_verse)
     
-    # Group sentences into parts aiming for target length
-    parts = []
-    current_part = ""
+    with timer.stage('split'):
+        verses = split_verses(verse_texts)
     
-    for sentence in full_sentences:
-        test_part = current_part + (" " if current_part else "") + sentence
-        
-        # If this sentence would make us exceed target and we have content, start new part
-        if len(test_part) > target_length and current_part:
-            parts.append(current_part.strip())
-            current_part = sentence
-        else:
-            current_part = test_part
+    if not verses:
+        return None
     
-    # Add the last part
-    if current_part:
-        parts.append(current_part.strip())
+    # Create JSON filename
+    json_filename = Path(xml_file).stem + ".json"
+    json_path = Path(book_output_dir) / json_filename
     
-    # If we ended up with too few parts, try to balance them better
-    if len(parts) < num_parts and len(parts) > 1:
-        # Find the longest part and try to split it
-        longest_idx = max(range(len(parts)), key=lambda i: len(parts[i]))
-        longest_part = parts[longest_idx]
-        
-        if len(longest_part) > max_length:
-            # Split the longest part
-            words = longest_part.split()
-            mid_point = len(words) // 2
-            part1 = ' '.join(words[:mid_point])
-            part2 = ' '.join(words[mid_point:])
-            
-            # Replace the longest part with the two new parts
-            parts[longest_idx] = part1
-            parts.insert(longest_idx + 1, part2)
+    with timer.stage('serialize'):
+        data = SERIALIZERS[output_format](verses)
+        output_sha256 = hashlib.sha256(data).hexdigest()
     
-    return parts
+    # Write JSON file
+    with timer.stage('write'):
+        write_atomic(json_path, data)
+    
+    chapter_metrics = {
+        'verses': len(verse_texts),
+        'bytes': len(data),
+        'timings': timer.totals(),
+    }
+    return json_filename, len(verses), output_sha256, chapter_metrics, notes, words
 
 
-def extract_verses_from_xml(xml_path):
-    """Extract verses from an OSIS XML file."""
-    verses = {}
-    
-    with open(xml_path, 'r', encoding='utf-8') as f:
-        for line in f:
-            # Check if line contains a verse
-            if '<ns1:verse osisID="' in line and 'sID="' in line:
-                # Extract the OSIS ID
-                osisid_match = re.search(r'osisID="([^"]+)"', line)
-                if osisid_match:
-                    osisid = osisid_match.group(1)
-                    
-                    # Extract the verse content between the start and end tags
-                    # The verse content is between the sID marker and eID marker
-                    start_pattern = r'<ns1:verse[^>]+sID="[^"]+"\s*/>'
-                    end_pattern = r'<ns1:verse[^>]+eID="[^"]+"\s*/>'
-                    
-                    # Find the content between start and end markers
-                    content_match = re.search(f'{start_pattern}(.*?){end_pattern}', line)
-                    if content_match:
-                        verse_content = content_match.group(1)
-                        text = extract_text_from_line(verse_content)
-                        if text:  # Only add non-empty verses
-                            # Check if verse needs to be split
-                            verse_parts = split_long_verse(text)
-                            
-                            if len(verse_parts) == 1:
-                                # Single verse, add normally
-                                verses[osisid] = text
-                            else:
-                                # Multiple parts, add with letter suffixes
-                                for i, part in enumerate(verse_parts):
-                                    suffix = chr(ord('a') + i)  # 'a', 'b', 'c', etc.
-                                    split_osisid = f"{osisid}{suffix}"
-                                    verses[split_osisid] = part
-    
-    return verses
+def _print_progress(done, total, label):
+    """Rewrite a single progress line on the console."""
+    sys.stdout.write(f"\r  [{done:>{len(str(total))}}/{total}] {label:<24}")
+    sys.stdout.flush()
+
+
+def process_all_xml_files(input_dir, output_dir, jobs=1, incremental=False,
+                          bundles=False, compress=False, quiet=False,
+                          metrics_path=None, profile=None, profile_output=None,
+                          fingerprint=False, structure_path=None, output_format='dict',
+                          notes_dir=None, interlinear_dir=None):
+    """Process all XML files in the input directory.
+
+    With jobs > 1 the chapters are fanned out across a process pool; the
+    output files are identical to a serial run. If a pool cannot be
+    started on this platform the run falls back to serial processing.
+
+    Every run records a manifest of source hashes, extractor version and
+    split settings in the output directory. With incremental=True only
+    chapters whose entry no longer matches are rebuilt. Outputs whose
+    source has gone away are deleted either way.
+
+    bundles=True also writes a minified {book}.bundle.json per book, and
+    compress=True writes .gz (and .br, with brotli installed) siblings for
+    every chapter and bundle, followed by a size report.
 
+    fingerprint=True writes content-hashed copies of every chapter (and
+    bundle) next to the stable files, plus chapter_manifest.json with
+    each chapter's hashed path, size and prev/next chapter in the order of
+    the kjv_structure.json at structure_path.
 
-def process_all_xml_files(input_dir, output_dir):
-    """Process all XML files in the input directory."""
+    output_format 'compact' writes the columnar chapter form (see
+    compact_chapters.py) instead of the {osis_id: text} dict.
+
+    notes_dir collects the study notes of every rebuilt chapter in the same
+    pass and updates the per-book note shards there (see
+    write_study_notes()); chapter payloads are unchanged. This also needs
+    structure_path, for verse ordinals. interlinear_dir likewise writes each
+    rebuilt chapter's word tokens as binary columns (see
+    write_interlinear()) with lemma/morph dictionaries shared by the tree.
+
+    Per-stage wall/CPU timings and per-book and per-chapter counters are
+    collected on every run and returned as a dict; metrics_path also writes
+    them as JSON. quiet=True replaces the per-file lines with a progress
+    line updated once per book. profile ('cprofile' or 'tracemalloc') runs
+    the chapters serially under that profiler; cProfile stats are dumped
+    to profile_output if given.
+    """
+    start_time = time.perf_counter()
     input_path = Path(input_dir)
     output_path = Path(output_dir)
+    timer = StageTimer()
+    
+    if profile and jobs > 1:
+        # Profilers only see this process, so keep the work in it
+        print(f"Profiling with {profile}: running serially")
+        jobs = 1
     
     # Create output directory if it doesn't exist
     output_path.mkdir(parents=True, exist_ok=True)
     
-    # Process each book directory
-    book_dirs = [d for d in input_path.iterdir() if d.is_dir()]
-    total_files = 0
-    
-    for book_dir in sorted(book_dirs):
-        book_name = book_dir.name
-        print(f"Processing book: {book_name}")
-        
-        # Create book directory in output
-        book_output_dir = output_path / book_name
-        book_output_dir.mkdir(exist_ok=True)
+    with timer.stage('scan'):
+        manifest_path = output_path / MANIFEST_FILENAME
+        previous = load_manifest(manifest_path)
+        settings = build_settings(output_format, study_notes=notes_dir is not None,
+                                  interlinear=interlinear_dir is not None)
+        # Partial updates need the shared files of a previous run
+        if ((notes_dir is not None
+             and not (Path(notes_dir) / STUDY_NOTES_INDEX_FILENAME).exists())
+                or (interlinear_dir is not None
+                    and load_interlinear_dictionaries(interlinear_dir) is None)):
+            incremental = False
+        chapters = {}
         
-        # Process each XML file in the book directory
-        xml_files = list(book_dir.glob("*.xml"))
+        # Collect every chapter up front so workers never race on mkdir
+        book_dirs = [d for d in input_path.iterdir() if d.is_dir()]
+        tasks = []
+        skipped = 0
         
-        for xml_file in sorted(xml_files):
-            # Extract verses
-            verses = extract_verses_from_xml(xml_file)
+        for book_dir in sorted(book_dirs):
+            # Create book directory in output
+            book_output_dir = output_path / book_dir.name
+            book_output_dir.mkdir(exist_ok=True)
             
-            if verses:
-                # Create JSON filename
-                json_filename = xml_file.stem + ".json"
-                json_path = book_output_dir / json_filename
+            for xml_file in sorted(book_dir.glob("*.xml")):
+                output_key = f"{book_dir.name}/{xml_file.stem}.json"
+                source_sha256 = file_sha256(xml_file)
+                entry = previous.get(output_key)
                 
-                # Write JSON file
-                with open(json_path, 'w', encoding='utf-8') as f:
-                    json.dump(verses, f, ensure_ascii=False, indent=2)
+                if incremental and is_up_to_date(entry, source_sha256, settings,
+                                                 output_path / output_key):
+                    chapters[output_key] = entry
+                    skipped += 1
+                    continue
                 
-                total_files += 1
-                print(f"  Created: {json_path.name} ({len(verses)} verses)")
+                tasks.append((xml_file, book_output_dir, output_key, source_sha256))
+    
+    total_files = 0
+    total_verses = 0
+    total_entries = 0
+    current_book = None
+    book_metrics = {}
+    chapter_metrics = {}
+    verse_notes = []
+    chapter_words = {}
+    parallel = False
+    
+    with capture(profile, profile_output) as profile_summary:
+        for done, (task, result, parallel) in enumerate(
+                _run_tasks(tasks, jobs, output_format, notes_dir is not None,
+                           interlinear_dir is not None), 1):
+            xml_file, book_output_dir, output_key, source_sha256 = task
+            
+            if book_output_dir.name != current_book:
+                current_book = book_output_dir.name
+                if quiet:
+                    _print_progress(done, len(tasks), current_book)
+                elif not parallel:
+                    print(f"Processing book: {current_book}")
+            
+            if not result:
+                continue
+            
+            json_filename, entry_count, output_sha256, metrics, notes, words = result
+            if notes:
+                verse_notes.extend(notes)
+            if words is not None:
+                chapter_words[output_key] = words
+            total_files += 1
+            total_verses += metrics['verses']
+            total_entries += entry_count
+            chapters[output_key] = manifest_entry(
+                f"{book_output_dir.name}/{xml_file.name}",
+                source_sha256, output_sha256, settings)
+            
+            timer.merge(metrics['timings'])
+            seconds = sum(wall for wall, _ in metrics['timings'].values())
+            chapter_metrics[output_key] = {
+                'verses': metrics['verses'],
+                'entries': entry_count,
+                'bytes': metrics['bytes'],
+                'seconds': seconds,
+            }
+            book = book_metrics.setdefault(current_book, {
+                'chapters': 0, 'verses': 0, 'entries': 0, 'bytes': 0, 'seconds': 0.0})
+            book['chapters'] += 1
+            book['verses'] += metrics['verses']
+            book['entries'] += entry_count
+            book['bytes'] += metrics['bytes']
+            book['seconds'] += seconds
+            
+            if quiet:
+                continue
+            if parallel:
+                _print_progress(done, len(tasks), json_filename)
+            else:
+                print(f"  Created: {json_filename} ({metrics['verses']} verses)")
+    
+    if tasks and (parallel or quiet):
+        sys.stdout.write("\n")
+    
+    with timer.stage('cleanup'):
+        # Remove outputs whose source disappeared or no longer yields verses
+        deleted = 0
+        changed_books = set()
+        for output_key in sorted(set(previous) - set(chapters)):
+            stale_path = output_path / output_key
+            if stale_path.exists():
+                remove_with_siblings(stale_path)
+                deleted += 1
+                changed_books.add(stale_path.parent.name)
+    
+    with timer.stage('manifest'):
+        save_manifest(manifest_path, chapters, settings)
+    
+    book_output_dirs = sorted(d for d in output_path.iterdir() if d.is_dir())
+    
+    bundles_written = 0
+    if bundles:
+        with timer.stage('bundles'):
+            for book_output_dir in book_output_dirs:
+                if write_book_bundle(book_output_dir,
+                                     force=book_output_dir.name in changed_books):
+                    bundles_written += 1
+    
+    structure = None
+    if fingerprint or notes_dir is not None:
+        with open(structure_path, 'r', encoding='utf-8') as f:
+            structure = json.load(f)
+    
+    notes_summary = None
+    if notes_dir is not None:
+        with timer.stage('notes'):
+            # Rebuilt and deleted chapters are replaced; skipped ones are kept
+            changed = [task[2] for task in tasks] + sorted(set(previous) - set(chapters))
+            notes_summary = write_study_notes(
+                notes_dir, structure, verse_notes,
+                None if not skipped else
+                [f"{key.split('/')[0]}.{chapter_number(key)}" for key in changed])
+    
+    interlinear_summary = None
+    if interlinear_dir is not None:
+        with timer.stage('interlinear'):
+            interlinear_summary = write_interlinear(
+                interlinear_dir, chapter_words,
+                removed=sorted(set(previous) - set(chapters)), full=not skipped)
+    
+    fingerprinted = None
+    if fingerprint:
+        with timer.stage('fingerprint'):
+            fingerprinted = write_fingerprinted(output_path, structure, chapters, bundles)
+    
+    compressed = 0
+    if compress:
+        with timer.stage('compress'):
+            for book_output_dir in book_output_dirs:
+                for json_path in book_output_dir.glob('*.json'):
+                    compressed += precompress_file(json_path)
+    
+    # Drop book directories left empty by deletions
+    for book_output_dir in book_output_dirs:
+        try:
+            book_output_dir.rmdir()
+        except OSError:
+            pass  # Book directory still has other chapters
+    
+    elapsed = time.perf_counter() - start_time
     
     print(f"\nTotal files processed: {total_files}")
+    print(f"Total verses written: {total_verses} "
+          f"({total_entries} entries, split parts counted separately)")
+    print(f"Chapters rebuilt: {total_files}, skipped: {skipped}, deleted: {deleted}")
+    if bundles:
+        print(f"Book bundles written: {bundles_written}")
+    if fingerprinted:
+        print(f"Hashed copies written: {fingerprinted['written']}, "
+              f"removed: {fingerprinted['removed']}, manifest "
+              f"{fingerprinted['manifest_bytes'] / 1024:.0f} KB "
+              f"({fingerprinted['chapters']} chapters)")
+    if notes_summary:
+        print(f"Study notes: {notes_summary['notes']} notes on {notes_summary['verses']} "
+              f"verses in {notes_summary['books']} book shards "
+              f"({notes_summary['written']} written)")
+    if interlinear_summary:
+        print(f"Interlinear: {interlinear_summary['tokens']} words in "
+              f"{interlinear_summary['chapters']} chapters "
+              f"({interlinear_summary['bytes'] / 1024:.0f} KB), "
+              f"{interlinear_summary['lemmas']} lemmas, {interlinear_summary['morphs']} "
+              f"morph codes ({interlinear_summary['dictionary_bytes'] / 1024:.0f} KB)")
+    if compress:
+        print(f"Compressed siblings written: {compressed}"
+              f"{'' if brotli else ' (brotli not installed, .br skipped)'}")
+    print(f"Elapsed: {elapsed:.2f}s ({jobs} job{'s' if jobs != 1 else ''})")
+    timer.print_summary("Stage timings" + (" (chapter stages summed over workers)"
+                                           if parallel else ""))
+    
+    if bundles or compress or fingerprint:
+        print_size_report(output_path)
+    
+    metrics = {
+        'elapsed': elapsed,
+        'jobs': jobs,
+        'totals': {
+            'chapters_processed': total_files,
+            'chapters_skipped': skipped,
+            'chapters_deleted': deleted,
+            'verses': total_verses,
+            'entries': total_entries,
+            'bytes': sum(book['bytes'] for book in book_metrics.values()),
+        },
+        'stages': timer.as_dict(),
+        'fingerprint': fingerprinted,
+        'study_notes': notes_summary,
+        'interlinear': interlinear_summary,
+        'books': book_metrics,
+        'chapters': chapter_metrics,
+    }
+    if profile:
+        metrics['profile'] = {'profiler': profile, **profile_summary}
+    if metrics_path:
+        write_metrics(metrics_path, metrics)
+        print(f"Metrics saved to: {metrics_path}")
+    return metrics
+
+
+def _run_tasks(tasks, jobs, output_format='dict', study_notes=False, interlinear=False):
+    """Yield (task, result, parallel) for each task, in submission order.
+
+    Results are consumed in order so progress is reported from the parent
+    process only, rather than interleaved prints from workers.
+    """
+    if jobs > 1 and len(tasks) > 1:
+        xml_files = [task[0] for task in tasks]
+        book_output_dirs = [task[1] for task in tasks]
+        chunksize = max(1, len(tasks) // (jobs * 8))
+        
+        try:
+            executor = ProcessPoolExecutor(max_workers=jobs)
+        except (OSError, NotImplementedError) as e:
+            print(f"Process pool unavailable ({e}), falling back to serial")
+        else:
+            with executor:
+                results = executor.map(process_chapter_file, xml_files, book_output_dirs,
+                                       [output_format] * len(tasks),
+                                       [study_notes] * len(tasks),
+                                       [interlinear] * len(tasks), chunksize=chunksize)
+                for task, result in zip(tasks, results):
+                    yield task, result, True
+            return
+    
+    for task in tasks:
+        yield task, process_chapter_file(task[0], task[1], output_format, study_notes,
+                                         interlinear), False
 
 
 def main():
     """Main function."""
+    script_dir = Path(__file__).resolve().parent
+    
+    parser = argparse.ArgumentParser(
+        description="Extract verses from OSIS chapter XML files to JSON.")
+    parser.add_argument('--input', default=script_dir / 'output_chapters',
+                        type=Path, help="directory of per-book chapter XML")
+    parser.add_argument('--output', type=Path,
+                        help="directory to write chapter JSON to (default: "
+                             "output_chapters_json, or output_chapters_compact "
+                             "with --format compact)")
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='dict',
+                        help="chapter JSON layout: OSIS-keyed dict or compact columns")
+    parser.add_argument('--jobs', '-j', type=int, default=os.cpu_count() or 1,
+                        help="worker processes to use (1 = serial)")
+    parser.add_argument('--incremental', action='store_true',
+                        help="only rebuild chapters whose source or settings changed")
+    parser.add_argument('--bundles', action='store_true',
+                        help="also write a minified per-book bundle")
+    parser.add_argument('--compress', action='store_true',
+                        help="write precompressed .gz/.br siblings and a size report")
+    parser.add_argument('--fingerprint', action='store_true',
+                        help="also write content-hashed copies and chapter_manifest.json")
+    parser.add_argument('--notes', action='store_true',
+                        help="also write study notes to per-book shards in --notes-dir")
+    parser.add_argument('--notes-dir', default=script_dir / 'study_notes', type=Path,
+                        help="directory for the study note shards and index")
+    parser.add_argument('--interlinear', action='store_true',
+                        help="also write per-chapter word/lemma/morph columns")
+    parser.add_argument('--interlinear-dir', default=script_dir / 'output_interlinear',
+                        type=Path, help="directory for the interlinear chapters")
+    parser.add_argument('--structure', default=script_dir / 'kjv_structure.json',
+                        type=Path, help="kjv_structure.json, for the chapter order "
+                                        "and verse ordinals")
+    parser.add_argument('--quiet', '-q', action='store_true',
+                        help="show a progress line instead of a line per file")
+    parser.add_argument('--metrics', type=Path,
+                        help="write stage timings and per-book/chapter counters as JSON")
+    parser.add_argument('--profile', choices=PROFILERS,
+                        help="run serially under cProfile or tracemalloc")
+    parser.add_argument('--profile-output', type=Path,
+                        help="file to dump raw cProfile stats to")
+    args = parser.parse_args()
+    if args.output is None:
+        args.output = script_dir / ('output_chapters_compact' if args.format == 'compact'
+                                    else 'output_chapters_json')
+    
     # Test with a single file first
-    test_file = "/Users/christopherhayes/code/osb-bible/obs-bible/public/data/output_chapters/1Chr/1Chr_1.xml"
+    test_file = args.input / "1Chr" / "1Chr_1.xml"
     
     if os.path.exists(test_file):
-        print("Testing with single file...")
-        verses = extract_verses_from_xml(test_file)
-        print(f"Found {len(verses)} verses")
-        
-        # Print first few verses as sample
-        for i, (osisid, text) in enumerate(list(verses.items())[:5]):
-            print(f"{osisid}: {text}")
-        
-        print("\nProceeding to process all files...")
-        input_dir = "/Users/christopherhayes/code/osb-bible/obs-bible/public/data/output_chapters"
-        output_dir = "/Users/christopherhayes/code/osb-bible/obs-bible/public/data/output_chapters_json"
-        process_all_xml_files(input_dir, output_dir)
+        if not args.quiet:
+            print("Testing with single file...")
+            verses = extract_verses_from_xml(test_file)
+            print(f"Found {len(verses)} verses")
+            
+            # Print first few verses as sample
+            for i, (osisid, text) in enumerate(list(verses.items())[:5]):
+                print(f"{osisid}: {text}")
+            
+            print("\nProceeding to process all files...")
+        process_all_xml_files(args.input, args.output, jobs=args.jobs,
+                              incremental=args.incremental, bundles=args.bundles,
+                              compress=args.compress, quiet=args.quiet,
+                              metrics_path=args.metrics, profile=args.profile,
+                              profile_output=args.profile_output,
+                              fingerprint=args.fingerprint, structure_path=args.structure,
+                              output_format=args.format,
+                              notes_dir=args.notes_dir if args.notes else None,
+                              interlinear_dir=(args.interlinear_dir if args.interlinear
+                                               else None))
     else:
         print(f"Test file not found: {test_file}")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
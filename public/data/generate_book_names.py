@@ -9,6 +9,8 @@ to commonly used simple book names instead of the formal long titles.
 import json
 import os
 
+from pipeline_metrics import StageTimer
+
 def extract_simple_name(formal_title, book_id):
     """
     Extract a simple book name from the formal KJV title.
@@ -93,18 +95,167 @@ def extract_simple_name(formal_title, book_id):
     
     return manual_mappings.get(book_id, book_id)
 
+# Other ways people write each book: abbreviations and common misspellings.
+# The OSIS ID and the simple name are always included.
+BOOK_ALIASES = {
+    'Gen': ['Ge', 'Gn', 'Genisis', 'Genesys'],
+    'Exod': ['Ex', 'Exo', 'Exodis', 'Exodous'],
+    'Lev': ['Le', 'Lv', 'Levit', 'Levitcus', 'Leviticous'],
+    'Num': ['Nu', 'Nm', 'Nb', 'Numb'],
+    'Deut': ['De', 'Dt', 'Deu', 'Duet', 'Deutronomy', 'Dueteronomy'],
+    'Josh': ['Jos', 'Jsh', 'Joshuah'],
+    'Judg': ['Jdg', 'Jg', 'Jdgs', 'Judgs'],
+    'Ruth': ['Ru', 'Rth'],
+    'Ezra': ['Ezr'],
+    'Neh': ['Ne', 'Nehemia'],
+    'Esth': ['Es', 'Est', 'Ester'],
+    'Job': ['Jb'],
+    'Ps': ['Psa', 'Psalm', 'Pss', 'Psm', 'Pslm', 'Pslams', 'Salms'],
+    'Prov': ['Pr', 'Pro', 'Prv', 'Proverb', 'Provebs'],
+    'Eccl': ['Ec', 'Ecc', 'Eccles', 'Qoh', 'Qoheleth', 'Ecclesiates', 'Eclesiastes'],
+    'Song': ['SS', 'SOS', 'Songs', 'Song of Solomon', 'Song of Sol', 'Canticles', 'Cant'],
+    'Isa': ['Is', 'Isiah', 'Isaih'],
+    'Jer': ['Je', 'Jr', 'Jeremia', 'Jerimiah'],
+    'Lam': ['La', 'Lamentation'],
+    'Ezek': ['Eze', 'Ezk', 'Ezekial'],
+    'Dan': ['Da', 'Dn', 'Danial'],
+    'Hos': ['Ho', 'Hosia'],
+    'Joel': ['Jl'],
+    'Amos': ['Am'],
+    'Obad': ['Ob', 'Oba', 'Obadia'],
+    'Jonah': ['Jon', 'Jnh', 'Jona'],
+    'Mic': ['Mc', 'Mica'],
+    'Nah': ['Na', 'Nahu'],
+    'Hab': ['Hb', 'Habakuk', 'Habbakuk', 'Habbakkuk'],
+    'Zeph': ['Zep', 'Zp', 'Zephania'],
+    'Hag': ['Hg', 'Hagai'],
+    'Zech': ['Zec', 'Zc', 'Zecharia', 'Zachariah'],
+    'Mal': ['Ml', 'Malachai'],
+    'Matt': ['Mt', 'Mat', 'Mathew', 'Matthews'],
+    'Mark': ['Mk', 'Mr', 'Mrk', 'Mar'],
+    'Luke': ['Lk', 'Lu', 'Luk'],
+    'John': ['Jn', 'Jhn', 'Joh', 'Jo'],
+    'Acts': ['Ac', 'Act', 'Acts of the Apostles'],
+    'Rom': ['Ro', 'Rm', 'Roman'],
+    'Gal': ['Ga', 'Galations'],
+    'Eph': ['Ephes', 'Ephesions'],
+    'Phil': ['Php', 'Pp', 'Phillipians', 'Philipians'],
+    'Col': ['Colosians', 'Collosians'],
+    'Titus': ['Tit'],
+    'Phlm': ['Philem', 'Phm', 'Pm', 'Phillemon'],
+    'Heb': ['He', 'Hebrew'],
+    'Jas': ['Jm', 'Jms'],
+    'Jude': ['Jud', 'Jd'],
+    'Rev': ['Re', 'Rv', 'Revelations', 'Revalation', 'Apocalypse', 'Apoc'],
+}
+
+# Aliases of numbered books without the number (1Sam, 2Sam -> 'Sam')
+NUMBERED_BOOK_ALIASES = {
+    'Sam': ['Sa', 'Sm', 'Samual'],
+    'Kgs': ['Kg', 'Ki', 'Kin', 'Kngs'],
+    'Chr': ['Ch', 'Chron', 'Chro', 'Cronicles', 'Chronicals'],
+    'Cor': ['Co', 'Corin', 'Corinthains', 'Corinthans'],
+    'Thess': ['Th', 'Thes', 'Thesalonians', 'Thessalonions'],
+    'Tim': ['Ti', 'Tm', 'Timothey'],
+    'Pet': ['Pe', 'Pt', 'Ptr'],
+    'John': ['Jn', 'Jhn', 'Joh', 'Jo'],
+}
+
+# Ways of writing a book number; digit forms may also be written without a space
+NUMBER_PREFIXES = {
+    '1': ['1', '1st', 'I', 'First'],
+    '2': ['2', '2nd', 'II', 'Second'],
+    '3': ['3', '3rd', 'III', 'Third'],
+}
+
+
+def normalize_alias(alias):
+    """Normalize an alias the way reference_parser matches input.
+
+    Lowercase, periods dropped, runs of whitespace collapsed to one space.
+    """
+    return ' '.join(alias.replace('.', '').lower().split())
+
+
+def build_book_aliases(book_names, verbose=True):
+    """
+    Build the alias table used to parse free-form references.
+    
+    Args:
+        book_names (dict): Book ID to simple name, as built by build_book_names
+        verbose (bool): Report aliases dropped for being ambiguous
+    
+    Returns:
+        dict: Normalized alias to book ID, sorted by alias
+    """
+    
+    candidates = {}
+    for book_id, simple_name in book_names.items():
+        if book_id[0].isdigit():
+            number, base = book_id[0], book_id[1:]
+            names = [base, simple_name.split(' ', 1)[1]] + NUMBERED_BOOK_ALIASES.get(base, [])
+            aliases = [book_id, simple_name]
+            for prefix in NUMBER_PREFIXES[number]:
+                for name in names:
+                    aliases.append(f"{prefix} {name}")
+                    if prefix.isdigit():
+                        aliases.append(f"{prefix}{name}")
+        else:
+            aliases = [book_id, simple_name] + BOOK_ALIASES.get(book_id, [])
+        
+        for alias in aliases:
+            candidates.setdefault(normalize_alias(alias), set()).add(book_id)
+    
+    book_aliases = {}
+    for alias, book_ids in sorted(candidates.items()):
+        if len(book_ids) == 1:
+            book_aliases[alias] = book_ids.pop()
+        elif verbose:
+            print(f"Ambiguous alias dropped: {alias!r} -> {', '.join(sorted(book_ids))}")
+    
+    return book_aliases
+
+def build_book_names(kjv_data, verbose=True):
+    """
+    Build the book ID to simple name mapping from a Bible structure.
+    
+    Args:
+        kjv_data (dict): Structure as written to kjv_structure.json
+        verbose (bool): Print each mapping as it is made
+    
+    Returns:
+        dict: Book ID to simple book name, in canonical order
+    """
+    
+    book_names = {}
+    
+    # Process Old Testament then New Testament books
+    for testament_key, label in (('old_testament', 'OT'), ('new_testament', 'NT')):
+        if testament_key in kjv_data and 'books' in kjv_data[testament_key]:
+            for book_id, book_data in kjv_data[testament_key]['books'].items():
+                formal_title = book_data.get('title', book_id)
+                simple_name = extract_simple_name(formal_title, book_id)
+                book_names[book_id] = simple_name
+                if verbose:
+                    print(f"{label}: {book_id} -> {simple_name}")
+    
+    return book_names
+
 def generate_book_names():
     """
     Generate book_names.json from kjv_structure.json.
     """
     
+    timer = StageTimer()
+    
     # Read the KJV structure file
     script_dir = os.path.dirname(os.path.abspath(__file__))
     kjv_path = os.path.join(script_dir, 'kjv_structure.json')
     
     try:
-        with open(kjv_path, 'r', encoding='utf-8') as f:
-            kjv_data = json.load(f)
+        with timer.stage('load'):
+            with open(kjv_path, 'r', encoding='utf-8') as f:
+                kjv_data = json.load(f)
     except FileNotFoundError:
         print(f"Error: Could not find {kjv_path}")
         return
@@ -112,32 +263,26 @@ def generate_book_names():
         print(f"Error: Invalid JSON in {kjv_path}: {e}")
         return
     
-    book_names = {}
-    
-    # Process Old Testament books
-    if 'old_testament' in kjv_data and 'books' in kjv_data['old_testament']:
-        for book_id, book_data in kjv_data['old_testament']['books'].items():
-            formal_title = book_data.get('title', book_id)
-            simple_name = extract_simple_name(formal_title, book_id)
-            book_names[book_id] = simple_name
-            print(f"OT: {book_id} -> {simple_name}")
-    
-    # Process New Testament books
-    if 'new_testament' in kjv_data and 'books' in kjv_data['new_testament']:
-        for book_id, book_data in kjv_data['new_testament']['books'].items():
-            formal_title = book_data.get('title', book_id)
-            simple_name = extract_simple_name(formal_title, book_id)
-            book_names[book_id] = simple_name
-            print(f"NT: {book_id} -> {simple_name}")
+    with timer.stage('build'):
+        book_names = build_book_names(kjv_data)
     
     # Write the book names file
     output_path = os.path.join(script_dir, 'book_names.json')
     try:
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(book_names, f, indent=2, ensure_ascii=False)
+        with timer.stage('write'):
+            with open(output_path, 'w', encoding='utf-8') as f:
+                json.dump(book_names, f, indent=2, ensure_ascii=False)
+        
+        with timer.stage('aliases'):
+            book_aliases = build_book_aliases(book_names)
+            aliases_path = os.path.join(script_dir, 'book_aliases.json')
+            with open(aliases_path, 'w', encoding='utf-8') as f:
+                json.dump(book_aliases, f, indent=2, ensure_ascii=False)
         
         print(f"\nSuccessfully generated {output_path}")
         print(f"Total books processed: {len(book_names)}")
+        print(f"Book aliases written: {len(book_aliases)} to {aliases_path}")
+        timer.print_summary()
         
     except IOError as e:
         print(f"Error: Could not write to {output_path}: {e}")
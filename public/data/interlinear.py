@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+Interlinear word streams: which words of each verse carry which Strong's
+lemma and morphology code.
+
+The extractor (--interlinear) and build_bible_data.py (the interlinear
+stage) tokenize every <ns1:w> element while extracting the verse text and
+write, per chapter, a small binary file of parallel columns:
+
+  output_interlinear/dictionaries.json  {"format":1,"lemmas":["","G0011",...],
+                                         "morphs":["","robinson:N-NSM",...]}
+  output_interlinear/Gen/Gen_1.bin      header, verse_starts, text_start,
+                                         text_end, lemma, morph
+
+(see extract_verses_to_json.encode_interlinear_chapter for the layout).
+text_start/text_end index the whole verse text, i.e. the chapter JSON
+parts of a verse joined with single spaces; lemma and morph are IDs into
+the shared dictionaries, 0 meaning none. Every column is a little-endian
+array aligned to its item size, so Python reads it with array.frombytes
+and a browser with typed-array views on the fetched ArrayBuffer, with no
+parsing at all:
+
+  const view = new DataView(buf);
+  const verses = view.getUint16(6, true), tokens = view.getUint32(8, true);
+  const verseStarts = new Uint32Array(buf, 12, verses + 1);
+  const [textStart, textEnd, lemma, morph] = [0, 1, 2, 3].map(
+    i => new Uint16Array(buf, 12 + 4 * (verses + 1) + 2 * i * tokens, tokens));
+"""
+
+import argparse
+import gzip
+import json
+import shutil
+import subprocess
+import sys
+import time
+from array import array
+from pathlib import Path
+
+import compact_chapters
+import extract_verses_to_json as extractor
+import verse_ordinals
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+DEFAULT_INTERLINEAR_DIR = SCRIPT_DIR / 'output_interlinear'
+DEFAULT_JSON_DIR = SCRIPT_DIR / 'output_chapters_json'
+DEFAULT_XML_DIR = SCRIPT_DIR / 'output_chapters'
+
+# Decodes every chapter file listed on stdin (relative to argv[1]) into
+# typed-array views and resolves each token's lemma, as a page would;
+# prints the best time in seconds
+_NODE_DECODE_SCRIPT = """
+const fs = require('fs'), path = require('path');
+const root = process.argv[1];
+const dictionaries = JSON.parse(fs.readFileSync(path.join(root, 'dictionaries.json'), 'utf8'));
+const files = fs.readFileSync(0, 'utf8').split('\\n').filter(Boolean)
+  .map(f => { const b = fs.readFileSync(path.join(root, f));
+              return b.buffer.slice(b.byteOffset, b.byteOffset + b.length); });
+let best = Infinity, seen = 0;
+for (let r = 0; r < Number(process.argv[2]); r++) {
+  const start = process.hrtime.bigint();
+  for (const buf of files) {
+    const view = new DataView(buf);
+    const verses = view.getUint16(6, true), tokens = view.getUint32(8, true);
+    const verseStarts = new Uint32Array(buf, 12, verses + 1);
+    const base = 12 + 4 * (verses + 1);
+    const lemma = new Uint16Array(buf, base + 4 * tokens, tokens);
+    for (let i = 0; i < tokens; i++) if (dictionaries.lemmas[lemma[i]]) seen++;
+  }
+  best = Math.min(best, Number(process.hrtime.bigint() - start) / 1e9);
+}
+console.log(JSON.stringify(best));
+"""
+
+
+class InterlinearChapter:
+    """The decoded columns of one chapter's interlinear file."""
+
+    def __init__(self, data):
+        header = extractor.INTERLINEAR_HEADER
+        if len(data) < header.size:
+            raise ValueError("Interlinear chapter is truncated")
+        magic, version, verse_count, token_count = header.unpack_from(data)
+        if magic != extractor.INTERLINEAR_MAGIC:
+            raise ValueError("Not an interlinear chapter")
+        if version != extractor.INTERLINEAR_FORMAT:
+            raise ValueError(f"Unsupported interlinear format: {version}")
+        expected = header.size + 4 * (verse_count + 1) + 8 * token_count
+        if len(data) != expected:
+            raise ValueError(f"Interlinear chapter has {len(data)} bytes, expected {expected}")
+
+        self.verse_starts = array('I')
+        self.verse_starts.frombytes(data[header.size:header.size + 4 * (verse_count + 1)])
+        offset = header.size + 4 * (verse_count + 1)
+        columns = []
+        for _ in range(4):
+            column = array('H')
+            column.frombytes(data[offset:offset + 2 * token_count])
+            columns.append(column)
+            offset += 2 * token_count
+        self.text_start, self.text_end, self.lemma, self.morph = columns
+        if sys.byteorder == 'big':
+            for column in (self.verse_starts, *columns):
+                column.byteswap()
+        if self.verse_starts[-1] != token_count:
+            raise ValueError("Interlinear verse index does not match the token count")
+
+    @property
+    def verse_count(self):
+        return len(self.verse_starts) - 1
+
+    def tokens(self, verse_num):
+        """Return [(start, end, lemma_id, morph_id), ...] for a verse ([] if none)."""
+        if not 1 <= verse_num <= self.verse_count:
+            return []
+        first, end = self.verse_starts[verse_num - 1], self.verse_starts[verse_num]
+        return list(zip(self.text_start[first:end], self.text_end[first:end],
+                        self.lemma[first:end], self.morph[first:end]))
+
+
+class Interlinear:
+    """Loader for the shared dictionaries, reading chapter files on demand."""
+
+    def __init__(self, interlinear_dir=DEFAULT_INTERLINEAR_DIR):
+        self.interlinear_dir = Path(interlinear_dir)
+        with open(self.interlinear_dir / extractor.INTERLINEAR_DICTIONARIES_FILENAME, 'r',
+                  encoding='utf-8') as f:
+            dictionaries = json.load(f)
+        if dictionaries.get('format') != extractor.INTERLINEAR_FORMAT:
+            raise ValueError(f"Not a format {extractor.INTERLINEAR_FORMAT} "
+                             f"interlinear directory: {self.interlinear_dir}")
+        self.lemmas = dictionaries['lemmas']
+        self.morphs = dictionaries['morphs']
+        self._chapters = {}
+
+    def chapter(self, book_id, chapter_num):
+        """Return the InterlinearChapter of a chapter (KeyError if it has no file)."""
+        key = (book_id, int(chapter_num))
+        chapter = self._chapters.get(key)
+        if chapter is None:
+            path = (self.interlinear_dir / book_id
+                    / f"{book_id}_{chapter_num}{extractor.INTERLINEAR_SUFFIX}")
+            try:
+                data = path.read_bytes()
+            except FileNotFoundError:
+                raise KeyError(f"{book_id}.{chapter_num}") from None
+            chapter = self._chapters[key] = InterlinearChapter(data)
+        return chapter
+
+    def words(self, book_id, chapter_num, verse_num, text):
+        """Return [(word, lemma, morph), ...] for a verse, given its whole text."""
+        return [(text[start:end], self.lemmas[lemma], self.morphs[morph])
+                for start, end, lemma, morph
+                in self.chapter(book_id, chapter_num).tokens(verse_num)]
+
+
+def whole_verse_texts(json_path):
+    """Read a chapter JSON file of either layout into {verse_num: whole text}."""
+    with open(json_path, 'r', encoding='utf-8') as f:
+        verses = json.load(f)
+    if isinstance(verses.get('verses'), list):
+        verses = compact_chapters.decode_chapter(verses)
+    texts = {}
+    for key, text in verses.items():
+        verse_num = int(key.rsplit('.', 1)[1].rstrip('abcdefghijklmnopqrstuvwxyz'))
+        texts[verse_num] = f"{texts[verse_num]} {text}" if verse_num in texts else text
+    return texts
+
+
+def collect_chapter_words(xml_dir):
+    """Tokenize every chapter in xml_dir, as the extractor's --interlinear does.
+
+    Returns {output key ("Gen/Gen_1.json"): [(verse_num, tokens), ...]}.
+    """
+    chapter_words = {}
+    for xml_file in sorted(Path(xml_dir).glob('*/*.xml')):
+        words = []
+
+        def on_verse(osis_id, verse_content):
+            words.append((int(osis_id.rsplit('.', 1)[1]),
+                          extractor.extract_word_tokens(verse_content)))
+
+        extractor.extract_verses_from_xml(xml_file, on_verse)
+        if words:
+            chapter_words[f"{xml_file.parent.name}/{xml_file.stem}.json"] = words
+    return chapter_words
+
+
+def _node_decode_seconds(interlinear_dir, relative_paths, repeat=20):
+    """Best time for Node to decode every chapter; None when node is not installed."""
+    node = shutil.which('node')
+    if node is None:
+        return None
+    result = subprocess.run([node, '-e', _NODE_DECODE_SCRIPT, str(interlinear_dir), str(repeat)],
+                            input='\n'.join(relative_paths), capture_output=True,
+                            text=True, check=True)
+    return json.loads(result.stdout)
+
+
+def interlinear_stats(interlinear_dir, xml_dir=None, repeat=20):
+    """Size and decode time of an interlinear tree, against its source XML."""
+    interlinear_dir = Path(interlinear_dir)
+    paths = sorted(interlinear_dir.glob(f'*/*{extractor.INTERLINEAR_SUFFIX}'))
+    blobs = [path.read_bytes() for path in paths]
+    dictionaries = (interlinear_dir / extractor.INTERLINEAR_DICTIONARIES_FILENAME).read_bytes()
+    interlinear = Interlinear(interlinear_dir)
+
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for data in blobs:
+            InterlinearChapter(data)
+        best = min(best, time.perf_counter() - start)
+    chapters = [InterlinearChapter(data) for data in blobs]
+
+    summary = {
+        'chapters': len(paths),
+        'tokens': sum(len(chapter.lemma) for chapter in chapters),
+        'lemmas': len(interlinear.lemmas) - 1,
+        'morphs': len(interlinear.morphs) - 1,
+        'bytes': sum(len(data) for data in blobs),
+        'gzip_bytes': sum(len(gzip.compress(data, compresslevel=9, mtime=0)) for data in blobs),
+        'dictionary_bytes': len(dictionaries),
+        'dictionary_gzip_bytes': len(gzip.compress(dictionaries, compresslevel=9, mtime=0)),
+        'python_decode_seconds': best,
+        'node_decode_seconds': _node_decode_seconds(
+            interlinear_dir, [str(path.relative_to(interlinear_dir)) for path in paths], repeat),
+        'xml_bytes': None,
+        'xml_gzip_bytes': None,
+    }
+    if xml_dir is not None:
+        xml_data = [path.read_bytes() for path in sorted(Path(xml_dir).glob('*/*.xml'))]
+        summary['xml_bytes'] = sum(len(data) for data in xml_data)
+        summary['xml_gzip_bytes'] = sum(len(gzip.compress(data, compresslevel=9, mtime=0))
+                                        for data in xml_data)
+    return summary
+
+
+def print_stats(summary):
+    """Print the table produced from interlinear_stats()."""
+    print(f"Chapters: {summary['chapters']}, tokens: {summary['tokens']}, "
+          f"lemmas: {summary['lemmas']}, morph codes: {summary['morphs']}")
+    total = summary['bytes'] + summary['dictionary_bytes']
+    total_gzip = summary['gzip_bytes'] + summary['dictionary_gzip_bytes']
+    print(f"{'':<24} {'bytes (KB)':>12} {'gzip (KB)':>12}")
+    rows = [('chapter columns', summary['bytes'], summary['gzip_bytes']),
+            ('dictionaries', summary['dictionary_bytes'], summary['dictionary_gzip_bytes']),
+            ('total', total, total_gzip)]
+    if summary['xml_bytes']:
+        rows.append(('source XML', summary['xml_bytes'], summary['xml_gzip_bytes']))
+    for label, size, gzip_size in rows:
+        print(f"{label:<24} {size / 1024:>12.1f} {gzip_size / 1024:>12.1f}")
+    if summary['xml_bytes']:
+        print(f"Interlinear is {total / summary['xml_bytes']:.1%} of the XML "
+              f"({total_gzip / summary['xml_gzip_bytes']:.1%} gzipped)")
+    print(f"Python decode, all chapters: {summary['python_decode_seconds'] * 1e3:.1f} ms")
+    if summary['node_decode_seconds'] is not None:
+        print(f"Node decode, all chapters:   {summary['node_decode_seconds'] * 1e3:.1f} ms")
+
+
+def main():
+    """Main function."""
+    parser = argparse.ArgumentParser(description="Build, look up or measure interlinear words.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build', help="write the interlinear tree from chapter XML")
+    build_parser.add_argument('--input', default=DEFAULT_XML_DIR, type=Path,
+                              help="directory of per-book chapter XML")
+
+    show_parser = subparsers.add_parser('show', help="print the words of an OSIS reference")
+    show_parser.add_argument('ref', help="OSIS reference, e.g. John.1.1 or Gen.1.1-Gen.1.3")
+    show_parser.add_argument('--json-dir', default=DEFAULT_JSON_DIR, type=Path,
+                             help="chapter JSON directory (dict or compact layout)")
+    show_parser.add_argument('--structure', default=verse_ordinals.DEFAULT_STRUCTURE,
+                             type=Path, help="kjv_structure.json")
+
+    stats_parser = subparsers.add_parser('stats', help="report size and decode time")
+    stats_parser.add_argument('--xml-dir', default=DEFAULT_XML_DIR, type=Path,
+                              help="chapter XML to compare sizes with")
+    stats_parser.add_argument('--repeat', type=int, default=20,
+                              help="timing repetitions (best is reported)")
+
+    for subparser in (build_parser, show_parser, stats_parser):
+        subparser.add_argument('--interlinear-dir', default=DEFAULT_INTERLINEAR_DIR, type=Path,
+                               help="interlinear directory")
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        start_time = time.perf_counter()
+        summary = extractor.write_interlinear(args.interlinear_dir,
+                                              collect_chapter_words(args.input))
+        print(f"Interlinear: {summary['tokens']} words in {summary['chapters']} chapters "
+              f"({summary['bytes'] / 1024:.0f} KB), {summary['lemmas']} lemmas, "
+              f"{summary['morphs']} morph codes ({time.perf_counter() - start_time:.2f}s)")
+        return
+
+    if args.command == 'stats':
+        xml_dir = args.xml_dir if args.xml_dir.is_dir() else None
+        print_stats(interlinear_stats(args.interlinear_dir, xml_dir, args.repeat))
+        return
+
+    index = verse_ordinals.VerseIndex(verse_ordinals.load_structure(args.structure))
+    try:
+        verse_range = index.resolve(args.ref)
+    except (KeyError, ValueError):
+        parser.error(f"unknown reference: {args.ref}")
+    interlinear = Interlinear(args.interlinear_dir)
+    texts = {}
+    for ordinal in range(verse_range.first, verse_range.last + 1):
+        book_id, chapter_num, verse_num = index.location(ordinal)
+        if (book_id, chapter_num) not in texts:
+            texts[book_id, chapter_num] = whole_verse_texts(
+                args.json_dir / book_id / f"{book_id}_{chapter_num}.json")
+        text = texts[book_id, chapter_num].get(verse_num)
+        try:
+            words = interlinear.words(book_id, chapter_num, verse_num, text) \
+                if text is not None else []
+        except KeyError as e:
+            parser.error(f"no interlinear data for {e.args[0]} in {args.interlinear_dir}")
+        print(index.verse_id(ordinal))
+        for word, lemma, morph in words:
+            print(f"  {word or '(untranslated)':<24} {lemma:<16} {morph}")
+
+
+if __name__ == "__main__":
+    main()
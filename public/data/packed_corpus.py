@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Memory-mappable packed corpus with O(1) verse lookup.
+
+All verse text is stored once as a UTF-8 blob, in verse ordinal order (see
+verse_ordinals.py), with each verse followed by a newline. Offset tables
+derived from kjv_structure.json locate any verse in constant time:
+
+  header               magic, format, book/chapter/verse counts, blob size
+  book ids             newline-separated ASCII, padded to 4 bytes
+  book_first_chapter   uint32 per book, plus a final sentinel
+  chapter_first_verse  uint32 per chapter, plus a final sentinel
+  verse_offsets        uint32 byte offset per verse, plus a final sentinel
+  text blob            verse texts, each terminated by '\n'
+
+All integers are little-endian. A verse range is one contiguous slice of
+the blob, so PackedCorpus returns both single verses and ranges as
+zero-copy memoryviews over the mapped file.
+"""
+
+import argparse
+import mmap
+import struct
+import sys
+import time
+from array import array
+from pathlib import Path
+
+import extract_verses_to_json as extractor
+import search_index
+import verse_ordinals
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+DEFAULT_CORPUS = SCRIPT_DIR / 'kjv_corpus.bin'
+DEFAULT_JSON_DIR = SCRIPT_DIR / 'output_chapters_json'
+
+MAGIC = b'OBSP'
+CORPUS_FORMAT = 1
+_HEADER = struct.Struct('<4sHxxIIIII')
+
+
+def write_packed_corpus(verse_texts, structure, output_path):
+    """Write the packed corpus.
+
+    verse_texts is an iterable of (ordinal, text); verses missing from it
+    are stored as empty strings. Returns a summary dict.
+    """
+    book_ids = []
+    book_first_chapter = array('I')
+    chapter_first_verse = array('I')
+    verse_count = 0
+
+    for testament in structure.values():
+        for book_id, book_info in testament['books'].items():
+            book_ids.append(book_id)
+            book_first_chapter.append(len(chapter_first_verse))
+            for chapter_num in sorted(book_info['chapters'], key=int):
+                chapter_first_verse.append(verse_count)
+                verse_count += book_info['chapters'][chapter_num]
+    book_first_chapter.append(len(chapter_first_verse))
+    chapter_first_verse.append(verse_count)
+
+    texts = [''] * verse_count
+    for ordinal, text in verse_texts:
+        texts[ordinal] = text
+
+    verse_offsets = array('I', [0])
+    blob_parts = []
+    size = 0
+    for text in texts:
+        encoded = text.encode('utf-8') + b'\n'
+        blob_parts.append(encoded)
+        size += len(encoded)
+        verse_offsets.append(size)
+
+    id_blob = '\n'.join(book_ids).encode('ascii')
+    id_blob += b'\0' * (-len(id_blob) % 4)
+
+    data = b''.join([
+        _HEADER.pack(MAGIC, CORPUS_FORMAT, len(book_ids), len(chapter_first_verse) - 1,
+                     verse_count, len(id_blob), size),
+        id_blob,
+        extractor.little_endian_bytes(book_first_chapter),
+        extractor.little_endian_bytes(chapter_first_verse),
+        extractor.little_endian_bytes(verse_offsets),
+        *blob_parts,
+    ])
+    extractor.write_atomic(output_path, data)
+
+    return {'verse_count': verse_count, 'text_bytes': size, 'bytes': len(data)}
+
+
+class PackedCorpus:
+    """Read-only, memory-mapped view of a packed corpus file."""
+
+    def __init__(self, path=DEFAULT_CORPUS):
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+
+        (magic, fmt, book_count, chapter_count, verse_count,
+         ids_len, text_len) = _HEADER.unpack_from(self._mmap)
+        if magic != MAGIC or fmt != CORPUS_FORMAT:
+            self.close()
+            raise ValueError(f"Not a format {CORPUS_FORMAT} packed corpus: {path}")
+
+        offset = _HEADER.size
+        self.book_ids = bytes(self._view[offset:offset + ids_len]).rstrip(b'\0').decode('ascii').split('\n')
+        offset += ids_len
+        self._book_index = {book_id: i for i, book_id in enumerate(self.book_ids)}
+
+        self.book_first_chapter, offset = self._uint32_table(offset, book_count + 1)
+        self.chapter_first_verse, offset = self._uint32_table(offset, chapter_count + 1)
+        self.verse_offsets, offset = self._uint32_table(offset, verse_count + 1)
+        self.verse_count = verse_count
+        self._text = self._view[offset:offset + text_len]
+
+    def _uint32_table(self, offset, count):
+        end = offset + 4 * count
+        if sys.byteorder == 'little':
+            table = self._view[offset:end].cast('I')
+        else:
+            table = array('I')
+            table.frombytes(self._view[offset:end])
+            table.byteswap()
+        return table, end
+
+    def close(self):
+        """Release the views and unmap the file."""
+        for name in ('_text', 'verse_offsets', 'chapter_first_verse', 'book_first_chapter'):
+            view = getattr(self, name, None)
+            if isinstance(view, memoryview):
+                view.release()
+        self._view.release()
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def ordinal(self, book_id, chapter, verse):
+        """Return the ordinal of a verse, validating each level."""
+        b = self._book_index[book_id]
+        c = self.book_first_chapter[b] + int(chapter) - 1
+        if not self.book_first_chapter[b] <= c < self.book_first_chapter[b + 1]:
+            raise KeyError(f"{book_id}.{chapter}")
+        o = self.chapter_first_verse[c] + int(verse) - 1
+        if not self.chapter_first_verse[c] <= o < self.chapter_first_verse[c + 1]:
+            raise KeyError(f"{book_id}.{chapter}.{verse}")
+        return o
+
+    def ordinal_of(self, osis_id):
+        """Return the ordinal of an OSIS verse ID; split suffixes are ignored."""
+        verse_id, _ = verse_ordinals.split_osis_id(osis_id)
+        book_id, chapter, verse = verse_id.split('.')
+        return self.ordinal(book_id, chapter, verse)
+
+    def verse_at(self, ordinal):
+        """Zero-copy UTF-8 slice of one verse."""
+        return self._text[self.verse_offsets[ordinal]:self.verse_offsets[ordinal + 1] - 1]
+
+    def range_at(self, first, last):
+        """Zero-copy UTF-8 slice of verses first..last inclusive, newline separated."""
+        return self._text[self.verse_offsets[first]:self.verse_offsets[last + 1] - 1]
+
+    def verse(self, osis_id):
+        """Zero-copy UTF-8 slice of a verse by OSIS ID."""
+        return self.verse_at(self.ordinal_of(osis_id))
+
+    def verse_range(self, start_id, end_id):
+        """Zero-copy UTF-8 slice of a verse range by OSIS IDs, inclusive."""
+        return self.range_at(self.ordinal_of(start_id), self.ordinal_of(end_id))
+
+    def text(self, osis_id):
+        """Decoded text of a verse by OSIS ID."""
+        return str(self.verse(osis_id), 'utf-8')
+
+
+def main():
+    """Main function."""
+    parser = argparse.ArgumentParser(description="Build or read the packed corpus.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build', help="build from chapter JSON")
+    build_parser.add_argument('--input', default=DEFAULT_JSON_DIR, type=Path,
+                              help="chapter JSON directory")
+    build_parser.add_argument('--output', default=DEFAULT_CORPUS, type=Path,
+                              help="packed corpus file to write")
+    build_parser.add_argument('--structure', default=verse_ordinals.DEFAULT_STRUCTURE,
+                              type=Path, help="kjv_structure.json")
+
+    show_parser = subparsers.add_parser('show', help="print a verse or verse range")
+    show_parser.add_argument('start', help="OSIS verse ID, e.g. John.3.16")
+    show_parser.add_argument('end', nargs='?', help="last OSIS verse ID of a range")
+    show_parser.add_argument('--corpus', default=DEFAULT_CORPUS, type=Path,
+                             help="packed corpus file to read")
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        structure = verse_ordinals.load_structure(args.structure)
+        start_time = time.perf_counter()
+        summary = write_packed_corpus(search_index.load_verse_texts(args.input, structure),
+                                      structure, args.output)
+        elapsed = time.perf_counter() - start_time
+        print(f"Packed {summary['verse_count']} verses "
+              f"({summary['bytes'] / 1024:.0f} KB) in {elapsed:.2f}s")
+    else:
+        with PackedCorpus(args.corpus) as corpus:
+            try:
+                text = str(corpus.verse_range(args.start, args.end or args.start), 'utf-8')
+            except (KeyError, ValueError):
+                ref = f"{args.start}-{args.end}" if args.end else args.start
+                parser.error(f"unknown reference: {ref}")
+            print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,399 @@
+#!/usr/bin/env python3
+"""
+Several OSIS translations aligned verse by verse on one versification.
+
+Every source is streamed once (build_bible_data.iter_chapters), in its own
+process, and its verse text extracted exactly as for the chapter JSON. The
+verses are then placed by ordinal in the canonical versification of
+kjv_structure.json (the structure step's output), and written as one
+memory-mappable table in which a verse's text in every translation sits
+in one contiguous slice:
+
+  header          magic, format, translation count, verse count,
+                  work id length, text size
+  work ids        newline-separated ASCII, padded to 4 bytes
+  cell_offsets    uint32 byte offset per (ordinal, translation) cell,
+                  ordinal-major, plus a final sentinel
+  text blob       UTF-8 cell texts, back to back
+
+Cell (o, t) is blob[cell_offsets[o * n + t]:cell_offsets[o * n + t + 1]],
+so verse o in all n translations is blob[cell_offsets[o * n]:
+cell_offsets[o * n + n]]: one read of the mapped file or one HTTP range
+request. All integers are little-endian.
+
+Verses that do not fit the canonical versification are not dropped
+silently. The build writes a report (parallel_report.json) listing, per
+translation, missing and extra books and chapters, chapters whose verse
+count differs, canonical verses that are missing or empty, verses joined
+into one (osisID="Rom.16.25 Rom.16.26"), and the ID and text of every
+verse outside the canonical versification.
+"""
+
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+import xml.etree.ElementTree as ET
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import build_bible_data
+import extract_verses_to_json as extractor
+import verse_ordinals
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+DEFAULT_TABLE = SCRIPT_DIR / 'parallel_corpus.bin'
+DEFAULT_REPORT = SCRIPT_DIR / 'parallel_report.json'
+
+MAGIC = b'OBSL'
+TABLE_FORMAT = 1
+REPORT_FORMAT = 1
+_HEADER = struct.Struct('<4sHHIII')
+
+
+def read_work_id(xml_path):
+    """Return the osisIDWork of an OSIS source ('' if it has none)."""
+    for _, elem in ET.iterparse(xml_path, events=('start',)):
+        if elem.tag == build_bible_data.TAG_OSIS_TEXT:
+            return elem.get('osisIDWork', '')
+    return ''
+
+
+def scan_translation(xml_path):
+    """Stream one OSIS source; returns its chapters and whole-verse texts.
+
+    The result is a dict with 'chapters' ([(book_id, chapter_num,
+    verse_count)] in source order), 'verses' ([(osis_id, text)], osis_id
+    as in the source, possibly several IDs separated by spaces) and
+    'empty' (IDs of verses without text).
+    """
+    start_time = time.perf_counter()
+    chapters = []
+    verses = []
+    seen = []
+
+    def on_verse(osis_id, verse_content):
+        seen.append(osis_id)
+
+    try:
+        for book_id, _, chapter_num, verse_count, chapter_xml in (
+                build_bible_data.iter_chapters(xml_path)):
+            chapters.append((book_id, int(chapter_num), verse_count))
+            verses.extend(extractor.extract_verse_texts(
+                chapter_xml.splitlines(keepends=True), on_verse).items())
+    except ET.ParseError as e:
+        raise ValueError(f"{xml_path}: {e}") from None
+    with_text = {osis_id for osis_id, _ in verses}
+    return {
+        'path': str(xml_path),
+        'chapters': chapters,
+        'verses': verses,
+        'empty': [osis_id for osis_id in seen if osis_id not in with_text],
+        'seconds': time.perf_counter() - start_time,
+    }
+
+
+def align_translation(scan, index, structure):
+    """Place a scanned translation on the canonical ordinals.
+
+    Returns (texts, differences): texts is a list of verse_count strings
+    ('' where the translation has no text for a verse) and differences
+    the translation's entry in the versification report.
+    """
+    texts = [''] * index.verse_count
+    has_text = bytearray(index.verse_count)
+    extra_verses = []
+    joined = []
+    duplicates = []
+    for osis_id, text in scan['verses']:
+        first_id, *other_ids = osis_id.split()
+        try:
+            ordinal = index.ordinal(*first_id.split('.'))
+        except (KeyError, ValueError, TypeError):
+            extra_verses.append({'osisID': osis_id, 'text': text})
+            continue
+        if has_text[ordinal]:
+            duplicates.append(first_id)
+            texts[ordinal] += ' ' + text
+            continue
+        texts[ordinal] = text
+        has_text[ordinal] = 1
+        if other_ids:
+            # One verse standing for several: the canonical verses it
+            # absorbs stay empty and are listed here, not as missing
+            joined.append(osis_id)
+            for other_id in other_ids:
+                try:
+                    has_text[index.ordinal(*other_id.split('.'))] = 2
+                except (KeyError, ValueError, TypeError):
+                    extra_verses.append({'osisID': other_id, 'text': ''})
+
+    canonical = {}
+    for testament in structure.values():
+        for book_id, book_info in testament['books'].items():
+            for chapter_num, verse_count in book_info['chapters'].items():
+                canonical[(book_id, int(chapter_num))] = verse_count
+    source = {(book_id, chapter_num): verse_count
+              for book_id, chapter_num, verse_count in scan['chapters']}
+    canonical_books = list(dict.fromkeys(book_id for book_id, _ in canonical))
+    source_books = list(dict.fromkeys(book_id for book_id, _, _ in scan['chapters']))
+
+    empty = set(scan['empty'])
+    missing_verses = []
+    empty_verses = []
+    for ordinal, osis_id in enumerate(verse_ordinals.iter_verse_ids(structure)):
+        book_id, chapter_num, _ = osis_id.split('.')
+        if has_text[ordinal] or (book_id, int(chapter_num)) not in source:
+            continue  # Reported with its verse, chapter or book
+        (empty_verses if osis_id in empty else missing_verses).append(osis_id)
+
+    differences = {
+        'missing_books': [book_id for book_id in canonical_books if book_id not in source_books],
+        'extra_books': [book_id for book_id in source_books if book_id not in canonical_books],
+        'missing_chapters': [f"{book_id}.{chapter_num}" for book_id, chapter_num in canonical
+                             if (book_id, chapter_num) not in source
+                             and book_id in source_books],
+        'extra_chapters': [f"{book_id}.{chapter_num}" for book_id, chapter_num in source
+                           if (book_id, chapter_num) not in canonical
+                           and book_id in canonical_books],
+        'verse_counts': {f"{book_id}.{chapter_num}": [canonical[book_id, chapter_num], count]
+                         for (book_id, chapter_num), count in source.items()
+                         if canonical.get((book_id, chapter_num), count) != count},
+        'missing_verses': missing_verses,
+        'empty_verses': empty_verses,
+        'joined_verses': joined,
+        'duplicate_verses': duplicates,
+        'extra_verses': extra_verses,
+    }
+    return texts, differences
+
+
+def write_parallel_table(works, translations, output_path):
+    """Write the aligned table; translations holds one texts list per work.
+
+    Returns a summary dict.
+    """
+    verse_count = len(translations[0]) if translations else 0
+    cell_offsets = array('I', [0])
+    blob_parts = []
+    size = 0
+    for ordinal in range(verse_count):
+        for texts in translations:
+            encoded = texts[ordinal].encode('utf-8')
+            blob_parts.append(encoded)
+            size += len(encoded)
+            cell_offsets.append(size)
+
+    id_blob = '\n'.join(works).encode('ascii')
+    id_blob += b'\0' * (-len(id_blob) % 4)
+
+    data = b''.join([
+        _HEADER.pack(MAGIC, TABLE_FORMAT, len(works), verse_count, len(id_blob), size),
+        id_blob,
+        extractor.little_endian_bytes(cell_offsets),
+        *blob_parts,
+    ])
+    extractor.write_atomic(output_path, data)
+    return {'translations': len(works), 'verse_count': verse_count,
+            'text_bytes': size, 'bytes': len(data)}
+
+
+def _parse_source(spec):
+    """Split a 'WORK=path' source argument; WORK defaults to the file's osisIDWork."""
+    name, sep, path = spec.partition('=')
+    if sep and name and not Path(spec).exists():
+        return name, Path(path)
+    path = Path(spec)
+    return read_work_id(path) or path.stem, path
+
+
+def build_parallel_corpus(sources, structure, output_path=DEFAULT_TABLE,
+                          report_path=DEFAULT_REPORT, jobs=1):
+    """Scan sources ([(work, path)]) concurrently and write the table and report."""
+    start_time = time.perf_counter()
+    works = [work for work, _ in sources]
+    duplicate_works = sorted({work for work in works if works.count(work) > 1})
+    if duplicate_works:
+        raise ValueError(f"Translations share a work ID ({', '.join(duplicate_works)}); "
+                         f"name them with WORK=path")
+    if not all(work.isascii() and '\n' not in work for work in works):
+        raise ValueError("Work IDs must be single-line ASCII")
+
+    paths = [path for _, path in sources]
+    scans = None
+    if jobs > 1 and len(paths) > 1:
+        try:
+            executor = ProcessPoolExecutor(max_workers=min(jobs, len(paths)))
+        except (OSError, NotImplementedError) as e:
+            print(f"Process pool unavailable ({e}), falling back to serial")
+        else:
+            with executor:
+                scans = list(executor.map(scan_translation, paths))
+    if scans is None:
+        scans = [scan_translation(path) for path in paths]
+
+    index = verse_ordinals.VerseIndex(structure)
+    translations = []
+    report = {'format': REPORT_FORMAT, 'verse_count': index.verse_count, 'translations': {}}
+    for work, scan in zip(works, scans):
+        texts, differences = align_translation(scan, index, structure)
+        translations.append(texts)
+        report['translations'][work] = {
+            'path': scan['path'],
+            'verses': sum(1 for text in texts if text),
+            'seconds': round(scan['seconds'], 3),
+            **differences,
+        }
+
+    summary = write_parallel_table(works, translations, output_path)
+    extractor.write_atomic(report_path, json.dumps(report, indent=2,
+                                                   ensure_ascii=False).encode('utf-8'))
+    summary['report'] = report
+    summary['seconds'] = time.perf_counter() - start_time
+    return summary
+
+
+class ParallelCorpus:
+    """Read-only, memory-mapped view of a parallel table."""
+
+    def __init__(self, path=DEFAULT_TABLE):
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+
+        magic, fmt, work_count, verse_count, ids_len, text_len = _HEADER.unpack_from(self._mmap)
+        if magic != MAGIC or fmt != TABLE_FORMAT:
+            self.close()
+            raise ValueError(f"Not a format {TABLE_FORMAT} parallel table: {path}")
+
+        offset = _HEADER.size
+        self.works = bytes(self._view[offset:offset + ids_len]).rstrip(b'\0').decode('ascii').split('\n')
+        offset += ids_len
+        self.verse_count = verse_count
+        end = offset + 4 * (verse_count * work_count + 1)
+        if sys.byteorder == 'little':
+            self.cell_offsets = self._view[offset:end].cast('I')
+        else:
+            self.cell_offsets = array('I')
+            self.cell_offsets.frombytes(self._view[offset:end])
+            self.cell_offsets.byteswap()
+        self._text = self._view[end:end + text_len]
+
+    def close(self):
+        """Release the views and unmap the file."""
+        for name in ('_text', 'cell_offsets'):
+            view = getattr(self, name, None)
+            if isinstance(view, memoryview):
+                view.release()
+        self._view.release()
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def row(self, ordinal):
+        """Zero-copy UTF-8 slice of one verse in every translation, concatenated."""
+        n = len(self.works)
+        return self._text[self.cell_offsets[ordinal * n]:self.cell_offsets[ordinal * n + n]]
+
+    def verse_at(self, ordinal):
+        """Return {work: text} for one verse ('' where a translation lacks it)."""
+        if not 0 <= ordinal < self.verse_count:
+            raise IndexError(f"Verse ordinal out of range: {ordinal}")
+        n = len(self.works)
+        base = self.cell_offsets[ordinal * n]
+        row = bytes(self.row(ordinal))
+        return {work: row[self.cell_offsets[ordinal * n + t] - base:
+                          self.cell_offsets[ordinal * n + t + 1] - base].decode('utf-8')
+                for t, work in enumerate(self.works)}
+
+
+def print_report(report):
+    """Print a summary of the versification report."""
+    for work, entry in report['translations'].items():
+        print(f"{work}: {entry['verses']}/{report['verse_count']} verses "
+              f"({entry['path']}, scanned in {entry['seconds']:.2f}s)")
+        rows = [('missing books', entry['missing_books']),
+                ('extra books', entry['extra_books']),
+                ('missing chapters', entry['missing_chapters']),
+                ('extra chapters', entry['extra_chapters']),
+                ('verse count differs', [f"{chapter} ({canonical} vs {count})" for chapter,
+                                         (canonical, count) in entry['verse_counts'].items()]),
+                ('missing verses', entry['missing_verses']),
+                ('empty verses', entry['empty_verses']),
+                ('joined verses', entry['joined_verses']),
+                ('duplicate verses', entry['duplicate_verses']),
+                ('extra verses', [verse['osisID'] for verse in entry['extra_verses']])]
+        for label, values in rows:
+            if values:
+                shown = ', '.join(values[:8]) + (f" (+{len(values) - 8} more)"
+                                                 if len(values) > 8 else '')
+                print(f"  {label}: {len(values)}: {shown}")
+
+
+def main():
+    """Main function."""
+    parser = argparse.ArgumentParser(
+        description="Align OSIS translations verse by verse on one versification.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build', help="scan sources and write the table")
+    build_parser.add_argument('sources', nargs='+',
+                              help="OSIS source files, optionally as WORK=path "
+                                   "(default WORK: the file's osisIDWork)")
+    build_parser.add_argument('--structure', default=verse_ordinals.DEFAULT_STRUCTURE,
+                              type=Path, help="canonical versification (kjv_structure.json)")
+    build_parser.add_argument('--report', default=DEFAULT_REPORT, type=Path,
+                              help="versification report to write")
+    build_parser.add_argument('--jobs', '-j', type=int, default=os.cpu_count() or 1,
+                              help="worker processes (one source each)")
+
+    show_parser = subparsers.add_parser('show', help="print a reference in every translation")
+    show_parser.add_argument('ref', help="OSIS reference, e.g. John.3.16 or Rom.16")
+    show_parser.add_argument('--structure', default=verse_ordinals.DEFAULT_STRUCTURE,
+                             type=Path, help="kjv_structure.json the table was built with")
+
+    for subparser in (build_parser, show_parser):
+        subparser.add_argument('--table', default=DEFAULT_TABLE, type=Path,
+                               help="parallel table file")
+    args = parser.parse_args()
+    structure = verse_ordinals.load_structure(args.structure)
+
+    if args.command == 'build':
+        try:
+            summary = build_parallel_corpus([_parse_source(spec) for spec in args.sources],
+                                            structure, args.table, args.report, args.jobs)
+        except ValueError as e:
+            parser.error(str(e))
+        print_report(summary['report'])
+        print(f"Aligned {summary['translations']} translations over "
+              f"{summary['verse_count']} verses ({summary['bytes'] / 1024:.0f} KB) "
+              f"in {summary['seconds']:.2f}s")
+        print(f"Report: {args.report}")
+        return
+
+    index = verse_ordinals.VerseIndex(structure)
+    try:
+        verse_range = index.resolve(args.ref)
+    except (KeyError, ValueError):
+        parser.error(f"unknown reference: {args.ref}")
+    with ParallelCorpus(args.table) as corpus:
+        if corpus.verse_count != index.verse_count:
+            parser.error(f"{args.table} has {corpus.verse_count} verses, "
+                         f"{args.structure} {index.verse_count}")
+        width = max(len(work) for work in corpus.works)
+        for ordinal in range(verse_range.first, verse_range.last + 1):
+            print(index.verse_id(ordinal))
+            for work, text in corpus.verse_at(ordinal).items():
+                print(f"  {work:<{width}}  {text or '-'}")
+
+
+if __name__ == "__main__":
+    main()
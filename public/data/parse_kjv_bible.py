@@ -1,7 +1,11 @@
 import xml.etree.ElementTree as ET
 from collections import defaultdict
+from pathlib import Path
+import argparse
 import json
 
+from pipeline_metrics import PROFILERS, StageTimer, capture, write_metrics
+
 # Define book categories
 BOOK_CATEGORIES = {
     # Old Testament
@@ -93,15 +97,52 @@ BOOK_CATEGORIES = {
     'Rev': 'Prophecy'
 }
 
-def parse_kjv_bible(xml_path):
-    """Parse KJV Bible XML to extract book names, chapters, and verse counts."""
+OSIS_NS = 'http://www.bibletechnologies.net/2003/OSIS/namespace'
+
+OLD_TESTAMENT_BOOKS = ['Gen', 'Exod', 'Lev', 'Num', 'Deut', 'Josh', 'Judg', 'Ruth', 
+                       '1Sam', '2Sam', '1Kgs', '2Kgs', '1Chr', '2Chr', 'Ezra', 'Neh', 'Esth',
+                       'Job', 'Ps', 'Prov', 'Eccl', 'Song', 'Isa', 'Jer', 'Lam', 'Ezek', 'Dan',
+                       'Hos', 'Joel', 'Amos', 'Obad', 'Jonah', 'Mic', 'Nah', 'Hab', 'Zeph', 'Hag', 'Zech', 'Mal']
+
+NEW_TESTAMENT_BOOKS = ['Matt', 'Mark', 'Luke', 'John', 'Acts', 'Rom', '1Cor', '2Cor', 'Gal', 'Eph', 
+                       'Phil', 'Col', '1Thess', '2Thess', '1Tim', '2Tim', 'Titus', 'Phlm', 'Heb',
+                       'Jas', '1Pet', '2Pet', '1John', '2John', '3John', 'Jude', 'Rev']
+
+def parse_kjv_bible(xml_path, streaming=True):
+    """Parse KJV Bible XML to extract book names, chapters, and verse counts.
+    
+    By default the file is streamed with iterparse so memory stays flat
+    regardless of the source size; streaming=False loads the whole tree.
+    """
+    if streaming:
+        bible_structure = parse_structure_streaming(xml_path)
+    else:
+        bible_structure = parse_structure_tree(xml_path)
+    
+    return organize_by_testament(bible_structure)
+
+def new_book_entry(book_id, book_title):
+    """Create the structure entry for a book before its chapters are counted."""
+    return {
+        'title': book_title,
+        'category': BOOK_CATEGORIES.get(book_id, 'Unknown'),
+        'chapters': {}
+    }
+
+def finish_book_entry(book_info):
+    """Calculate total chapters and verses for a book."""
+    book_info['chapter_count'] = len(book_info['chapters'])
+    book_info['total_verses'] = sum(book_info['chapters'].values())
+
+def parse_structure_tree(xml_path):
+    """Build the flat book structure by loading the whole XML tree."""
     
     # Parse the XML file
     tree = ET.parse(xml_path)
     root = tree.getroot()
     
     # Define the namespace
-    ns = {'osis': 'http://www.bibletechnologies.net/2003/OSIS/namespace'}
+    ns = {'osis': OSIS_NS}
     
     # Dictionary to store results
     bible_structure = {}
@@ -115,11 +156,7 @@ def parse_kjv_bible(xml_path):
         book_title = title_elem.text if title_elem is not None else book_id
         
         # Initialize book structure
-        bible_structure[book_id] = {
-            'title': book_title,
-            'category': BOOK_CATEGORIES.get(book_id, 'Unknown'),
-            'chapters': {}
-        }
+        bible_structure[book_id] = new_book_entry(book_id, book_title)
         
         # Find all chapters in this book
         for chapter in book.findall('.//osis:chapter', ns):
@@ -133,24 +170,80 @@ def parse_kjv_bible(xml_path):
                 
                 bible_structure[book_id]['chapters'][chapter_num] = verse_count
         
-        # Calculate total chapters and verses for the book
-        chapter_count = len(bible_structure[book_id]['chapters'])
-        total_verses = sum(bible_structure[book_id]['chapters'].values())
-        
-        bible_structure[book_id]['chapter_count'] = chapter_count
-        bible_structure[book_id]['total_verses'] = total_verses
+        finish_book_entry(bible_structure[book_id])
+    
+    return bible_structure
+
+def parse_structure_streaming(xml_path):
+    """Build the flat book structure in one streaming pass.
     
-    # Organize books by testament
-    old_testament_books = ['Gen', 'Exod', 'Lev', 'Num', 'Deut', 'Josh', 'Judg', 'Ruth', 
-                          '1Sam', '2Sam', '1Kgs', '2Kgs', '1Chr', '2Chr', 'Ezra', 'Neh', 'Esth',
-                          'Job', 'Ps', 'Prov', 'Eccl', 'Song', 'Isa', 'Jer', 'Lam', 'Ezek', 'Dan',
-                          'Hos', 'Joel', 'Amos', 'Obad', 'Jonah', 'Mic', 'Nah', 'Hab', 'Zeph', 'Hag', 'Zech', 'Mal']
+    Each element is cleared and detached from its parent as soon as it
+    ends, so only the open path through the document is held in memory.
+    Verses are counted by their sID milestones (or once per element for
+    container-style verses), and chapters may be either containers or
+    sID/eID milestones.
+    """
+    bible_structure = {}
+    book_id = None
+    book_depth = None
+    title_found = False
+    chapter_num = None
+    open_elements = []
     
-    new_testament_books = ['Matt', 'Mark', 'Luke', 'John', 'Acts', 'Rom', '1Cor', '2Cor', 'Gal', 'Eph', 
-                          'Phil', 'Col', '1Thess', '2Thess', '1Tim', '2Tim', 'Titus', 'Phlm', 'Heb',
-                          'Jas', '1Pet', '2Pet', '1John', '2John', '3John', 'Jude', 'Rev']
+    for event, elem in ET.iterparse(xml_path, events=('start', 'end')):
+        # Match on local names so both prefixed and default namespaces work
+        tag = elem.tag.rpartition('}')[2]
+        
+        if event == 'start':
+            open_elements.append(elem)
+            
+            if tag == 'div' and elem.get('type') == 'book':
+                book_id = elem.get('osisID')
+                bible_structure[book_id] = new_book_entry(book_id, book_id)
+                book_depth = len(open_elements)
+                title_found = False
+            
+            elif tag == 'chapter' and book_id is not None:
+                chapter_id = elem.get('osisID')
+                if elem.get('eID') is None and chapter_id:
+                    chapter_num = chapter_id.split('.')[-1]
+                    bible_structure[book_id]['chapters'].setdefault(chapter_num, 0)
+                else:
+                    chapter_num = None
+            
+            elif tag == 'verse' and chapter_num:
+                if elem.get('sID') is not None or elem.get('eID') is None:
+                    bible_structure[book_id]['chapters'][chapter_num] += 1
+            
+            continue
+        
+        # End event: the element's text is complete here
+        depth = len(open_elements)
+        
+        if book_id is not None:
+            if (tag == 'title' and depth == book_depth + 1
+                    and elem.get('type') == 'main' and not title_found):
+                bible_structure[book_id]['title'] = elem.text
+                title_found = True
+            
+            elif tag == 'chapter' and elem.get('sID') is None:
+                chapter_num = None
+            
+            elif depth == book_depth:
+                finish_book_entry(bible_structure[book_id])
+                book_id = None
+                book_depth = None
+        
+        # Every earlier sibling is already gone, so this removal is O(1)
+        open_elements.pop()
+        elem.clear()
+        if open_elements:
+            open_elements[-1].remove(elem)
     
-    # Reorganize into testament structure
+    return bible_structure
+
+def organize_by_testament(bible_structure):
+    """Reorganize the flat book structure into testaments."""
     organized_structure = {
         'old_testament': {
             'name': 'Old Testament',
@@ -163,9 +256,9 @@ def parse_kjv_bible(xml_path):
     }
     
     for book_id, book_info in bible_structure.items():
-        if book_id in old_testament_books:
+        if book_id in OLD_TESTAMENT_BOOKS:
             organized_structure['old_testament']['books'][book_id] = book_info
-        elif book_id in new_testament_books:
+        elif book_id in NEW_TESTAMENT_BOOKS:
             organized_structure['new_testament']['books'][book_id] = book_info
     
     return organized_structure
@@ -229,15 +322,39 @@ def save_to_json(bible_structure, output_path):
     print(f"\nData saved to: {output_path}")
 
 if __name__ == "__main__":
-    # Path to the KJV XML file
-    xml_path = "/Users/christopherhayes/code/osb-bible/osb-bible/public/data/kjvfull.xml"
+    script_dir = Path(__file__).resolve().parent
+    
+    parser = argparse.ArgumentParser(
+        description="Extract book, chapter and verse counts from an OSIS Bible.")
+    parser.add_argument('xml_path', nargs='?', default=script_dir / 'kjvfull.xml',
+                        type=Path, help="OSIS source file (default: kjvfull.xml)")
+    parser.add_argument('--output', default=script_dir / 'kjv_structure.json',
+                        type=Path, help="structure JSON to write")
+    parser.add_argument('--tree', action='store_true',
+                        help="load the whole XML tree instead of streaming it")
+    parser.add_argument('--metrics', type=Path,
+                        help="write stage timings as JSON")
+    parser.add_argument('--profile', choices=PROFILERS,
+                        help="run the parse under cProfile or tracemalloc")
+    args = parser.parse_args()
+    timer = StageTimer()
     
     print("Parsing KJV Bible XML...")
-    bible_structure = parse_kjv_bible(xml_path)
+    with capture(args.profile) as profile_summary, timer.stage('parse'):
+        bible_structure = parse_kjv_bible(args.xml_path, streaming=not args.tree)
     
     # Print summary
-    print_bible_summary(bible_structure)
+    with timer.stage('summary'):
+        print_bible_summary(bible_structure)
     
     # Save to JSON
-    output_path = "/Users/christopherhayes/code/osb-bible/osb-bible/public/data/kjv_structure.json"
-    save_to_json(bible_structure, output_path)
\ No newline at end of file
+    with timer.stage('save'):
+        save_to_json(bible_structure, args.output)
+    
+    timer.print_summary()
+    if args.metrics:
+        metrics = {'stages': timer.as_dict()}
+        if args.profile:
+            metrics['profile'] = {'profiler': args.profile, **profile_summary}
+        write_metrics(args.metrics, metrics)
+        print(f"Metrics saved to: {args.metrics}")
\ No newline at end of file
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Instrumentation shared by the data scripts.
+
+StageTimer accumulates wall-clock and CPU time per named stage, and
+capture() optionally runs cProfile or tracemalloc around a block. The
+scripts write what they collect as a metrics JSON file so runs can be
+compared.
+"""
+
+import cProfile
+import json
+import pstats
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+PROFILERS = ('cprofile', 'tracemalloc')
+
+
+class StageTimer:
+    """Wall and CPU time accumulated per named stage."""
+
+    def __init__(self):
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name):
+        """Time the enclosed block as one call of a stage."""
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - wall, time.process_time() - cpu)
+
+    def add(self, name, wall, cpu, calls=1):
+        """Add time to a stage."""
+        totals = self.stages.setdefault(name, [0.0, 0.0, 0])
+        totals[0] += wall
+        totals[1] += cpu
+        totals[2] += calls
+
+    def totals(self):
+        """Return {stage: (wall, cpu)}, compact enough to send from a worker."""
+        return {name: (wall, cpu) for name, (wall, cpu, _) in self.stages.items()}
+
+    def merge(self, totals):
+        """Add a {stage: (wall, cpu)} dict from totals() as one call each."""
+        for name, (wall, cpu) in totals.items():
+            self.add(name, wall, cpu)
+
+    def wall(self, *names):
+        """Total wall time of the given stages (all stages if none given)."""
+        return sum(self.stages[name][0] for name in names or self.stages
+                   if name in self.stages)
+
+    def as_dict(self):
+        """Return the stages as plain JSON-serializable data."""
+        return {name: {'wall': wall, 'cpu': cpu, 'calls': calls}
+                for name, (wall, cpu, calls) in self.stages.items()}
+
+    def print_summary(self, title="Stage timings"):
+        """Print a table of the stages in the order they were first timed."""
+        total = self.wall() or 1
+        print(f"\n{title}:")
+        print(f"  {'stage':<12} {'wall':>9} {'cpu':>9} {'calls':>7} {'share':>6}")
+        for name, (wall, cpu, calls) in self.stages.items():
+            print(f"  {name:<12} {wall:>8.3f}s {cpu:>8.3f}s {calls:>7} {wall / total:>6.1%}")
+
+
+@contextmanager
+def capture(profiler=None, output_path=None, top=15):
+    """Run the enclosed block under cProfile or tracemalloc.
+
+    Yields a dict that is filled in with a summary when the block ends.
+    With cProfile the hottest functions are printed and, given
+    output_path, the raw stats are dumped there for pstats/snakeviz. With
+    tracemalloc the peak and the largest allocation sites are printed.
+    """
+    summary = {}
+    if profiler is None:
+        yield summary
+        return
+    if profiler not in PROFILERS:
+        raise ValueError(f"Unknown profiler: {profiler}")
+
+    if profiler == 'cprofile':
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            yield summary
+        finally:
+            profile.disable()
+        stats = pstats.Stats(profile)
+        if output_path:
+            stats.dump_stats(output_path)
+            summary['stats_file'] = str(output_path)
+        print(f"\ncProfile, top {top} by cumulative time:")
+        stats.sort_stats('cumulative').print_stats(top)
+        summary['total_calls'] = stats.total_calls
+        summary['total_seconds'] = stats.total_tt
+        return
+
+    tracemalloc.start()
+    try:
+        yield summary
+    finally:
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    summary['current_mb'] = current / (1024 * 1024)
+    summary['peak_mb'] = peak / (1024 * 1024)
+    summary['top'] = []
+    print(f"\ntracemalloc: peak {summary['peak_mb']:.1f} MB, "
+          f"still allocated {summary['current_mb']:.1f} MB; largest sites:")
+    for stat in snapshot.statistics('lineno')[:top]:
+        print(f"  {stat.size / 1024:>9.1f} KB {stat.count:>7} blocks  {stat.traceback[0]}")
+        summary['top'].append({'site': str(stat.traceback[0]), 'bytes': stat.size,
+                               'blocks': stat.count})
+
+
+def write_metrics(path, metrics):
+    """Write a metrics dict as indented JSON."""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(metrics, f, indent=2)
+        f.write('\n')
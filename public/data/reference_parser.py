@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+Parse free-form Bible references into OSIS ranges.
+
+Setlists and sermon notes write references every which way: "1 Cor
+13:4-7", "Ps 23", "Jn3:16", "II Kings 2", "John 3:16, 18; 4:1-5". The
+alias table written by generate_book_names.py (book_aliases.json) is
+compiled into a character trie, and each string is read in one
+left-to-right scan: at every word start the trie finds the longest book
+alias, digits become chapter and verse numbers, and punctuation becomes
+separators. The resulting tokens are turned into OSIS references
+(1Cor.13.4-1Cor.13.7) that VerseIndex.resolve() maps to ordinal ranges.
+"""
+
+import argparse
+import json
+import sys
+import time
+from collections import namedtuple
+from pathlib import Path
+
+import verse_ordinals
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+DEFAULT_ALIASES = SCRIPT_DIR / 'book_aliases.json'
+
+# Trie key marking the end of an alias; never a normalized character
+_END = ''
+
+# Aliases that are also ordinary English words only count when capitalized,
+# so prose like "he is 3 years old" is not read as Heb/Isa
+CAPITALIZED_ALIASES = frozenset({
+    'acts', 'act', 'am', 'cant', 'ex', 'he', 'hebrew', 'ho', 'is', 'job', 'jo',
+    'mark', 'na', 'numb', 'numbers', 'pro', 're', 'roman', 'song', 'songs',
+})
+
+# Token kinds
+_BOOK, _NUMBER, _COLON, _DASH, _COMMA, _SEMI, _WORD, _PART = range(8)
+
+_PUNCTUATION = {
+    ':': _COLON, '.': _COLON,
+    '-': _DASH, '‐': _DASH, '‑': _DASH, '‒': _DASH,
+    '–': _DASH, '—': _DASH,
+    ',': _COMMA, '&': _COMMA,
+    ';': _SEMI, '\n': _SEMI, '|': _SEMI,
+}
+# Words that act as separators between references
+_WORD_SEPARATORS = {'and': _COMMA, 'to': _DASH, 'through': _DASH}
+
+
+class Reference(namedtuple('Reference', 'osis start end')):
+    """An OSIS reference and the [start, end) span of text it came from."""
+
+    __slots__ = ()
+
+
+def load_aliases(aliases_path=DEFAULT_ALIASES):
+    """Load book_aliases.json."""
+    with open(aliases_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def compile_alias_trie(aliases):
+    """Compile {normalized alias: book ID} into a nested-dict character trie.
+
+    Each alias ends in a node holding (book_id, needs_capital).
+    """
+    trie = {}
+    for alias, book_id in aliases.items():
+        node = trie
+        for ch in alias:
+            node = node.setdefault(ch, {})
+        node[_END] = (book_id, alias in CAPITALIZED_ALIASES)
+    return trie
+
+
+class ReferenceParser:
+    """Free-form reference parser over a compiled alias trie."""
+
+    def __init__(self, aliases, index):
+        self.trie = compile_alias_trie(aliases)
+        self.index = index
+        # Books with a single chapter take a bare number as the verse (Jude 5)
+        self.single_chapter = {
+            book_id for book, book_id in enumerate(index.book_ids)
+            if index.book_first_chapter[book + 1] - index.book_first_chapter[book] == 1}
+
+    @classmethod
+    def load(cls, aliases_path=DEFAULT_ALIASES,
+             structure_path=verse_ordinals.DEFAULT_STRUCTURE):
+        """Build a parser from book_aliases.json and kjv_structure.json."""
+        return cls(load_aliases(aliases_path),
+                   verse_ordinals.VerseIndex(verse_ordinals.load_structure(structure_path)))
+
+    def _match_book(self, text, i):
+        """Return (book_id, end) of the longest alias starting at i, or None.
+
+        Matching is case-insensitive, skips periods and treats any run of
+        whitespace as one space. An alias must end at a word boundary, so
+        "Is" does not match the start of "Isaac".
+        """
+        lower = text[i].islower()
+        node = self.trie
+        n = len(text)
+        best = None
+        j = i
+        while j < n:
+            ch = text[j]
+            if ch == '.':
+                j += 1
+                continue
+            if ch.isspace():
+                node = node.get(' ')
+                if node is None:
+                    break
+                j += 1
+                while j < n and text[j].isspace():
+                    j += 1
+                continue
+            node = node.get(ch.lower())
+            if node is None:
+                break
+            j += 1
+            if _END in node and (j == n or not text[j].isalpha()):
+                book_id, needs_capital = node[_END]
+                if not (needs_capital and lower):
+                    best = (book_id, j)
+        return best
+
+    def tokenize(self, text):
+        """Split text into (kind, value, start, end) tokens in one scan."""
+        tokens = []
+        n = len(text)
+        i = 0
+        while i < n:
+            ch = text[i]
+            if ch.isalnum():
+                # The end of a part-to-part range (Gen 1:9a-b)
+                if ('a' <= ch <= 'z' and (i + 1 == n or not text[i + 1].isalnum())
+                        and len(tokens) >= 2 and tokens[-1][0] == _DASH
+                        and tokens[-2][0] == _NUMBER and tokens[-2][1][1]):
+                    tokens.append((_PART, ch, i, i + 1))
+                    i += 1
+                    continue
+                if i == 0 or not text[i - 1].isalnum():
+                    match = self._match_book(text, i)
+                    if match is not None:
+                        tokens.append((_BOOK, match[0], i, match[1]))
+                        i = match[1]
+                        continue
+                j = i
+                if '0' <= ch <= '9':
+                    while j < n and '0' <= text[j] <= '9':
+                        j += 1
+                    number = int(text[i:j])
+                    part = ''
+                    # A split-part suffix (Gen 1:9a), but not the start of a word
+                    if (j < n and 'a' <= text[j] <= 'z'
+                            and (j + 1 == n or not text[j + 1].isalpha())):
+                        part = text[j]
+                        j += 1
+                    tokens.append((_NUMBER, (number, part), i, j))
+                else:
+                    while j < n and text[j].isalnum():
+                        j += 1
+                    word = text[i:j].lower()
+                    tokens.append((_WORD_SEPARATORS.get(word, _WORD), word, i, j))
+                i = j
+                continue
+            kind = _PUNCTUATION.get(ch)
+            if kind is not None:
+                tokens.append((kind, ch, i, i + 1))
+            i += 1
+        return tokens
+
+    def _point(self, tokens, j, book_id, chapter, verse_mode):
+        """Read chapter[:verse] at token j; return ((chapter, verse, part), next j).
+
+        A bare number is a verse in single-chapter books and after a comma
+        that follows a verse (John 3:16, 18); otherwise it is a chapter.
+        """
+        number, part = tokens[j][1]
+        if (j + 2 < len(tokens) and tokens[j + 1][0] == _COLON
+                and tokens[j + 2][0] == _NUMBER):
+            verse, part = tokens[j + 2][1]
+            return (number, verse, part), j + 3
+        if book_id in self.single_chapter:
+            return (1, number, part), j + 1
+        if verse_mode and chapter is not None:
+            return (chapter, number, part), j + 1
+        return (number, None, ''), j + 1
+
+    def references(self, text):
+        """Parse text into a list of References, in the order they appear."""
+        tokens = self.tokenize(text)
+        count = len(tokens)
+        refs = []
+        book_id = None
+        book_start = None
+        chapter = None
+        verse_mode = False
+        j = 0
+        while j < count:
+            kind, value, start, end = tokens[j]
+
+            if kind == _BOOK:
+                book_id, book_start, chapter, verse_mode = value, start, None, False
+                j += 1
+                if j < count and tokens[j][0] == _COLON:     # Ps. 23, John.3.16
+                    j += 1
+                if j == count or tokens[j][0] in (_COMMA, _SEMI):
+                    refs.append(Reference(book_id, start, end))
+                continue
+
+            if kind != _NUMBER or book_id is None:
+                if kind == _SEMI:
+                    verse_mode = False
+                elif kind == _WORD:
+                    book_id = None
+                j += 1
+                continue
+
+            first, j = self._point(tokens, j, book_id, chapter, verse_mode)
+            end_book, last = book_id, None
+            if j + 1 < count and tokens[j][0] == _DASH:
+                k = j + 1
+                if (tokens[k][0] == _BOOK and k + 1 < count
+                        and tokens[k + 1][0] == _NUMBER):          # Gen 50 - Exod 2
+                    end_book = tokens[k][1]
+                    last, j = self._point(tokens, k + 1, end_book, None, False)
+                elif tokens[k][0] == _NUMBER:
+                    if (k + 2 < count and tokens[k + 1][0] == _COLON
+                            and tokens[k + 2][0] == _NUMBER):      # Gen 1:26-2:3
+                        last = (tokens[k][1][0],) + tokens[k + 2][1]
+                        j = k + 3
+                    elif first[1] is not None:                      # Gen 1:26-28
+                        last = (first[0],) + tokens[k][1]
+                        j = k + 1
+                    else:                                           # Gen 1-3
+                        last = (tokens[k][1][0], None, '')
+                        j = k + 1
+                elif tokens[k][0] == _PART and first[2]:            # Gen 1:9a-b
+                    last = first[:2] + (tokens[k][1],)
+                    j = k + 1
+
+            osis = _format_point(book_id, first)
+            if last is not None:
+                osis += '-' + _format_point(end_book, last)
+            ref_start = book_start if book_start is not None else start
+            refs.append(Reference(osis, ref_start, tokens[j - 1][3]))
+
+            book_id = end_book
+            chapter, verse, _ = last or first
+            verse_mode = verse is not None
+            book_start = None
+        return refs
+
+    def parse(self, text):
+        """Parse text and return the OSIS reference strings."""
+        return [ref.osis for ref in self.references(text)]
+
+    def parse_ranges(self, text):
+        """Parse text into (osis, VerseRange) pairs; the range is None if invalid."""
+        osis_refs = self.parse(text)
+        return list(zip(osis_refs, self.index.resolve_many(osis_refs)))
+
+    def parse_batch(self, texts):
+        """Parse many strings, reusing the result for repeated ones.
+
+        Setlists repeat the same references week after week, so each
+        distinct string is scanned once. Returns a list parallel to texts.
+        """
+        parsed = {}
+        results = []
+        for text in texts:
+            refs = parsed.get(text)
+            if refs is None:
+                refs = parsed[text] = self.parse(text)
+            results.append(refs)
+        return results
+
+
+def _format_point(book_id, point):
+    chapter, verse, part = point
+    if verse is None:
+        return f"{book_id}.{chapter}"
+    return f"{book_id}.{chapter}.{verse}{part}"
+
+
+def main():
+    """Main function."""
+    parser = argparse.ArgumentParser(
+        description="Convert free-form Bible references to OSIS ranges.")
+    parser.add_argument('text', nargs='*',
+                        help="reference strings (default: one per line from stdin)")
+    parser.add_argument('--aliases', default=DEFAULT_ALIASES, type=Path,
+                        help="book_aliases.json")
+    parser.add_argument('--structure', default=verse_ordinals.DEFAULT_STRUCTURE, type=Path,
+                        help="kjv_structure.json")
+    args = parser.parse_args()
+
+    reference_parser = ReferenceParser.load(args.aliases, args.structure)
+    lines = args.text or [line.rstrip('\n') for line in sys.stdin]
+
+    start_time = time.perf_counter()
+    results = [reference_parser.parse_ranges(line) for line in lines]
+    elapsed = time.perf_counter() - start_time
+
+    found = 0
+    for line, pairs in zip(lines, results):
+        print(line)
+        for osis, verse_range in pairs:
+            if verse_range is None:
+                print(f"  {osis}: not found")
+                continue
+            found += 1
+            print(f"  {osis}: ordinals {verse_range.first}-{verse_range.last} "
+                  f"({verse_range.verse_count} verses)")
+    print(f"\nParsed {found} references from {len(lines)} lines in {elapsed * 1e3:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
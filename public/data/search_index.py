@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Build and query a sharded full-text search index over the verse text.
+
+Terms are normalized (casefolded runs of word characters, apostrophes kept
+inside words) and stored with positional postings keyed by verse ordinal
+(see verse_ordinals.py). Postings are split into shards by term prefix so
+the browser only fetches the shards a query touches.
+
+Layout of the output directory:
+  index.json    format version, prefix length and per-shard term/byte counts
+  <prefix>.json {term: postings} for every term starting with <prefix>
+
+Each term's postings are one flat integer array of repeated
+[ordinal delta, position count, position deltas...] groups.
+"""
+
+import argparse
+import json
+import re
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import extract_verses_to_json as extractor
+import verse_ordinals
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+DEFAULT_INDEX_DIR = SCRIPT_DIR / 'search_index'
+DEFAULT_JSON_DIR = SCRIPT_DIR / 'output_chapters_json'
+
+INDEX_FORMAT = 1
+INDEX_FILENAME = 'index.json'
+DEFAULT_PREFIX_LENGTH = 2
+
+TOKEN_RE = re.compile(r"\w+(?:'\w+)*")
+_PHRASE_RE = re.compile(r'"([^"]*)"')
+
+
+def normalize_terms(text):
+    """Split text into normalized search terms, in order."""
+    return [token.casefold() for token in TOKEN_RE.findall(text)]
+
+
+def encode_postings(postings):
+    """Encode [(ordinal, positions), ...] sorted by ordinal as a flat int array."""
+    flat = []
+    previous_ordinal = 0
+    for ordinal, positions in postings:
+        flat.append(ordinal - previous_ordinal)
+        flat.append(len(positions))
+        previous_position = 0
+        for position in positions:
+            flat.append(position - previous_position)
+            previous_position = position
+        previous_ordinal = ordinal
+    return flat
+
+
+def decode_postings(flat):
+    """Decode a flat postings array into {ordinal: [positions]}."""
+    postings = {}
+    ordinal = 0
+    i = 0
+    while i < len(flat):
+        ordinal += flat[i]
+        count = flat[i + 1]
+        i += 2
+        positions = []
+        position = 0
+        for delta in flat[i:i + count]:
+            position += delta
+            positions.append(position)
+        postings[ordinal] = positions
+        i += count
+    return postings
+
+
+def shard_key(term, prefix_length=DEFAULT_PREFIX_LENGTH):
+    """Return the shard a term is stored in."""
+    return term[:prefix_length]
+
+
+def build_search_index(verse_texts, output_dir, prefix_length=DEFAULT_PREFIX_LENGTH):
+    """Write a sharded index for verse_texts, an iterable of (ordinal, text).
+
+    Returns a summary dict with term, shard and byte counts.
+    """
+    output_path = Path(output_dir)
+    output_path.mkdir(parents=True, exist_ok=True)
+
+    term_postings = defaultdict(list)
+    verse_count = 0
+    for ordinal, text in sorted(verse_texts):
+        positions_by_term = defaultdict(list)
+        for position, term in enumerate(normalize_terms(text)):
+            positions_by_term[term].append(position)
+        for term, positions in positions_by_term.items():
+            term_postings[term].append((ordinal, positions))
+        verse_count += 1
+
+    shards = defaultdict(dict)
+    for term in sorted(term_postings):
+        shards[shard_key(term, prefix_length)][term] = encode_postings(term_postings[term])
+
+    shard_info = {}
+    for key, terms in shards.items():
+        data = json.dumps(terms, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        extractor.write_atomic(output_path / f"{key}.json", data)
+        shard_info[key] = {'terms': len(terms), 'bytes': len(data)}
+
+    # Drop shards left over from a previous build with different terms
+    for stale in output_path.glob('*.json'):
+        if stale.name != INDEX_FILENAME and stale.stem not in shard_info:
+            stale.unlink()
+
+    index = {
+        'format': INDEX_FORMAT,
+        'prefix_length': prefix_length,
+        'verse_count': verse_count,
+        'term_count': len(term_postings),
+        'shards': dict(sorted(shard_info.items())),
+    }
+    extractor.write_atomic(output_path / INDEX_FILENAME,
+                           json.dumps(index, indent=2).encode('utf-8'))
+
+    return {
+        'verse_count': verse_count,
+        'term_count': len(term_postings),
+        'shard_count': len(shard_info),
+        'bytes': sum(info['bytes'] for info in shard_info.values()),
+    }
+
+
+def load_verse_texts(json_dir, structure):
+    """Yield (ordinal, text) for every verse in the chapter JSON tree."""
+    ordinals = verse_ordinals.build_ordinal_lookup(structure)
+    for testament in structure.values():
+        for book_id, book_info in testament['books'].items():
+            for chapter_num in sorted(book_info['chapters'], key=int):
+                json_path = Path(json_dir) / book_id / f"{book_id}_{chapter_num}.json"
+                if not json_path.exists():
+                    continue
+                with open(json_path, 'r', encoding='utf-8') as f:
+                    verses = json.load(f)
+                for osis_id, text in verse_ordinals.join_split_verses(verses.items()):
+                    yield ordinals[osis_id], text
+
+
+class SearchIndex:
+    """Query API over a sharded index; shards are loaded on first use."""
+
+    def __init__(self, index_dir=DEFAULT_INDEX_DIR):
+        self.index_dir = Path(index_dir)
+        with open(self.index_dir / INDEX_FILENAME, 'r', encoding='utf-8') as f:
+            self.info = json.load(f)
+        if self.info.get('format') != INDEX_FORMAT:
+            raise ValueError(f"Unsupported search index format: {self.info.get('format')}")
+        self.prefix_length = self.info['prefix_length']
+        self._shards = {}
+        self._postings = {}
+
+    def _shard(self, key):
+        if key not in self._shards:
+            if key in self.info['shards']:
+                with open(self.index_dir / f"{key}.json", 'r', encoding='utf-8') as f:
+                    self._shards[key] = json.load(f)
+            else:
+                self._shards[key] = {}
+        return self._shards[key]
+
+    def postings(self, term):
+        """Return {ordinal: [positions]} for one already-normalized term."""
+        if term not in self._postings:
+            flat = self._shard(shard_key(term, self.prefix_length)).get(term)
+            self._postings[term] = decode_postings(flat) if flat else {}
+        return self._postings[term]
+
+    def search_all(self, terms):
+        """Return sorted ordinals of verses containing every term."""
+        postings = sorted((self.postings(term) for term in set(terms)), key=len)
+        if not postings:
+            return []
+        result = set(postings[0])
+        for other in postings[1:]:
+            result.intersection_update(other)
+            if not result:
+                break
+        return sorted(result)
+
+    def search_phrase(self, phrase):
+        """Return sorted ordinals of verses containing the terms consecutively."""
+        terms = normalize_terms(phrase)
+        if len(terms) <= 1:
+            return self.search_all(terms)
+
+        matches = []
+        for ordinal in self.search_all(terms):
+            following = [set(self.postings(term)[ordinal]) for term in terms[1:]]
+            if any(all(start + offset in positions
+                       for offset, positions in enumerate(following, 1))
+                   for start in self.postings(terms[0])[ordinal]):
+                matches.append(ordinal)
+        return matches
+
+    def search(self, query):
+        """AND together the bare words and "quoted phrases" of a query."""
+        phrases = _PHRASE_RE.findall(query)
+        words = normalize_terms(_PHRASE_RE.sub(' ', query))
+
+        result = set(self.search_all(words)) if words else None
+        for phrase in phrases:
+            matches = set(self.search_phrase(phrase))
+            result = matches if result is None else result & matches
+        return sorted(result) if result else []
+
+
+def main():
+    """Main function."""
+    parser = argparse.ArgumentParser(description="Build or query the verse search index.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build', help="build the index from chapter JSON")
+    build_parser.add_argument('--input', default=DEFAULT_JSON_DIR, type=Path,
+                              help="chapter JSON directory")
+    build_parser.add_argument('--output', default=DEFAULT_INDEX_DIR, type=Path,
+                              help="index directory to write")
+    build_parser.add_argument('--structure', default=verse_ordinals.DEFAULT_STRUCTURE,
+                              type=Path, help="kjv_structure.json")
+    build_parser.add_argument('--prefix-length', type=int, default=DEFAULT_PREFIX_LENGTH,
+                              help="term prefix length used to pick shards")
+
+    query_parser = subparsers.add_parser('query', help="search the index")
+    query_parser.add_argument('query', help='words to AND together; "quote" phrases')
+    query_parser.add_argument('--index', default=DEFAULT_INDEX_DIR, type=Path,
+                              help="index directory to read")
+    query_parser.add_argument('--structure', default=verse_ordinals.DEFAULT_STRUCTURE,
+                              type=Path, help="kjv_structure.json")
+    args = parser.parse_args()
+
+    structure = verse_ordinals.load_structure(args.structure)
+
+    if args.command == 'build':
+        start_time = time.perf_counter()
+        summary = build_search_index(load_verse_texts(args.input, structure),
+                                     args.output, args.prefix_length)
+        elapsed = time.perf_counter() - start_time
+        print(f"Indexed {summary['verse_count']} verses, {summary['term_count']} terms")
+        print(f"Shards: {summary['shard_count']} ({summary['bytes'] / 1024:.0f} KB)")
+        print(f"Elapsed: {elapsed:.2f}s")
+    else:
+        verse_ids = list(verse_ordinals.iter_verse_ids(structure))
+        ordinals = SearchIndex(args.index).search(args.query)
+        for ordinal in ordinals:
+            print(verse_ids[ordinal])
+        print(f"\n{len(ordinals)} verses")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,463 @@
+#!/usr/bin/env python3
+"""
+Precomputed "similar verses": the top-k most similar verses of every verse.
+
+Each verse (the whole-verse text, split parts joined) is reduced to its
+set of word shingles: runs of SHINGLE_SIZE consecutive search terms, or
+the lone term of a one-word verse. Similarity is the Jaccard index of
+two shingle sets, estimated with MinHash and found with LSH banding, all
+as NumPy array operations:
+
+  minhash   NUM_PERM hash functions (a * id + b) mod (2^31 - 1) over the
+            shingle IDs, minimum per verse with np.minimum.reduceat;
+            verse chunks are spread over worker processes
+  lsh       the signature is cut into BANDS bands; verses that agree on
+            a whole band share a bucket and become candidate pairs
+  rank      candidates are scored by the fraction of agreeing signature
+            rows; each verse keeps its best k at or above min_similarity
+
+The result is a fixed-width table, so a verse's neighbours are one slice:
+
+  header      magic, format, k, verse count   (<4sHHI)
+  neighbors   uint32 ordinal x k per verse, 0xFFFFFFFF where there are
+              fewer than k
+  scores      uint8 x k per verse: estimated Jaccard x 255
+
+All integers are little-endian. SimilarVerses reads the table without
+NumPy. `check` compares the table with exact (brute-force) Jaccard on a
+sample of verses and reports the recall.
+"""
+
+import argparse
+import os
+import random
+import struct
+import sys
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+try:
+    import numpy as np
+except ImportError:  # Needed to build or check the table, not to read it
+    np = None
+
+import extract_verses_to_json as extractor
+import search_index
+import verse_ordinals
+from pipeline_metrics import StageTimer
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+DEFAULT_TABLE = SCRIPT_DIR / 'similar_verses.bin'
+DEFAULT_XML_DIR = SCRIPT_DIR / 'output_chapters'
+
+MAGIC = b'OBSV'
+TABLE_FORMAT = 1
+_HEADER = struct.Struct('<4sHHI')
+NO_NEIGHBOR = 0xFFFFFFFF
+
+SHINGLE_SIZE = 2
+NUM_PERM = 240
+BANDS = 80
+TOP_K = 10
+MIN_SIMILARITY = 0.3
+# Buckets holding more verses than this add no pairs (quadratic blow-up)
+MAX_BUCKET = 256
+_PRIME = (1 << 31) - 1
+# Verses per worker task when computing signatures
+_CHUNK_VERSES = 2048
+# Hash functions evaluated per NumPy pass (bounds the temporary arrays)
+_PERM_BLOCK = 32
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("similar_verses needs NumPy to build or check the table "
+                          "(pip install numpy)")
+
+
+def collect_verse_texts(xml_dir, structure):
+    """Yield (ordinal, whole-verse text) for every chapter in xml_dir.
+
+    The text is the extractor's: extract_verses_from_xml() per chapter,
+    split parts joined again.
+    """
+    ordinals = verse_ordinals.build_ordinal_lookup(structure)
+    for testament in structure.values():
+        for book_id, book_info in testament['books'].items():
+            for chapter_num in sorted(book_info['chapters'], key=int):
+                xml_path = Path(xml_dir) / book_id / f"{book_id}_{chapter_num}.xml"
+                if not xml_path.exists():
+                    continue
+                verses = extractor.extract_verses_from_xml(xml_path)
+                for osis_id, text in verse_ordinals.join_split_verses(verses.items()):
+                    yield ordinals[osis_id], text
+
+
+def verse_shingles(text, size=SHINGLE_SIZE):
+    """Return the distinct word shingles of a verse's text, in text order."""
+    terms = search_index.normalize_terms(text)
+    if len(terms) < size:
+        return [' '.join(terms)] if terms else []
+    # Text order, not set order: shingle IDs (and so the table) must not
+    # depend on string hash randomization
+    return list(dict.fromkeys(' '.join(terms[i:i + size])
+                              for i in range(len(terms) - size + 1)))
+
+
+def shingle_matrix(verse_texts, verse_count, size=SHINGLE_SIZE):
+    """Number the shingles of every verse; returns CSR (indptr, ids) arrays.
+
+    Verse o's shingle IDs are ids[indptr[o]:indptr[o + 1]], sorted;
+    verses missing from verse_texts have none.
+    """
+    _require_numpy()
+    vocabulary = {}
+    rows = [()] * verse_count
+    for ordinal, text in verse_texts:
+        rows[ordinal] = sorted(vocabulary.setdefault(shingle, len(vocabulary))
+                               for shingle in verse_shingles(text, size))
+    indptr = np.zeros(verse_count + 1, dtype=np.int64)
+    np.cumsum([len(row) for row in rows], out=indptr[1:])
+    ids = np.fromiter((i for row in rows for i in row), dtype=np.uint32, count=int(indptr[-1]))
+    return indptr, ids
+
+
+def hash_parameters(num_perm=NUM_PERM, seed=1):
+    """Return the (a, b) coefficients of the MinHash functions."""
+    _require_numpy()
+    rng = np.random.default_rng(seed)
+    return (rng.integers(1, _PRIME, num_perm, dtype=np.uint64),
+            rng.integers(0, _PRIME, num_perm, dtype=np.uint64))
+
+
+def _signature_chunk(task):
+    """MinHash signatures for one chunk of verses (runs in a worker)."""
+    indptr, ids, a, b = task
+    counts = np.diff(indptr)
+    signatures = np.full((len(counts), len(a)), _PRIME, dtype=np.uint32)
+    nonempty = np.flatnonzero(counts)
+    if not len(nonempty):
+        return signatures
+    starts = indptr[:-1][nonempty] - indptr[0]
+    values = ids.astype(np.uint64)
+    for first in range(0, len(a), _PERM_BLOCK):
+        block = slice(first, first + _PERM_BLOCK)
+        # a * id + b stays below 2^63: ids, a and b are all under 2^31
+        hashed = (a[block, None] * values[None, :] + b[block, None]) % _PRIME
+        signatures[nonempty, block] = np.minimum.reduceat(hashed, starts, axis=1).T
+    return signatures
+
+
+def minhash_signatures(indptr, ids, num_perm=NUM_PERM, seed=1, jobs=1):
+    """Return the (verses, num_perm) uint32 MinHash signature matrix.
+
+    Verses without shingles get a row of 2^31 - 1, which no shingle
+    produces, so they never share a band with a real verse.
+    """
+    a, b = hash_parameters(num_perm, seed)
+    tasks = []
+    for first in range(0, len(indptr) - 1, _CHUNK_VERSES):
+        chunk = indptr[first:first + _CHUNK_VERSES + 1]
+        tasks.append((chunk, ids[chunk[0]:chunk[-1]], a, b))
+
+    chunks = None
+    if jobs > 1 and len(tasks) > 1:
+        try:
+            executor = ProcessPoolExecutor(max_workers=jobs)
+        except (OSError, NotImplementedError) as e:
+            print(f"Process pool unavailable ({e}), falling back to serial")
+        else:
+            with executor:
+                chunks = list(executor.map(_signature_chunk, tasks))
+    if chunks is None:
+        chunks = [_signature_chunk(task) for task in tasks]
+    if not chunks:
+        return np.zeros((0, num_perm), dtype=np.uint32)
+    return np.concatenate(chunks)
+
+
+def lsh_candidates(signatures, bands=BANDS, max_bucket=MAX_BUCKET):
+    """Return (pairs, skipped): candidate pairs i < j sharing a band bucket.
+
+    pairs is a (n, 2) int64 array without duplicates. skipped counts the
+    buckets left out for holding more than max_bucket verses.
+    """
+    verse_count, num_perm = signatures.shape
+    if num_perm % bands:
+        raise ValueError(f"{num_perm} signature rows do not split into {bands} bands")
+    rows = num_perm // bands
+    valid = np.flatnonzero(signatures[:, 0] != _PRIME)
+    keys = []
+    skipped = 0
+    for band in range(bands):
+        # Fold the band's rows into one 64-bit bucket key (wrapping is fine)
+        band_rows = signatures[valid, band * rows:(band + 1) * rows].astype(np.uint64)
+        bucket = np.zeros(len(valid), dtype=np.uint64)
+        for column in band_rows.T:
+            bucket = bucket * np.uint64(0x100000001B3) + column
+        order = np.argsort(bucket, kind='stable')
+        sorted_buckets = bucket[order]
+        starts = np.flatnonzero(np.r_[True, sorted_buckets[1:] != sorted_buckets[:-1]])
+        sizes = np.diff(np.r_[starts, len(order)])
+        skipped += int(np.count_nonzero(sizes > max_bucket))
+        # Buckets of equal size form a (buckets, size) member matrix
+        for size in np.unique(sizes[(sizes > 1) & (sizes <= max_bucket)]):
+            group_starts = starts[sizes == size]
+            members = valid[order[group_starts[:, None] + np.arange(size)]]
+            left, right = np.triu_indices(size, 1)
+            # The stable sort keeps members in ordinal order, so left < right
+            keys.append((members[:, left] * verse_count + members[:, right]).ravel())
+    if not keys:
+        return np.zeros((0, 2), dtype=np.int64), skipped
+    unique = np.unique(np.concatenate(keys))
+    return np.stack([unique // verse_count, unique % verse_count], axis=1), skipped
+
+
+def score_pairs(signatures, pairs, batch=1 << 16):
+    """Estimated Jaccard of each pair: the share of agreeing signature rows."""
+    scores = np.empty(len(pairs), dtype=np.float32)
+    for first in range(0, len(pairs), batch):
+        chunk = pairs[first:first + batch]
+        scores[first:first + batch] = (signatures[chunk[:, 0]]
+                                       == signatures[chunk[:, 1]]).mean(axis=1)
+    return scores
+
+
+def top_k_table(verse_count, pairs, scores, k=TOP_K, min_similarity=MIN_SIMILARITY):
+    """Return (neighbors, scores) arrays of shape (verse_count, k).
+
+    Neighbours are ordered by score, then ordinal; empty slots hold
+    NO_NEIGHBOR and a score of 0.
+    """
+    keep = scores >= min_similarity
+    pairs, scores = pairs[keep], scores[keep]
+    source = np.concatenate([pairs[:, 0], pairs[:, 1]])
+    target = np.concatenate([pairs[:, 1], pairs[:, 0]])
+    similarity = np.concatenate([scores, scores])
+    order = np.lexsort((target, -similarity, source))
+    source, target, similarity = source[order], target[order], similarity[order]
+    rank = np.arange(len(source)) - np.searchsorted(source, source, side='left')
+    keep = rank < k
+
+    neighbors = np.full((verse_count, k), NO_NEIGHBOR, dtype=np.uint32)
+    table_scores = np.zeros((verse_count, k), dtype=np.uint8)
+    neighbors[source[keep], rank[keep]] = target[keep]
+    table_scores[source[keep], rank[keep]] = np.rint(similarity[keep] * 255)
+    return neighbors, table_scores
+
+
+def write_table(output_path, neighbors, scores):
+    """Write the neighbour table file; returns its size in bytes."""
+    verse_count, k = neighbors.shape
+    data = b''.join([
+        _HEADER.pack(MAGIC, TABLE_FORMAT, k, verse_count),
+        neighbors.astype('<u4').tobytes(),
+        scores.astype(np.uint8).tobytes(),
+    ])
+    Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+    extractor.write_atomic(output_path, data)
+    return len(data)
+
+
+def build_similar_verses(verse_texts, verse_count, output_path=DEFAULT_TABLE, k=TOP_K,
+                         min_similarity=MIN_SIMILARITY, num_perm=NUM_PERM, bands=BANDS,
+                         jobs=1, timer=None):
+    """Shingle, sign, bucket and rank every verse, then write the table.
+
+    verse_texts is an iterable of (ordinal, text). Returns a summary dict;
+    the CSR shingle matrix is included for check_recall().
+    """
+    _require_numpy()
+    timer = timer or StageTimer()
+    with timer.stage('shingle'):
+        indptr, ids = shingle_matrix(verse_texts, verse_count)
+    with timer.stage('minhash'):
+        signatures = minhash_signatures(indptr, ids, num_perm, jobs=jobs)
+    with timer.stage('lsh'):
+        pairs, skipped = lsh_candidates(signatures, bands)
+    with timer.stage('rank'):
+        neighbors, scores = top_k_table(verse_count, pairs, score_pairs(signatures, pairs),
+                                        k, min_similarity)
+    with timer.stage('write'):
+        size = write_table(output_path, neighbors, scores)
+    return {
+        'verse_count': verse_count,
+        'shingles': int(ids.max()) + 1 if len(ids) else 0,
+        'candidate_pairs': len(pairs),
+        'skipped_buckets': skipped,
+        'verses_with_neighbors': int(np.count_nonzero(neighbors[:, 0] != NO_NEIGHBOR)),
+        'bytes': size,
+        'timings': timer.as_dict(),
+        'matrix': (indptr, ids),
+    }
+
+
+def check_recall(indptr, ids, table, sample=200, k=TOP_K,
+                 min_similarity=MIN_SIMILARITY, seed=0):
+    """Compare a table with brute-force Jaccard on a random sample of verses.
+
+    For each sampled verse the exact Jaccard with every other verse is
+    computed from an inverted index of the shingle matrix. The true
+    neighbours are the best k at or above min_similarity; a table
+    neighbour counts as found when its exact Jaccard reaches the k-th
+    true neighbour's (so ties at the cut-off do not count against it).
+    Returns a summary dict with the recall and timings.
+    """
+    _require_numpy()
+    verse_count = len(indptr) - 1
+    sizes = np.diff(indptr)
+    owner = np.repeat(np.arange(verse_count), sizes)
+    order = np.argsort(ids, kind='stable')
+    posting_verses = owner[order]
+    posting_starts = np.searchsorted(ids[order], np.arange(int(ids.max()) + 2))
+
+    candidates = [o for o in range(verse_count) if sizes[o]]
+    sampled = random.Random(seed).sample(candidates, min(sample, len(candidates)))
+    expected = found = 0
+    brute_seconds = lookup_seconds = 0.0
+    for ordinal in sampled:
+        start = time.perf_counter()
+        shingles = ids[indptr[ordinal]:indptr[ordinal + 1]]
+        hits = np.concatenate([posting_verses[posting_starts[s]:posting_starts[s + 1]]
+                               for s in shingles])
+        intersection = np.bincount(hits, minlength=verse_count)
+        jaccard = intersection / (len(shingles) + sizes - intersection)
+        jaccard[ordinal] = 0
+        best = np.argsort(-jaccard, kind='stable')[:k]
+        best = best[jaccard[best] >= min_similarity]
+        brute_seconds += time.perf_counter() - start
+
+        start = time.perf_counter()
+        neighbors = table.neighbors(ordinal)
+        lookup_seconds += time.perf_counter() - start
+        if not len(best):
+            continue
+        cutoff = jaccard[best[-1]]
+        expected += len(best)
+        found += min(len(best), sum(1 for other, _ in neighbors if jaccard[other] >= cutoff))
+
+    return {
+        'sampled': len(sampled),
+        'expected': expected,
+        'found': found,
+        'recall': found / expected if expected else 1.0,
+        'brute_force_ms': brute_seconds / len(sampled) * 1e3 if sampled else 0.0,
+        'lookup_us': lookup_seconds / len(sampled) * 1e6 if sampled else 0.0,
+    }
+
+
+class SimilarVerses:
+    """Reader for the neighbour table (no NumPy needed)."""
+
+    def __init__(self, path=DEFAULT_TABLE):
+        data = Path(path).read_bytes()
+        magic, fmt, k, verse_count = _HEADER.unpack_from(data)
+        if magic != MAGIC or fmt != TABLE_FORMAT:
+            raise ValueError(f"Not a format {TABLE_FORMAT} similar verse table: {path}")
+        if len(data) != _HEADER.size + 5 * k * verse_count:
+            raise ValueError(f"Similar verse table is truncated: {path}")
+        self.k = k
+        self.verse_count = verse_count
+        end = _HEADER.size + 4 * k * verse_count
+        self._neighbors = array('I')
+        self._neighbors.frombytes(data[_HEADER.size:end])
+        if sys.byteorder == 'big':
+            self._neighbors.byteswap()
+        self._scores = data[end:]
+
+    def neighbors(self, ordinal):
+        """Return [(ordinal, estimated Jaccard), ...] for a verse, best first."""
+        if not 0 <= ordinal < self.verse_count:
+            raise IndexError(f"Verse ordinal out of range: {ordinal}")
+        first = ordinal * self.k
+        return [(other, score / 255) for other, score
+                in zip(self._neighbors[first:first + self.k], self._scores[first:first + self.k])
+                if other != NO_NEIGHBOR]
+
+
+def print_summary(summary):
+    """Print the counts and stage timings of build_similar_verses()."""
+    print(f"Similar verses: {summary['verses_with_neighbors']}/{summary['verse_count']} "
+          f"verses have neighbours, {summary['shingles']} shingles, "
+          f"{summary['candidate_pairs']} candidate pairs "
+          f"({summary['skipped_buckets']} oversized buckets skipped), "
+          f"{summary['bytes'] / 1024:.0f} KB")
+    total = sum(stage['wall'] for stage in summary['timings'].values())
+    for name, stage in summary['timings'].items():
+        print(f"  {name:<8} {stage['wall']:>8.2f}s")
+    print(f"  {'total':<8} {total:>8.2f}s")
+
+
+def print_recall(recall, min_similarity=MIN_SIMILARITY):
+    """Print the result of check_recall()."""
+    print(f"Recall: {recall['recall']:.1%} of {recall['expected']} true neighbours "
+          f"(Jaccard >= {min_similarity}) over {recall['sampled']} sampled verses")
+    print(f"Brute force: {recall['brute_force_ms']:.2f} ms per verse, "
+          f"table lookup: {recall['lookup_us']:.1f} us")
+
+
+def main():
+    """Main function."""
+    parser = argparse.ArgumentParser(description="Build or query the similar verse table.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build', help="build the table from chapter XML")
+    build_parser.add_argument('--input', default=DEFAULT_XML_DIR, type=Path,
+                              help="directory of per-book chapter XML")
+    build_parser.add_argument('--top-k', '-k', type=int, default=TOP_K,
+                              help="neighbours kept per verse")
+    build_parser.add_argument('--min-similarity', type=float, default=MIN_SIMILARITY,
+                              help="lowest estimated Jaccard kept")
+    build_parser.add_argument('--num-perm', type=int, default=NUM_PERM,
+                              help="MinHash signature length")
+    build_parser.add_argument('--bands', type=int, default=BANDS,
+                              help="LSH bands (must divide --num-perm)")
+    build_parser.add_argument('--jobs', '-j', type=int, default=os.cpu_count() or 1,
+                              help="worker processes for the signatures")
+    build_parser.add_argument('--check', type=int, default=0, metavar='N',
+                              help="check recall against brute-force Jaccard on N verses")
+
+    show_parser = subparsers.add_parser('show', help="print the verses similar to a reference")
+    show_parser.add_argument('ref', help="OSIS reference, e.g. John.3.16 or Ps.136.1-Ps.136.3")
+    show_parser.add_argument('--json-dir', default=search_index.DEFAULT_JSON_DIR, type=Path,
+                             help="chapter JSON directory, to print verse text")
+
+    for subparser in (build_parser, show_parser):
+        subparser.add_argument('--table', default=DEFAULT_TABLE, type=Path,
+                               help="similar verse table")
+        subparser.add_argument('--structure', default=verse_ordinals.DEFAULT_STRUCTURE,
+                               type=Path, help="kjv_structure.json")
+    args = parser.parse_args()
+    structure = verse_ordinals.load_structure(args.structure)
+    index = verse_ordinals.VerseIndex(structure)
+
+    if args.command == 'build':
+        if args.num_perm % args.bands:
+            parser.error(f"--bands {args.bands} does not divide --num-perm {args.num_perm}")
+        summary = build_similar_verses(
+            collect_verse_texts(args.input, structure), index.verse_count, args.table,
+            args.top_k, args.min_similarity, args.num_perm, args.bands, args.jobs)
+        print_summary(summary)
+        if args.check:
+            print_recall(check_recall(*summary['matrix'], SimilarVerses(args.table), args.check,
+                                      args.top_k, args.min_similarity),
+                         args.min_similarity)
+        return
+
+    try:
+        verse_range = index.resolve(args.ref)
+    except (KeyError, ValueError):
+        parser.error(f"unknown reference: {args.ref}")
+    table = SimilarVerses(args.table)
+    texts = dict(search_index.load_verse_texts(args.json_dir, structure)) \
+        if args.json_dir.is_dir() else {}
+    for ordinal in range(verse_range.first, verse_range.last + 1):
+        print(f"{index.verse_id(ordinal)}  {texts.get(ordinal, '')}")
+        for other, score in table.neighbors(ordinal):
+            print(f"  {score:.2f}  {index.verse_id(other):<14} {texts.get(other, '')}")
+
+
+if __name__ == "__main__":
+    main()
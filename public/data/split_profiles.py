@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Render chapter JSON for several overlay layouts from one text cache.
+
+Each OBS layout wants verses split at a different length: short parts for
+lower thirds and mobile, long ones for a full-screen overlay. Rather than
+re-parse every chapter XML per layout, the plain unsplit verse text is
+extracted once into a packed corpus (see packed_corpus.py) and each named
+split profile is rendered from it into its own output tree:
+
+  output_profiles/<profile>/<book>/<book>_<chapter>.json
+
+The files have the same layout as output_chapters_json/.
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+
+import extract_verses_to_json as extractor
+import packed_corpus
+import verse_ordinals
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+DEFAULT_XML_DIR = SCRIPT_DIR / 'output_chapters'
+DEFAULT_PROFILES_DIR = SCRIPT_DIR / 'output_profiles'
+
+PROFILES = {
+    'default': {
+        'description': "same splits as output_chapters_json",
+        'max_length': extractor.MAX_VERSE_LENGTH,
+    },
+    'lower-thirds': {
+        'description': "two-line lower third banner",
+        'max_length': 120,
+    },
+    'full-screen': {
+        'description': "full-screen scripture slide",
+        'max_length': 400,
+    },
+    'mobile': {
+        'description': "narrow portrait screens",
+        'max_length': 80,
+        'boundaries': ('clause', 'comma', 'word'),
+    },
+}
+
+
+def load_profiles(profiles_path=None):
+    """Return the built-in profiles, updated from a JSON file if given.
+
+    The file maps profile names to {"max_length": N, "boundaries": [...]}.
+    """
+    profiles = {name: dict(settings) for name, settings in PROFILES.items()}
+    if profiles_path:
+        with open(profiles_path, 'r', encoding='utf-8') as f:
+            for name, settings in json.load(f).items():
+                profiles.setdefault(name, {}).update(settings)
+
+    for name, settings in profiles.items():
+        if not isinstance(settings.get('max_length'), int) or settings['max_length'] < 1:
+            raise ValueError(f"Profile {name!r} needs a positive integer max_length")
+        boundaries = tuple(settings.get('boundaries', extractor.SPLIT_BOUNDARIES))
+        unknown = [b for b in boundaries if b not in extractor.BOUNDARY_CLASSES]
+        if unknown:
+            raise ValueError(f"Profile {name!r} has unknown boundaries: {', '.join(unknown)}")
+        settings['boundaries'] = boundaries
+    return profiles
+
+
+def check_split_parts(corpus, structure, settings):
+    """Raise ValueError if a profile splits a verse into too many parts.
+
+    Part suffixes run from 'a' to 'z', so a max_length that cuts a verse
+    into more than extractor.MAX_SPLIT_PARTS parts would write keys that
+    verse_ordinals.split_osis_id cannot read back.
+    """
+    max_length = settings['max_length']
+    for ordinal, osis_id in enumerate(verse_ordinals.iter_verse_ids(structure)):
+        text = str(corpus.verse_at(ordinal), 'utf-8')
+        if len(text) <= max_length:
+            continue
+        # When any space may be cut: without a word over max_length, every
+        # part but the last is longer than max_length minus the longest
+        # word; with one, the splitter keeps to ceil(len / max_length)
+        # parts. Either way most verses are clearly safe without a split.
+        longest_word = max(map(len, text.split(' ')))
+        if 'word' not in settings['boundaries']:
+            most_parts = None
+        elif longest_word < max_length:
+            most_parts = 1 + -(-len(text) // (max_length - longest_word))
+        elif longest_word > max_length:
+            most_parts = max(2, -(-len(text) // max_length))
+        else:
+            most_parts = None
+        if most_parts is not None and most_parts <= extractor.MAX_SPLIT_PARTS:
+            continue
+        parts = len(extractor.split_long_verse(text, max_length, settings['boundaries']))
+        if parts > extractor.MAX_SPLIT_PARTS:
+            raise ValueError(f"max_length {max_length} splits {osis_id} into {parts} parts "
+                             f"(at most {extractor.MAX_SPLIT_PARTS})")
+
+
+def build_text_cache(xml_dir, structure, cache_path=packed_corpus.DEFAULT_CORPUS):
+    """Extract the unsplit text of every chapter into a packed corpus."""
+    ordinals = verse_ordinals.build_ordinal_lookup(structure)
+    verse_texts = []
+    for xml_file in sorted(Path(xml_dir).glob('*/*.xml')):
+        with open(xml_file, 'r', encoding='utf-8') as f:
+            verse_texts.extend((ordinals[osisid], text) for osisid, text
+                               in extractor.extract_verse_texts(f).items())
+    return packed_corpus.write_packed_corpus(verse_texts, structure, cache_path)
+
+
+def render_profile(corpus, structure, settings, output_dir):
+    """Write one profile's chapter JSON tree from an open PackedCorpus.
+
+    Files whose content is unchanged are left alone. Returns a summary dict.
+    """
+    output_path = Path(output_dir)
+    max_length = settings['max_length']
+    boundaries = settings['boundaries']
+    chapters = 0
+    written = 0
+    entries = 0
+
+    ordinal = 0
+    for testament in structure.values():
+        for book_id, book_info in testament['books'].items():
+            book_output_dir = output_path / book_id
+            book_output_dir.mkdir(parents=True, exist_ok=True)
+            for chapter_num in sorted(book_info['chapters'], key=int):
+                verse_texts = {}
+                for verse_num in range(1, book_info['chapters'][chapter_num] + 1):
+                    text = str(corpus.verse_at(ordinal), 'utf-8')
+                    if text:
+                        verse_texts[f"{book_id}.{chapter_num}.{verse_num}"] = text
+                    ordinal += 1
+
+                chapters += 1
+                if not verse_texts:
+                    continue
+                verses = extractor.split_verses(verse_texts, max_length, boundaries)
+                entries += len(verses)
+                data = extractor.serialize_verses(verses)
+                json_path = book_output_dir / f"{book_id}_{chapter_num}.json"
+                if json_path.exists() and json_path.read_bytes() == data:
+                    continue
+                extractor.write_atomic(json_path, data)
+                written += 1
+
+    return {'chapters': chapters, 'written': written, 'entries': entries}
+
+
+def main():
+    """Main function."""
+    parser = argparse.ArgumentParser(
+        description="Render chapter JSON for named split profiles from a text cache.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    cache_parser = subparsers.add_parser('cache', help="extract the unsplit text cache")
+    cache_parser.add_argument('--input', default=DEFAULT_XML_DIR, type=Path,
+                              help="directory of per-book chapter XML")
+
+    render_parser = subparsers.add_parser('render', help="render split profiles")
+    render_parser.add_argument('profiles', nargs='*',
+                               help="profiles to render (default: all)")
+    render_parser.add_argument('--output', default=DEFAULT_PROFILES_DIR, type=Path,
+                               help="directory holding one output tree per profile")
+    render_parser.add_argument('--profiles-file', type=Path,
+                               help="JSON file adding or overriding profiles")
+
+    subparsers.add_parser('list', help="list the available profiles")
+
+    for subparser in (cache_parser, render_parser):
+        subparser.add_argument('--cache', default=packed_corpus.DEFAULT_CORPUS, type=Path,
+                               help="packed text cache file")
+        subparser.add_argument('--structure', default=verse_ordinals.DEFAULT_STRUCTURE,
+                               type=Path, help="kjv_structure.json")
+    args = parser.parse_args()
+
+    if args.command == 'list':
+        for name, settings in load_profiles().items():
+            print(f"{name:<14} {settings['max_length']:>4} chars  "
+                  f"{', '.join(settings['boundaries']):<30} {settings.get('description', '')}")
+        return
+
+    structure = verse_ordinals.load_structure(args.structure)
+
+    if args.command == 'cache':
+        start_time = time.perf_counter()
+        summary = build_text_cache(args.input, structure, args.cache)
+        elapsed = time.perf_counter() - start_time
+        print(f"Cached {summary['verse_count']} verses "
+              f"({summary['bytes'] / 1024:.0f} KB) in {elapsed:.2f}s")
+        return
+
+    profiles = load_profiles(args.profiles_file)
+    names = args.profiles or list(profiles)
+    unknown = [name for name in names if name not in profiles]
+    if unknown:
+        parser.error(f"unknown profile(s): {', '.join(unknown)}")
+    if not args.cache.exists():
+        print(f"Text cache not found: {args.cache} (run 'split_profiles.py cache' first)")
+        return
+
+    with packed_corpus.PackedCorpus(args.cache) as corpus:
+        for name in names:
+            try:
+                check_split_parts(corpus, structure, profiles[name])
+            except ValueError as e:
+                parser.error(f"profile {name!r}: {e}")
+        for name in names:
+            start_time = time.perf_counter()
+            summary = render_profile(corpus, structure, profiles[name], args.output / name)
+            elapsed = time.perf_counter() - start_time
+            print(f"{name:<14} {summary['entries']:>6} entries, "
+                  f"{summary['written']:>4}/{summary['chapters']} chapters written "
+                  f"in {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
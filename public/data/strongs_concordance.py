@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+Strong's lemma concordance built from the ns1:w lemma attributes.
+
+For every Strong's number the concordance records the verses it occurs in
+(as verse ordinals, see verse_ordinals.py), the word position of each
+occurrence, and its total frequency. Word positions count tokens of the
+verse's plain text the same way search_index.py does, so they line up
+with search postings.
+
+The output is a single little-endian binary file:
+  header          magic, format, array typecode, lemma count, array lengths
+  lemma names     newline-separated UTF-8, padded to 4 bytes
+  verse_counts    uint32 per lemma: distinct verses
+  frequencies     uint32 per lemma: total occurrences
+  verse_deltas    per lemma, delta-encoded verse ordinals
+  verse_hits      occurrences in each of those verses (parallel to above)
+  position_deltas per verse, delta-encoded word positions
+Offsets into the per-lemma arrays are prefix sums of the count arrays.
+"""
+
+import argparse
+import re
+import struct
+import sys
+import time
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+from itertools import accumulate
+from pathlib import Path
+
+import extract_verses_to_json as extractor
+import search_index
+import verse_ordinals
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+DEFAULT_CONCORDANCE = SCRIPT_DIR / 'strongs_concordance.bin'
+DEFAULT_XML_DIR = SCRIPT_DIR / 'output_chapters'
+
+MAGIC = b'OBSC'
+CONCORDANCE_FORMAT = 1
+_HEADER = struct.Struct('<4sHcxIIII')
+
+# Notes are skipped whole; w start tags are captured; other tags are dropped
+_WORD_MARKUP_RE = re.compile(r'<ns1:note[^>]*>.*?</ns1:note>|<ns1:w\b([^>]*)>|<[^>]+>')
+_LEMMA_ATTR_RE = re.compile(r'\blemma="([^"]*)"')
+_LEMMA_KEY_RE = re.compile(r'^([HG])0*(\d+)$')
+
+
+def extract_lemmas(verse_content):
+    """Return [(word_position, lemma), ...] for the Strong's numbers in a verse.
+
+    A word element carrying several numbers yields one entry per number at
+    the same position.
+    """
+    text_parts = []
+    marks = []
+    offset = 0
+    last = 0
+
+    for match in _WORD_MARKUP_RE.finditer(verse_content):
+        segment = verse_content[last:match.start()]
+        text_parts.append(segment)
+        offset += len(segment)
+        last = match.end()
+
+        attrs = match.group(1)
+        if attrs is not None:
+            lemma_match = _LEMMA_ATTR_RE.search(attrs)
+            if lemma_match:
+                for lemma in extractor.STRONG_RE.findall(lemma_match.group(1)):
+                    marks.append((offset, lemma))
+
+    if not marks:
+        return []
+
+    text_parts.append(verse_content[last:])
+    token_starts = [token.start() for token in
+                    search_index.TOKEN_RE.finditer(''.join(text_parts))]
+    return [(bisect_left(token_starts, offset), lemma) for offset, lemma in marks]
+
+
+def lemma_key(lemma):
+    """Normalize a Strong's number so H430, H0430 and h0430 compare equal."""
+    match = _LEMMA_KEY_RE.match(lemma.strip().upper())
+    if not match:
+        return lemma
+    return match.group(1), int(match.group(2))
+
+
+def _sort_key(lemma):
+    key = lemma_key(lemma)
+    return key if isinstance(key, tuple) else (key, -1)
+
+
+def write_concordance(verse_lemmas, ordinals, output_path):
+    """Write the binary concordance.
+
+    verse_lemmas is an iterable of (osis_id, [(position, lemma), ...]) and
+    ordinals maps OSIS verse IDs to verse ordinals. Returns a summary dict.
+    """
+    occurrences = defaultdict(lambda: defaultdict(list))
+    for osis_id, lemmas in verse_lemmas:
+        ordinal = ordinals[osis_id]
+        for position, lemma in lemmas:
+            occurrences[lemma][ordinal].append(position)
+
+    names = sorted(occurrences, key=_sort_key)
+    verse_counts = array('I')
+    frequencies = array('I')
+    verse_deltas = []
+    verse_hits = []
+    position_deltas = []
+
+    for lemma in names:
+        by_verse = occurrences[lemma]
+        previous_ordinal = 0
+        frequency = 0
+        for ordinal in sorted(by_verse):
+            positions = sorted(by_verse[ordinal])
+            verse_deltas.append(ordinal - previous_ordinal)
+            verse_hits.append(len(positions))
+            previous_position = 0
+            for position in positions:
+                position_deltas.append(position - previous_position)
+                previous_position = position
+            previous_ordinal = ordinal
+            frequency += len(positions)
+        verse_counts.append(len(by_verse))
+        frequencies.append(frequency)
+
+    # Two-byte entries are enough unless a delta or count needs more
+    largest = max(verse_deltas + verse_hits + position_deltas, default=0)
+    typecode = 'H' if largest < 2 ** 16 else 'I'
+
+    name_blob = '\n'.join(names).encode('utf-8')
+    name_blob += b'\0' * (-len(name_blob) % 4)
+
+    data = b''.join([
+        _HEADER.pack(MAGIC, CONCORDANCE_FORMAT, typecode.encode('ascii'),
+                     len(names), len(name_blob), len(verse_deltas), len(position_deltas)),
+        name_blob,
+        extractor.little_endian_bytes(verse_counts),
+        extractor.little_endian_bytes(frequencies),
+        extractor.little_endian_bytes(array(typecode, verse_deltas)),
+        extractor.little_endian_bytes(array(typecode, verse_hits)),
+        extractor.little_endian_bytes(array(typecode, position_deltas)),
+    ])
+    extractor.write_atomic(output_path, data)
+
+    return {
+        'lemma_count': len(names),
+        'verse_entries': len(verse_deltas),
+        'occurrences': len(position_deltas),
+        'bytes': len(data),
+    }
+
+
+def collect_verse_lemmas(xml_dir):
+    """Extract every chapter in xml_dir, returning (osis_id, lemmas) pairs.
+
+    The lemmas are gathered through the extractor's on_verse hook, in the
+    same pass that extracts the verse text.
+    """
+    verse_lemmas = []
+
+    def on_verse(osis_id, verse_content):
+        verse_lemmas.append((osis_id, extract_lemmas(verse_content)))
+
+    for xml_file in sorted(Path(xml_dir).glob('*/*.xml')):
+        extractor.extract_verses_from_xml(xml_file, on_verse)
+    return verse_lemmas
+
+
+class StrongsConcordance:
+    """Loader for strongs_concordance.bin."""
+
+    def __init__(self, path=DEFAULT_CONCORDANCE):
+        with open(path, 'rb') as f:
+            data = f.read()
+
+        (magic, fmt, typecode, lemma_count, names_len,
+         verse_entries, position_entries) = _HEADER.unpack_from(data)
+        if magic != MAGIC or fmt != CONCORDANCE_FORMAT:
+            raise ValueError(f"Not a format {CONCORDANCE_FORMAT} concordance: {path}")
+        typecode = typecode.decode('ascii')
+
+        offset = _HEADER.size
+        self.names = data[offset:offset + names_len].rstrip(b'\0').decode('utf-8').split('\n')
+        offset += names_len
+
+        def read_array(code, count):
+            nonlocal offset
+            values = array(code)
+            values.frombytes(data[offset:offset + count * values.itemsize])
+            if sys.byteorder == 'big':
+                values.byteswap()
+            offset += count * values.itemsize
+            return values
+
+        self.verse_counts = read_array('I', lemma_count)
+        self.frequencies = read_array('I', lemma_count)
+        self.verse_deltas = read_array(typecode, verse_entries)
+        self.verse_hits = read_array(typecode, verse_entries)
+        self.position_deltas = read_array(typecode, position_entries)
+
+        self._verse_offsets = [0, *accumulate(self.verse_counts)]
+        self._position_offsets = [0, *accumulate(self.frequencies)]
+        self._lookup = {lemma_key(name): i for i, name in enumerate(self.names)}
+
+    def _index(self, lemma):
+        index = self._lookup.get(lemma_key(lemma))
+        if index is None:
+            raise KeyError(lemma)
+        return index
+
+    def __contains__(self, lemma):
+        return lemma_key(lemma) in self._lookup
+
+    def frequency(self, lemma):
+        """Total occurrences of a lemma."""
+        return self.frequencies[self._index(lemma)]
+
+    def verses(self, lemma):
+        """Sorted verse ordinals containing a lemma."""
+        i = self._index(lemma)
+        start = self._verse_offsets[i]
+        return list(accumulate(self.verse_deltas[start:start + self.verse_counts[i]]))
+
+    def occurrences(self, lemma):
+        """[(verse ordinal, word position), ...] for every occurrence of a lemma."""
+        i = self._index(lemma)
+        start = self._verse_offsets[i]
+        position_index = self._position_offsets[i]
+        result = []
+        ordinal = 0
+        for delta, hits in zip(self.verse_deltas[start:start + self.verse_counts[i]],
+                               self.verse_hits[start:start + self.verse_counts[i]]):
+            ordinal += delta
+            position = 0
+            for position_delta in self.position_deltas[position_index:position_index + hits]:
+                position += position_delta
+                result.append((ordinal, position))
+            position_index += hits
+        return result
+
+
+def main():
+    """Main function."""
+    parser = argparse.ArgumentParser(description="Build or query the Strong's concordance.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build', help="build from chapter XML")
+    build_parser.add_argument('--input', default=DEFAULT_XML_DIR, type=Path,
+                              help="directory of per-book chapter XML")
+    build_parser.add_argument('--output', default=DEFAULT_CONCORDANCE, type=Path,
+                              help="concordance file to write")
+
+    lookup_parser = subparsers.add_parser('lookup', help="list verses containing a lemma")
+    lookup_parser.add_argument('lemma', help="Strong's number, e.g. H0430 or G26")
+    lookup_parser.add_argument('--concordance', default=DEFAULT_CONCORDANCE, type=Path,
+                               help="concordance file to read")
+
+    for subparser in (build_parser, lookup_parser):
+        subparser.add_argument('--structure', default=verse_ordinals.DEFAULT_STRUCTURE,
+                               type=Path, help="kjv_structure.json")
+    args = parser.parse_args()
+
+    structure = verse_ordinals.load_structure(args.structure)
+
+    if args.command == 'build':
+        start_time = time.perf_counter()
+        summary = write_concordance(collect_verse_lemmas(args.input),
+                                    verse_ordinals.build_ordinal_lookup(structure),
+                                    args.output)
+        elapsed = time.perf_counter() - start_time
+        print(f"Lemmas: {summary['lemma_count']}, occurrences: {summary['occurrences']}")
+        print(f"Size: {summary['bytes'] / 1024:.0f} KB")
+        print(f"Elapsed: {elapsed:.2f}s")
+    else:
+        concordance = StrongsConcordance(args.concordance)
+        if args.lemma not in concordance:
+            print(f"Lemma not found: {args.lemma}")
+            return
+        verse_ids = list(verse_ordinals.iter_verse_ids(structure))
+        ordinals = concordance.verses(args.lemma)
+        for ordinal in ordinals:
+            print(verse_ids[ordinal])
+        print(f"\n{args.lemma}: {concordance.frequency(args.lemma)} occurrences "
+              f"in {len(ordinals)} verses")
+
+
+if __name__ == "__main__":
+    main()
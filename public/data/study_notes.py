@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Study notes kept out of the chapter JSON.
+
+The extractor (--notes) and build_bible_data.py (the study-notes stage)
+capture every <ns1:note type="study"> while tokenizing verses and write:
+
+  study_notes/index.json   {"format":1,
+                            "books":{"Gen":{"path":"Gen.json","verses":339,"notes":384},...},
+                            "verses":[3,4,5,7,...]}
+  study_notes/Gen.json     {"format":1,"book":"Gen","notes":{"3":["..."],...}}
+
+Keys and the index's verse list are verse ordinals (see verse_ordinals.py).
+The index is small enough to load up front to mark annotated verses; a
+book's shard is only read the first time one of its notes is asked for.
+Books are listed in canonical order and the verse list runs through them
+in that order, so the book of an annotated verse follows from its
+position in the list.
+"""
+
+import argparse
+import json
+import time
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+from pathlib import Path
+
+import extract_verses_to_json as extractor
+import verse_ordinals
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+DEFAULT_NOTES_DIR = SCRIPT_DIR / 'study_notes'
+DEFAULT_XML_DIR = SCRIPT_DIR / 'output_chapters'
+
+
+class StudyNotes:
+    """Loader for the study note index, reading book shards on demand."""
+
+    def __init__(self, notes_dir=DEFAULT_NOTES_DIR):
+        self.notes_dir = Path(notes_dir)
+        with open(self.notes_dir / extractor.STUDY_NOTES_INDEX_FILENAME, 'r',
+                  encoding='utf-8') as f:
+            index = json.load(f)
+        if index.get('format') != extractor.STUDY_NOTES_FORMAT:
+            raise ValueError(f"Not a format {extractor.STUDY_NOTES_FORMAT} "
+                             f"study notes index: {self.notes_dir}")
+        self.books = index['books']
+        self.verses = index['verses']
+        self._book_ids = list(self.books)
+        self._book_ends = list(accumulate(book['verses'] for book in self.books.values()))
+        self._shards = {}
+
+    def has_notes(self, ordinal):
+        """Check whether a verse has study notes, without reading a shard."""
+        i = bisect_left(self.verses, ordinal)
+        return i < len(self.verses) and self.verses[i] == ordinal
+
+    def annotated(self, first, last):
+        """Return the annotated verse ordinals in first..last."""
+        return self.verses[bisect_left(self.verses, first):bisect_right(self.verses, last)]
+
+    def _shard(self, book_id):
+        shard = self._shards.get(book_id)
+        if shard is None:
+            with open(self.notes_dir / self.books[book_id]['path'], 'r', encoding='utf-8') as f:
+                shard = self._shards[book_id] = json.load(f)['notes']
+        return shard
+
+    def notes(self, ordinal):
+        """Return the study notes of a verse ([] if it has none)."""
+        i = bisect_left(self.verses, ordinal)
+        if i == len(self.verses) or self.verses[i] != ordinal:
+            return []
+        book_id = self._book_ids[bisect_right(self._book_ends, i)]
+        return self._shard(book_id)[str(ordinal)]
+
+
+def collect_verse_notes(xml_dir):
+    """Extract every chapter in xml_dir, returning (osis_id, notes) pairs.
+
+    The notes are gathered through the extractor's on_verse hook, in the
+    same pass that extracts the verse text.
+    """
+    verse_notes = []
+
+    def on_verse(osis_id, verse_content):
+        notes = extractor.extract_study_notes(verse_content)
+        if notes:
+            verse_notes.append((osis_id, notes))
+
+    for xml_file in sorted(Path(xml_dir).glob('*/*.xml')):
+        extractor.extract_verses_from_xml(xml_file, on_verse)
+    return verse_notes
+
+
+def main():
+    """Main function."""
+    parser = argparse.ArgumentParser(description="Build or look up study note shards.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build', help="write the shards from chapter XML")
+    build_parser.add_argument('--input', default=DEFAULT_XML_DIR, type=Path,
+                              help="directory of per-book chapter XML")
+
+    show_parser = subparsers.add_parser('show', help="print the notes of an OSIS reference")
+    show_parser.add_argument('ref', help="OSIS reference, e.g. Gen.1 or John.3.16-John.3.21")
+
+    for subparser in (build_parser, show_parser):
+        subparser.add_argument('--notes-dir', default=DEFAULT_NOTES_DIR, type=Path,
+                               help="study note directory")
+        subparser.add_argument('--structure', default=verse_ordinals.DEFAULT_STRUCTURE,
+                               type=Path, help="kjv_structure.json")
+    args = parser.parse_args()
+    structure = verse_ordinals.load_structure(args.structure)
+
+    if args.command == 'build':
+        start_time = time.perf_counter()
+        summary = extractor.write_study_notes(args.notes_dir, structure,
+                                              collect_verse_notes(args.input))
+        print(f"Study notes: {summary['notes']} notes on {summary['verses']} verses in "
+              f"{summary['books']} book shards, index {summary['index_bytes'] / 1024:.0f} KB "
+              f"({time.perf_counter() - start_time:.2f}s)")
+        return
+
+    index = verse_ordinals.VerseIndex(structure)
+    try:
+        verse_range = index.resolve(args.ref)
+    except (KeyError, ValueError):
+        parser.error(f"unknown reference: {args.ref}")
+    study_notes = StudyNotes(args.notes_dir)
+    annotated = study_notes.annotated(verse_range.first, verse_range.last)
+    for ordinal in annotated:
+        print(index.verse_id(ordinal))
+        for note in study_notes.notes(ordinal):
+            print(f"  {note}")
+    print(f"{len(annotated)} of {verse_range.verse_count} verses have notes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Verify a chapter JSON tree against kjv_structure.json.
+
+For every chapter in the structure, in parallel:
+  - the chapter file exists and parses (dict or compact layout)
+  - every key belongs to the chapter, in order, and no verse is missing
+    or extra (split parts 9a, 9b, ... count as one verse)
+  - split parts are lettered a, b, c, ... and there are at least two
+  - with the chapter XML available, each verse's text (split parts joined
+    with single spaces) equals the text extracted from the source
+
+It also reports chapter files that are not in the structure, checks the
+output hashes in the build manifest, and prints a checksum of the whole
+tree: the SHA-256 of every chapter's relative path and file hash, in
+canonical order.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import compact_chapters
+import extract_verses_to_json as extractor
+import verse_ordinals
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+DEFAULT_JSON_DIR = SCRIPT_DIR / 'output_chapters_json'
+DEFAULT_SOURCE_DIR = SCRIPT_DIR / 'output_chapters'
+
+# A chapter JSON key: book, chapter, verse and an optional split suffix
+_KEY_RE = re.compile(r'^([1-4]?[A-Za-z]+)\.(\d+)\.(\d+)([a-z]?)$')
+
+
+def _format_numbers(numbers, limit=10):
+    shown = ', '.join(str(n) for n in numbers[:limit])
+    return shown + (f" (+{len(numbers) - limit} more)" if len(numbers) > limit else '')
+
+
+def read_chapter(path):
+    """Read a chapter file of either layout; returns (dict form, raw bytes)."""
+    data = path.read_bytes()
+    verses = json.loads(data)
+    if isinstance(verses, dict) and isinstance(verses.get('verses'), list):
+        verses = compact_chapters.decode_chapter(verses)
+    if not isinstance(verses, dict):
+        raise ValueError("chapter JSON must be an object")
+    return verses, data
+
+
+def verify_chapter(book_id, chapter_num, expected, json_dir, source_dir=None):
+    """Check one chapter file; returns a result dict with its errors and hash."""
+    chapter_id = f"{book_id}.{chapter_num}"
+    relative = f"{book_id}/{book_id}_{chapter_num}.json"
+    result = {'chapter': chapter_id, 'path': relative, 'sha256': None,
+              'verses': 0, 'split_verses': 0, 'errors': []}
+    errors = result['errors']
+
+    try:
+        verses, data = read_chapter(Path(json_dir) / relative)
+    except FileNotFoundError:
+        errors.append("file missing")
+        return result
+    except (ValueError, UnicodeDecodeError) as e:
+        errors.append(f"unreadable: {e}")
+        return result
+    result['sha256'] = hashlib.sha256(data).hexdigest()
+
+    # Group the keys into verses, checking order and split lettering
+    texts = {}
+    parts = {}
+    previous = (0, '')
+    for key, text in verses.items():
+        match = _KEY_RE.match(key)
+        if (not match or match.group(1) != book_id
+                or match.group(2) != str(chapter_num)):
+            errors.append(f"{key}: key does not belong to {chapter_id}")
+            continue
+        verse_num, part = int(match.group(3)), match.group(4)
+        if (verse_num, part) <= previous:
+            errors.append(f"{key}: out of order")
+        previous = (verse_num, part)
+        if not isinstance(text, str) or not text.strip():
+            errors.append(f"{key}: empty text")
+            continue
+        if verse_num in texts and (not part or not parts.get(verse_num)):
+            errors.append(f"{key}: verse {verse_num} is both whole and split")
+            continue
+        texts.setdefault(verse_num, []).append(text)
+        if part:
+            parts.setdefault(verse_num, []).append(part)
+
+    for verse_num, letters in parts.items():
+        expected_letters = [chr(ord('a') + i) for i in range(len(letters))]
+        if letters != expected_letters or len(letters) < 2:
+            errors.append(f"{chapter_id}.{verse_num}: split parts {''.join(letters)} "
+                          f"are not a, b, ...")
+
+    present = sorted(texts)
+    extra = [n for n in present if not 1 <= n <= expected]
+    missing = [n for n in range(1, expected + 1) if n not in texts]
+    result['verses'] = len(present) - len(extra)
+    result['split_verses'] = len(parts)
+
+    source_texts = None
+    if source_dir is not None:
+        xml_path = Path(source_dir) / book_id / f"{book_id}_{chapter_num}.xml"
+        try:
+            with open(xml_path, 'r', encoding='utf-8') as f:
+                source_texts = extractor.extract_verse_texts(f)
+        except FileNotFoundError:
+            errors.append(f"source missing: {xml_path.name}")
+
+    if extra:
+        errors.append(f"verses not in structure (has {expected}): {_format_numbers(extra)}")
+    if missing:
+        note = ''
+        if source_texts is not None:
+            empty = [n for n in missing if f"{chapter_id}.{n}" not in source_texts]
+            if empty:
+                note = f" ({len(empty)} empty in source)"
+        errors.append(f"missing verses: {_format_numbers(missing)}{note}")
+
+    if source_texts is not None:
+        for verse_num in present:
+            source = source_texts.get(f"{chapter_id}.{verse_num}")
+            if source is None or ' '.join(texts[verse_num]) == source:
+                continue
+            if verse_num in parts:
+                errors.append(f"{chapter_id}.{verse_num}: split parts do not rejoin "
+                              f"to the source text")
+            else:
+                errors.append(f"{chapter_id}.{verse_num}: text differs from the source")
+    else:
+        # No source to compare with: parts must at least rejoin cleanly
+        for verse_num in parts:
+            if any(text != text.strip() for text in texts[verse_num]):
+                errors.append(f"{chapter_id}.{verse_num}: split part has "
+                              f"leading or trailing whitespace")
+    return result
+
+
+def _verify_chapters(tasks):
+    return [verify_chapter(*task) for task in tasks]
+
+
+def tree_checksum(results):
+    """SHA-256 over each chapter's path and file hash, in canonical order."""
+    digest = hashlib.sha256()
+    for result in results:
+        digest.update(f"{result['path']}\0{result['sha256'] or ''}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def verify_tree(json_dir, structure, source_dir=None, jobs=1):
+    """Verify every chapter of structure in json_dir; returns a summary dict."""
+    start_time = time.perf_counter()
+    json_dir = Path(json_dir)
+    tasks = []
+    for testament in structure.values():
+        for book_id, book_info in testament['books'].items():
+            for chapter_num in sorted(book_info['chapters'], key=int):
+                tasks.append((book_id, int(chapter_num), book_info['chapters'][chapter_num],
+                              json_dir, source_dir))
+
+    # A few dozen chapters per task keeps process start-up and pickling small
+    batches = [tasks[i:i + 32] for i in range(0, len(tasks), 32)]
+    results = None
+    if jobs > 1:
+        try:
+            executor = ProcessPoolExecutor(max_workers=jobs)
+        except (OSError, NotImplementedError) as e:
+            print(f"Process pool unavailable ({e}), falling back to serial")
+        else:
+            with executor:
+                results = [r for batch in executor.map(_verify_chapters, batches) for r in batch]
+    if results is None:
+        results = _verify_chapters(tasks)
+
+    expected_paths = {result['path'] for result in results}
+    orphans = sorted(str(path.relative_to(json_dir)) for path in json_dir.glob('*/*_*.json')
+                     if extractor.is_chapter_json(path)
+                     and str(path.relative_to(json_dir)) not in expected_paths)
+
+    manifest = extractor.load_manifest(json_dir / extractor.MANIFEST_FILENAME)
+    stale = sorted(result['path'] for result in results
+                   if result['sha256'] and result['path'] in manifest
+                   and manifest[result['path']].get('output_sha256') != result['sha256'])
+
+    return {
+        'chapters': len(results),
+        'verses': sum(result['verses'] for result in results),
+        'expected_verses': sum(task[2] for task in tasks),
+        'split_verses': sum(result['split_verses'] for result in results),
+        'failed': [result for result in results if result['errors']],
+        'orphans': orphans,
+        'stale_manifest': stale if manifest else None,
+        'tree_sha256': tree_checksum(results),
+        'checked_source': source_dir is not None,
+        'seconds': time.perf_counter() - start_time,
+    }
+
+
+def print_report(summary, limit=20):
+    """Print verify_tree() results; returns True if the tree is valid."""
+    failed = summary['failed']
+    for result in failed[:limit]:
+        for error in result['errors']:
+            print(f"{result['path']}: {error}")
+    if len(failed) > limit:
+        print(f"... and {len(failed) - limit} more failing chapters")
+    for path in summary['orphans'][:limit]:
+        print(f"{path}: not in the structure")
+    stale = summary['stale_manifest']
+    if stale:
+        print(f"Build manifest hash differs for {len(stale)} chapters "
+              f"(e.g. {stale[0]}); run an incremental build to refresh it")
+
+    print(f"Chapters: {summary['chapters'] - len(failed)}/{summary['chapters']} ok")
+    print(f"Verses:   {summary['verses']}/{summary['expected_verses']} "
+          f"({summary['split_verses']} split)")
+    print(f"Source text: {'checked' if summary['checked_source'] else 'not checked'}")
+    print(f"Build manifest: {'none' if stale is None else 'stale' if stale else 'hashes match'}")
+    print(f"Tree SHA-256: {summary['tree_sha256']}")
+    print(f"Verified in {summary['seconds']:.2f}s")
+    return not failed and not summary['orphans']
+
+
+def main():
+    """Main function."""
+    parser = argparse.ArgumentParser(
+        description="Verify chapter JSON against kjv_structure.json and the source XML.")
+    parser.add_argument('--input', default=DEFAULT_JSON_DIR, type=Path,
+                        help="chapter JSON directory (dict or compact layout)")
+    parser.add_argument('--structure', default=verse_ordinals.DEFAULT_STRUCTURE, type=Path,
+                        help="kjv_structure.json")
+    parser.add_argument('--source', default=DEFAULT_SOURCE_DIR, type=Path,
+                        help="per-book chapter XML to compare verse text with")
+    parser.add_argument('--no-source', action='store_true',
+                        help="skip the comparison with the source XML")
+    parser.add_argument('--jobs', '-j', type=int, default=os.cpu_count() or 1,
+                        help="worker processes")
+    parser.add_argument('--expect', metavar='SHA256',
+                        help="fail unless the tree checksum equals this value")
+    args = parser.parse_args()
+
+    source_dir = None if args.no_source or not args.source.is_dir() else args.source
+    summary = verify_tree(args.input, verse_ordinals.load_structure(args.structure),
+                          source_dir, args.jobs)
+    valid = print_report(summary)
+    if args.expect and args.expect != summary['tree_sha256']:
+        print(f"Tree checksum does not match the expected {args.expect}")
+        valid = False
+    if not valid:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
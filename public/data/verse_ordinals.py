@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""
+Global verse ordinals derived from kjv_structure.json.
+
+Every verse in the Bible gets a compact integer ordinal: its 0-based
+position in canonical order (testament, book, chapter, verse). Generated
+indexes store ordinals instead of OSIS ID strings.
+
+VerseIndex keeps prefix sums of the chapter verse counts, so an OSIS
+reference resolves to an ordinal range in O(1), and an ordinal maps back
+to its verse in O(log chapters). The same tables are written as a compact
+JSON table (verse_ordinals.json) for the frontend.
+"""
+
+import argparse
+import json
+import re
+import time
+from array import array
+from bisect import bisect_right
+from collections import namedtuple
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+DEFAULT_STRUCTURE = SCRIPT_DIR / 'kjv_structure.json'
+DEFAULT_TABLE = SCRIPT_DIR / 'verse_ordinals.json'
+
+TABLE_FORMAT = 1
+
+# An OSIS verse ID, optionally followed by a split-part suffix (Gen.1.9a)
+_SPLIT_ID_RE = re.compile(r'^(.*\.\d+)([a-z]*)$')
+
+# One end of an OSIS reference: book, optional chapter, optional verse and part
+_REF_END_RE = re.compile(r'^([1-4]?[A-Za-z]+)(?:\.(\d+)(?:\.(\d+)([a-z]?))?)?$')
+# The end of a range written without its book (Gen.1.26-2.3, Gen.1.26-28)
+_SHORT_END_RE = re.compile(r'^(\d+)(?:\.(\d+))?([a-z]?)$')
+_PART_RE = re.compile(r'^[a-z]$')
+_NUMBER_RE = re.compile(r'^\d+$')
+
+
+def load_structure(structure_path=DEFAULT_STRUCTURE):
+    """Load kjv_structure.json."""
+    with open(structure_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def iter_verse_ids(structure):
+    """Yield every OSIS verse ID in canonical (ordinal) order."""
+    for testament in structure.values():
+        for book_id, book_info in testament['books'].items():
+            for chapter_num in sorted(book_info['chapters'], key=int):
+                for verse_num in range(1, book_info['chapters'][chapter_num] + 1):
+                    yield f"{book_id}.{chapter_num}.{verse_num}"
+
+
+def build_ordinal_lookup(structure):
+    """Map each OSIS verse ID to its ordinal."""
+    return {osis_id: ordinal for ordinal, osis_id in enumerate(iter_verse_ids(structure))}
+
+
+def split_osis_id(key):
+    """Split a chapter JSON key into (verse ID, part suffix).
+
+    'Gen.1.9a' -> ('Gen.1.9', 'a'); 'Gen.1.9' -> ('Gen.1.9', '').
+    """
+    match = _SPLIT_ID_RE.match(key)
+    if not match:
+        raise ValueError(f"Not an OSIS verse ID: {key}")
+    return match.group(1), match.group(2)
+
+
+def join_split_verses(verses):
+    """Rejoin split parts of chapter verses into whole-verse text.
+
+    Takes (key, text) pairs as stored in chapter JSON and yields
+    (verse ID, text) with the parts of each verse joined by spaces.
+    """
+    current_id = None
+    parts = []
+    for key, text in verses:
+        osis_id, _ = split_osis_id(key)
+        if osis_id != current_id and parts:
+            yield current_id, ' '.join(parts)
+            parts = []
+        current_id = osis_id
+        parts.append(text)
+    if parts:
+        yield current_id, ' '.join(parts)
+
+
+class VerseRange(namedtuple('VerseRange', 'first last first_part last_part')):
+    """An inclusive range of verse ordinals.
+
+    first_part and last_part are split-part suffixes ('a', 'b', ...) when
+    the range starts or ends inside a split verse, otherwise ''.
+    """
+
+    __slots__ = ()
+
+    @property
+    def verse_count(self):
+        return self.last - self.first + 1
+
+    def contains(self, ordinal, part=''):
+        """Check whether a verse, or one split part of it, lies in the range."""
+        if not self.first <= ordinal <= self.last:
+            return False
+        if part and ordinal == self.first and self.first_part and part < self.first_part:
+            return False
+        if part and ordinal == self.last and self.last_part and part > self.last_part:
+            return False
+        return True
+
+
+class VerseIndex:
+    """Prefix-sum index from OSIS references to verse ordinals and back."""
+
+    def __init__(self, structure):
+        self.book_ids = []
+        # Per book: index of its first chapter (plus a final sentinel)
+        self.book_first_chapter = array('I')
+        # Per chapter: ordinal of its first verse (plus a final sentinel)
+        self.chapter_first_verse = array('I')
+        # Per chapter: the book it belongs to
+        self.chapter_book = array('H')
+
+        verse_count = 0
+        for testament in structure.values():
+            for book_id, book_info in testament['books'].items():
+                self.book_first_chapter.append(len(self.chapter_first_verse))
+                for chapter_num in sorted(book_info['chapters'], key=int):
+                    self.chapter_first_verse.append(verse_count)
+                    self.chapter_book.append(len(self.book_ids))
+                    verse_count += book_info['chapters'][chapter_num]
+                self.book_ids.append(book_id)
+        self.book_first_chapter.append(len(self.chapter_first_verse))
+        self.chapter_first_verse.append(verse_count)
+
+        self.verse_count = verse_count
+        self._book_index = {book_id: i for i, book_id in enumerate(self.book_ids)}
+        self._book_index.update({book_id.lower(): i for i, book_id in enumerate(self.book_ids)})
+
+    @classmethod
+    def from_table(cls, table):
+        """Rebuild an index from the dict written by to_table()."""
+        if table.get('format') != TABLE_FORMAT:
+            raise ValueError(f"Unsupported ordinal table format: {table.get('format')}")
+        index = cls.__new__(cls)
+        index.book_ids = list(table['books'])
+        index.book_first_chapter = array('I', table['book_first_chapter'])
+        index.chapter_first_verse = array('I', table['chapter_first_verse'])
+        index.chapter_book = array('H')
+        for book, (first, end) in enumerate(zip(index.book_first_chapter,
+                                                index.book_first_chapter[1:])):
+            index.chapter_book.extend([book] * (end - first))
+        index.verse_count = index.chapter_first_verse[-1]
+        index._book_index = {book_id: i for i, book_id in enumerate(index.book_ids)}
+        index._book_index.update({book_id.lower(): i
+                                  for i, book_id in enumerate(index.book_ids)})
+        return index
+
+    def _book(self, book_id):
+        book = self._book_index.get(book_id)
+        if book is None:
+            book = self._book_index.get(book_id.lower())
+            if book is None:
+                raise KeyError(book_id)
+        return book
+
+    def _chapter(self, book, chapter):
+        c = self.book_first_chapter[book] + int(chapter) - 1
+        if not self.book_first_chapter[book] <= c < self.book_first_chapter[book + 1]:
+            raise KeyError(f"{self.book_ids[book]}.{chapter}")
+        return c
+
+    def ordinal(self, book_id, chapter, verse):
+        """Return the ordinal of a verse, validating each level."""
+        c = self._chapter(self._book(book_id), chapter)
+        o = self.chapter_first_verse[c] + int(verse) - 1
+        if not self.chapter_first_verse[c] <= o < self.chapter_first_verse[c + 1]:
+            raise KeyError(f"{book_id}.{chapter}.{verse}")
+        return o
+
+    def chapter_range(self, book_id, chapter):
+        """Return (first, last) ordinals of a chapter."""
+        c = self._chapter(self._book(book_id), chapter)
+        return self.chapter_first_verse[c], self.chapter_first_verse[c + 1] - 1
+
+    def book_range(self, book_id):
+        """Return (first, last) ordinals of a book."""
+        book = self._book(book_id)
+        return (self.chapter_first_verse[self.book_first_chapter[book]],
+                self.chapter_first_verse[self.book_first_chapter[book + 1]] - 1)
+
+    def location(self, ordinal):
+        """Return (book_id, chapter, verse) of an ordinal."""
+        if not 0 <= ordinal < self.verse_count:
+            raise IndexError(f"Verse ordinal out of range: {ordinal}")
+        c = bisect_right(self.chapter_first_verse, ordinal) - 1
+        book = self.chapter_book[c]
+        return (self.book_ids[book], c - self.book_first_chapter[book] + 1,
+                ordinal - self.chapter_first_verse[c] + 1)
+
+    def verse_id(self, ordinal, part=''):
+        """Return the OSIS ID of an ordinal, with an optional split suffix."""
+        book_id, chapter, verse = self.location(ordinal)
+        return f"{book_id}.{chapter}.{verse}{part}"
+
+    def verse_ids(self, first, last):
+        """Yield the OSIS IDs of ordinals first..last, walking chapter by chapter."""
+        if first > last:
+            return
+        c = bisect_right(self.chapter_first_verse, first) - 1
+        ordinal = first
+        while ordinal <= last:
+            book = self.chapter_book[c]
+            prefix = f"{self.book_ids[book]}.{c - self.book_first_chapter[book] + 1}."
+            chapter_start = self.chapter_first_verse[c]
+            chapter_last = min(last, self.chapter_first_verse[c + 1] - 1)
+            for o in range(ordinal, chapter_last + 1):
+                yield f"{prefix}{o - chapter_start + 1}"
+            ordinal = chapter_last + 1
+            c += 1
+
+    def chapters(self, first, last):
+        """Return [(book_id, chapter), ...] for the chapters a range touches."""
+        c_first = bisect_right(self.chapter_first_verse, first) - 1
+        c_last = bisect_right(self.chapter_first_verse, last) - 1
+        result = []
+        for c in range(c_first, c_last + 1):
+            book = self.chapter_book[c]
+            result.append((self.book_ids[book], c - self.book_first_chapter[book] + 1))
+        return result
+
+    def neighbors(self, ordinal):
+        """Return (previous, next) ordinals, None at either end of the Bible."""
+        return (ordinal - 1 if ordinal > 0 else None,
+                ordinal + 1 if ordinal + 1 < self.verse_count else None)
+
+    def next_verses(self, ordinal, count):
+        """The range of up to count verses after ordinal; None at the end."""
+        if ordinal + 1 >= self.verse_count or count < 1:
+            return None
+        return VerseRange(ordinal + 1, min(ordinal + count, self.verse_count - 1), '', '')
+
+    def _resolve_end(self, match, at_end):
+        book_id, chapter, verse, part = match.groups()
+        book = self._book(book_id)
+        if chapter is None:
+            first, last = self.book_range(book_id)
+            return (last if at_end else first), ''
+        if verse is None:
+            c = self._chapter(book, chapter)
+            return (self.chapter_first_verse[c + 1] - 1 if at_end
+                    else self.chapter_first_verse[c]), ''
+        return self.ordinal(book_id, chapter, verse), part
+
+    def resolve(self, ref):
+        """Resolve an OSIS reference to a VerseRange.
+
+        Accepts a book (Gen), chapter (Gen.1), verse (Gen.1.1), split part
+        (Gen.1.9a) or a range of any of those (Gen.1.26-Gen.2.3). The end of
+        a range may drop the book (Gen.1.26-2.3) or book and chapter
+        (Gen.1.26-28, Gen.1.9a-b). Raises KeyError for unknown books,
+        chapters or verses and ValueError for malformed references.
+        """
+        start, _, end = ref.strip().partition('-')
+        start_match = _REF_END_RE.match(start)
+        if not start_match:
+            raise ValueError(f"Not an OSIS reference: {ref}")
+        first, first_part = self._resolve_end(start_match, at_end=False)
+
+        if not end:
+            last, last_part = self._resolve_end(start_match, at_end=True)
+            return VerseRange(first, last, first_part, last_part)
+
+        book_id, chapter, verse, _ = start_match.groups()
+        short_match = _SHORT_END_RE.match(end)
+        if verse is not None and _PART_RE.match(end):        # Gen.1.9a-b
+            last, last_part = first, end
+        elif verse is not None and short_match:
+            number, second, last_part = short_match.groups()
+            if second is not None:                           # Gen.1.26-2.3
+                last = self.ordinal(book_id, number, second)
+            else:                                            # Gen.1.26-28
+                last = self.ordinal(book_id, chapter, number)
+        elif chapter is not None and verse is None and _NUMBER_RE.match(end):   # Gen.1-3
+            c = self._chapter(self._book(book_id), end)
+            last, last_part = self.chapter_first_verse[c + 1] - 1, ''
+        else:
+            end_match = _REF_END_RE.match(end)
+            if not end_match:
+                raise ValueError(f"Not an OSIS reference: {ref}")
+            last, last_part = self._resolve_end(end_match, at_end=True)
+
+        if (last, last_part or '~') < (first, first_part):
+            raise ValueError(f"Range ends before it starts: {ref}")
+        return VerseRange(first, last, first_part, last_part)
+
+    def resolve_many(self, refs):
+        """Resolve many references, reusing the result for repeated ones.
+
+        Returns a list parallel to refs, with None for references that do
+        not resolve.
+        """
+        resolved = {}
+        results = []
+        for ref in refs:
+            if ref not in resolved:
+                try:
+                    resolved[ref] = self.resolve(ref)
+                except (KeyError, ValueError):
+                    resolved[ref] = None
+            results.append(resolved[ref])
+        return results
+
+    def to_table(self):
+        """Return the index as a compact, JSON-serializable table."""
+        return {
+            'format': TABLE_FORMAT,
+            'verse_count': self.verse_count,
+            'books': self.book_ids,
+            'book_first_chapter': list(self.book_first_chapter),
+            'chapter_first_verse': list(self.chapter_first_verse),
+        }
+
+
+def main():
+    """Main function."""
+    parser = argparse.ArgumentParser(description="Verse ordinal index tools.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    table_parser = subparsers.add_parser('table', help="write the compact ordinal table")
+    table_parser.add_argument('--output', default=DEFAULT_TABLE, type=Path,
+                              help="table JSON file to write")
+
+    resolve_parser = subparsers.add_parser('resolve', help="resolve OSIS references")
+    resolve_parser.add_argument('refs', nargs='+', help="e.g. Gen.1.26-Gen.2.3 John.3.16")
+
+    for subparser in (table_parser, resolve_parser):
+        subparser.add_argument('--structure', default=DEFAULT_STRUCTURE, type=Path,
+                               help="kjv_structure.json")
+    args = parser.parse_args()
+
+    index = VerseIndex(load_structure(args.structure))
+
+    if args.command == 'table':
+        data = json.dumps(index.to_table(), separators=(',', ':'))
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(data)
+        print(f"Ordinal table: {index.verse_count} verses, "
+              f"{len(index.chapter_first_verse) - 1} chapters, {len(data) / 1024:.1f} KB "
+              f"-> {args.output}")
+        return
+
+    start_time = time.perf_counter()
+    results = index.resolve_many(args.refs)
+    elapsed = time.perf_counter() - start_time
+    for ref, verse_range in zip(args.refs, results):
+        if verse_range is None:
+            print(f"{ref}: not found")
+            continue
+        print(f"{ref}: ordinals {verse_range.first}-{verse_range.last} "
+              f"({index.verse_id(verse_range.first, verse_range.first_part)} - "
+              f"{index.verse_id(verse_range.last, verse_range.last_part)}, "
+              f"{verse_range.verse_count} verses in "
+              f"{len(index.chapters(verse_range.first, verse_range.last))} chapters)")
+    print(f"\nResolved {len(args.refs)} references in {elapsed * 1e3:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()